@@ -0,0 +1,133 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("users", "0012_role_hierarchy"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Document",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=255, verbose_name="Название")),
+                ("content", models.TextField(blank=True, verbose_name="Содержимое")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создан"),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="documents",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Владелец",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Документ",
+                "verbose_name_plural": "Документы",
+            },
+        ),
+        migrations.CreateModel(
+            name="DocumentGrant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="grants",
+                        to="documents.document",
+                        verbose_name="Документ",
+                    ),
+                ),
+                (
+                    "role",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="document_grants",
+                        to="users.role",
+                        verbose_name="Роль",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="document_grants",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Доступ к документу",
+                "verbose_name_plural": "Доступы к документам",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(fields=["owner", "id"], name="documents_owner_id_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="documentgrant",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    models.Q(("role__isnull", True), ("user__isnull", False)),
+                    models.Q(("role__isnull", False), ("user__isnull", True)),
+                    _connector="OR",
+                ),
+                name="documents_grant_user_xor_role",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="documentgrant",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("user__isnull", False)),
+                fields=("user", "document"),
+                name="documents_grant_user_document_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="documentgrant",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("role__isnull", False)),
+                fields=("role", "document"),
+                name="documents_grant_role_document_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_demo_documents(apps, schema_editor):
+    """
+    Создает документы тестового пользователя: свои и выданные роли
+    "Пользователь" (их видят все обладатели роли).
+    """
+    user_model = apps.get_model("users", "CustomUser")
+    role_model = apps.get_model("users", "Role")
+    document_model = apps.get_model("documents", "Document")
+    grant_model = apps.get_model("documents", "DocumentGrant")
+
+    user = user_model.objects.filter(email="user@example.com").first()
+    if user is None or document_model.objects.exists():
+        return
+
+    document_model.objects.create(owner=user, title="Мой первый документ")
+    document_model.objects.create(owner=user, title="Мой секретный план")
+
+    user_role = role_model.objects.filter(name="Пользователь").first()
+    admin = user_model.objects.filter(email="admin@example.com").first()
+    if user_role is not None and admin is not None:
+        rules = document_model.objects.create(
+            owner=admin, title="Правила работы с документами"
+        )
+        grant_model.objects.create(document=rules, role=user_role)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("documents", "0001_initial"),
+        ("users", "0003_populate_initial_data"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_demo_documents, migrations.RunPython.noop),
+    ]
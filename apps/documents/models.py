@@ -1 +1,120 @@
-# Create your models here.
+from django.db import models
+from django.db.models import Q
+
+from apps.users.models import CustomUser, Role, RoleClosure
+
+
+class DocumentQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Документы, которые видит пользователь: свои и выданные ему лично или
+        его ролям (с учетом наследования ролей). Права проверяются в SQL
+        одним запросом: id видимых документов собираются объединением
+        (UNION ALL) трех индексированных выборок, без перебора документов.
+        """
+        if user.is_superuser:
+            return self.all()
+
+        # Фильтры по id: в stateless-режиме user — RBACTokenUser, не модель
+        user_roles = CustomUser.roles.through.objects.filter(customuser_id=user.pk)
+        role_ids = RoleClosure.objects.filter(
+            descendant__in=user_roles.values("role_id")
+        ).values("ancestor_id")
+        owned = Document.objects.filter(owner_id=user.pk).values("pk")
+        granted_to_user = DocumentGrant.objects.filter(user_id=user.pk).values(
+            "document_id"
+        )
+        granted_to_roles = DocumentGrant.objects.filter(role__in=role_ids).values(
+            "document_id"
+        )
+        return self.filter(
+            pk__in=owned.union(granted_to_user, granted_to_roles, all=True)
+        )
+
+
+class Document(models.Model):
+    """
+    Модель Документов.
+    """
+
+    # Индекс (owner, id) ниже заменяет индекс внешнего ключа
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="documents",
+        verbose_name="Владелец",
+        db_index=False,
+    )
+    title = models.CharField("Название", max_length=255)
+    content = models.TextField("Содержимое", blank=True)
+    created_at = models.DateTimeField("Создан", auto_now_add=True)
+
+    objects = DocumentQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Документ"
+        verbose_name_plural = "Документы"
+        indexes = [
+            models.Index(fields=["owner", "id"], name="documents_owner_id_idx"),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class DocumentGrant(models.Model):
+    """
+    Доступ к документу, выданный пользователю или роли (ровно одному из них).
+    Доступ роли получают и ее потомки (см. apps.users.hierarchy).
+    """
+
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,
+        related_name="grants",
+        verbose_name="Документ",
+    )
+    # Индексы внешних ключей заменяют частичные уникальные индексы ниже
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="document_grants",
+        verbose_name="Пользователь",
+        db_index=False,
+    )
+    role = models.ForeignKey(
+        Role,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="document_grants",
+        verbose_name="Роль",
+        db_index=False,
+    )
+
+    class Meta:
+        verbose_name = "Доступ к документу"
+        verbose_name_plural = "Доступы к документам"
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(user__isnull=False, role__isnull=True)
+                | Q(user__isnull=True, role__isnull=False),
+                name="documents_grant_user_xor_role",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "document"],
+                condition=Q(user__isnull=False),
+                name="documents_grant_user_document_uniq",
+            ),
+            models.UniqueConstraint(
+                fields=["role", "document"],
+                condition=Q(role__isnull=False),
+                name="documents_grant_role_document_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        grantee = f"user {self.user_id}" if self.user_id else f"role {self.role_id}"
+        return f"{self.document_id}: {grantee}"
@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+from .models import Document
+
+
+class DocumentSerializer(serializers.ModelSerializer):
+    """Сериализатор для списка документов."""
+
+    class Meta:
+        model = Document
+        fields = ["id", "title", "owner", "created_at"]
+        read_only_fields = fields
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.users.response_cache import bump_data_version
+
+from .models import Document, DocumentGrant
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=DocumentGrant)
+@receiver(post_delete, sender=DocumentGrant)
+def invalidate_on_document_change(sender, **kwargs):
+    """
+    Сбрасывает кэш списков документов при изменении документов и доступов.
+    Изменения ролей сбрасывают его через версию RBAC (cache_response(rbac=True)).
+    """
+    transaction.on_commit(lambda: bump_data_version("documents"))
@@ -1 +1,94 @@
-# Create your tests here.
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.users.models import CustomUser, Role
+from apps.users.tests import RBACStateMixin
+
+from .models import Document, DocumentGrant
+from .views import UserDocumentListView
+
+
+class VisibleToTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = CustomUser.objects.create_user(email="owner@example.com")
+        self.reader = CustomUser.objects.create_user(email="reader@example.com")
+        self.parent = Role.objects.create(name="Отдел")
+        self.child = Role.objects.create(name="Сотрудник отдела")
+        self.child.parents.add(self.parent)
+        self.reader.roles.add(self.child)
+
+        self.own = Document.objects.create(owner=self.reader, title="Свой")
+        self.personal = Document.objects.create(owner=self.owner, title="Лично")
+        self.inherited = Document.objects.create(owner=self.owner, title="Отделу")
+        self.private = Document.objects.create(owner=self.owner, title="Закрытый")
+        DocumentGrant.objects.create(document=self.personal, user=self.reader)
+        DocumentGrant.objects.create(document=self.inherited, role=self.parent)
+        # Свой документ, выданный еще и лично, не должен задваиваться
+        DocumentGrant.objects.create(document=self.own, user=self.reader)
+
+    def test_owned_granted_and_inherited_documents_are_visible(self):
+        with self.assertNumQueries(1):
+            visible = list(Document.objects.visible_to(self.reader).order_by("pk"))
+        self.assertEqual(visible, [self.own, self.personal, self.inherited])
+
+    def test_losing_role_parent_hides_role_documents(self):
+        self.child.parents.remove(self.parent)
+        self.assertNotIn(self.inherited, Document.objects.visible_to(self.reader))
+
+    def test_stranger_sees_nothing_of_others(self):
+        stranger = CustomUser.objects.create_user(email="stranger@example.com")
+        self.assertFalse(Document.objects.visible_to(stranger).exists())
+
+    def test_superuser_sees_everything(self):
+        root = CustomUser.objects.create_superuser(email="root@example.com")
+        self.assertEqual(
+            Document.objects.visible_to(root).count(), Document.objects.count()
+        )
+
+
+class UserDocumentListTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(email="reader@example.com")
+        self.user.roles.add(Role.objects.get(name="Пользователь"))
+        self.documents = [
+            Document.objects.create(owner=self.user, title=f"Документ {i}")
+            for i in range(3)
+        ]
+
+    def _get(self, path="/api/docs/my/"):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=self.user)
+        response = async_to_sync(UserDocumentListView.as_view())(request)
+        return json.loads(response.content)
+
+    def test_pages_follow_keyset_links(self):
+        expected = list(
+            Document.objects.visible_to(self.user)
+            .order_by("-pk")
+            .values_list("pk", flat=True)
+        )
+        self.assertGreater(len(expected), 2)
+
+        pages, path = [], "/api/docs/my/?page_size=2"
+        while path:
+            page = self._get(path)
+            pages.append([item["id"] for item in page["results"]])
+            path = page["next"]
+
+        self.assertEqual(pages[0], expected[:2])
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+    def test_new_grant_invalidates_cached_list(self):
+        self._get()
+        other = CustomUser.objects.create_user(email="owner@example.com")
+        shared = Document.objects.create(owner=other, title="Общий")
+        with self.captureOnCommitCallbacks(execute=True):
+            DocumentGrant.objects.create(document=shared, user=self.user)
+
+        ids = [item["id"] for item in self._get()["results"]]
+        self.assertIn(shared.pk, ids)
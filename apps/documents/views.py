@@ -1,41 +1,62 @@
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.views import APIView
 
+from apps.users.async_views import AsyncAPIView
+from apps.users.pagination import KeysetPagination
 from apps.users.permissions import HasPermission
+from apps.users.response_cache import cache_response
 
+from .models import Document
+from .serializers import DocumentSerializer
 
-class PublicInfoView(APIView):
+
+class PublicInfoView(AsyncAPIView):
     permission_classes = [AllowAny]
+    max_queries = 0
 
-    def get(self, request):
+    async def get(self, request):
         _ = self.permission_classes
         return Response({"message": "Это публичная информация. Ее могут видеть все."})
 
 
-class UserDocumentListView(APIView):
+class DocumentPagination(KeysetPagination):
+    """Новые документы первыми."""
+
+    keyset_fields = ("id",)
+
+
+class UserDocumentListView(AsyncAPIView):
+    """
+    Документы, доступные пользователю: свои и выданные ему или его ролям.
+    Права на документы проверяются в SQL (Document.objects.visible_to),
+    список постраничный (keyset по id, ссылка next).
+    """
+
     permission_classes = [IsAuthenticated, HasPermission]
     required_permissions = ["view_own_documents"]
+    max_queries = 4
 
-    def get(self, request):
+    @cache_response("documents", per_user=True, rbac=True)
+    async def get(self, request):
         _ = self.required_permissions
-        return Response(
-            {
-                "message": f"Привет, {request.user.email}"
-                f"! Здесь список твоих личных документов.",
-                "documents": [
-                    {"id": 1, "title": "Мой первый документ"},
-                    {"id": 2, "title": "Мой секретный план"},
-                ],
-            }
+        paginator = DocumentPagination()
+        queryset = Document.objects.visible_to(request.user).only(
+            "id", "title", "owner_id", "created_at"
+        )
+        page = await paginator.apaginate_queryset(queryset, request, self)
+        return paginator.get_paginated_response(
+            DocumentSerializer(page, many=True).data
         )
 
 
-class AdminReportView(APIView):
+class AdminReportView(AsyncAPIView):
     permission_classes = [IsAuthenticated, HasPermission]
     required_permissions = ["view_financial_reports"]
+    max_queries = 4
 
-    def get(self, request):
+    # Отчет одинаков для всех, у кого есть view_financial_reports
+    @cache_response("reports")
+    async def get(self, request):
         _ = self.required_permissions
         return Response(
             {
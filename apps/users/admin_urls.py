@@ -1,13 +1,27 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import PermissionViewSet, RoleViewSet, UserRoleAssignmentView
+from .views import (
+    BulkUserRoleAssignmentView,
+    PermissionViewSet,
+    RoleViewSet,
+    UserImportView,
+    UserRoleAssignmentView,
+    UserViewSet,
+)
 
 router = DefaultRouter()
 router.register(r"permissions", PermissionViewSet, basename="permission")
 router.register(r"roles", RoleViewSet, basename="role")
+router.register(r"users", UserViewSet, basename="user")
 
 urlpatterns = [
     path("", include(router.urls)),
     path("assign-role/", UserRoleAssignmentView.as_view(), name="assign-role"),
+    path(
+        "assign-role/bulk/",
+        BulkUserRoleAssignmentView.as_view(),
+        name="assign-role-bulk",
+    ),
+    path("users/import/", UserImportView.as_view(), name="user-import"),
 ]
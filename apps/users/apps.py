@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.users"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .keyring import check_key_ring, install
+
+        checks.register(check_key_ring, checks.Tags.security)
+        install()
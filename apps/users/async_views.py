@@ -0,0 +1,165 @@
+"""
+Асинхронный dispatch для DRF-представлений.
+
+DRF выполняет аутентификацию, проверку разрешений и троттлинг синхронно,
+поэтому под ASGI каждый запрос уходит в пул потоков. Представления с
+async-обработчиками (async def get/post/...) проходят весь путь в event loop:
+- аутентификаторы с методом aauthenticate вызываются напрямую;
+- разрешения с методом ahas_permission вызываются напрямую, встроенные
+  разрешения DRF (проверяют только request.user) — синхронно в loop;
+- остальные аутентификаторы, разрешения и троттлинг — через sync_to_async.
+
+Синхронные представления работают как раньше.
+"""
+
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.permissions import (
+    AllowAny,
+    IsAdminUser,
+    IsAuthenticated,
+    IsAuthenticatedOrReadOnly,
+)
+from rest_framework.views import APIView
+
+# Разрешения без ввода-вывода: безопасно вызывать прямо в event loop
+INLINE_PERMISSIONS = (AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly)
+
+
+class AsyncViewMixin:
+    """
+    Подмешивается перед APIView (или его наследником) и включает
+    асинхронный dispatch, если все обработчики представления — async.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.view_is_async:
+            return super().dispatch(request, *args, **kwargs)
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.render_response(self.response)
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        Асинхронный аналог APIView.initial().
+        """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        await self.acheck_permissions(request)
+        await self.acheck_throttles(request)
+
+    async def aperform_authentication(self, request):
+        """
+        Асинхронный аналог Request._authenticate().
+        """
+        for authenticator in request.authenticators:
+            aauthenticate = getattr(authenticator, "aauthenticate", None)
+            try:
+                if aauthenticate is not None:
+                    user_auth_tuple = await aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(
+                        request
+                    )
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                # Флаги stateless-пользователя с устаревшими клеймами
+                # загружаются здесь, а не синхронно при первом обращении
+                aload_claims = getattr(request.user, "aload_claims", None)
+                if aload_claims is not None:
+                    await aload_claims()
+                return
+
+        request._not_authenticated()
+
+    async def acheck_permissions(self, request):
+        for permission in self.get_permissions():
+            ahas_permission = getattr(permission, "ahas_permission", None)
+            if ahas_permission is not None:
+                allowed = await ahas_permission(request, self)
+            elif isinstance(permission, INLINE_PERMISSIONS):
+                allowed = permission.has_permission(request, self)
+            else:
+                allowed = await sync_to_async(permission.has_permission)(request, self)
+
+            if not allowed:
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, "message", None),
+                    code=getattr(permission, "code", None),
+                )
+
+    async def acheck_throttles(self, request):
+        durations = []
+        for throttle in self.get_throttles():
+            aallow_request = getattr(throttle, "aallow_request", None)
+            if aallow_request is not None:
+                allowed = await aallow_request(request, self)
+            else:
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                durations.append(throttle.wait())
+
+        if durations:
+            durations = [duration for duration in durations if duration is not None]
+            self.throttled(request, max(durations, default=None))
+
+    @staticmethod
+    def render_response(response):
+        """
+        Рендерит ответ в event loop. Отложенный рендеринг Response Django
+        под ASGI выполняет через sync_to_async, поэтому наружу отдается
+        уже готовый HttpResponse.
+        """
+        response.render()
+        rendered = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+            rendered[header] = value
+        rendered.cookies = response.cookies
+        return rendered
+
+
+class AsyncAPIView(AsyncViewMixin, APIView):
+    """
+    APIView с асинхронным dispatch.
+    """
@@ -0,0 +1,246 @@
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .bitmap import mask_from_hex
+from .cache import aget_rbac_version, get_rbac_version
+from .metrics import TOKENS_VERIFIED
+from .revocation import (
+    ais_revoked,
+    arevocation_epoch,
+    is_revoked,
+    revocation_epoch,
+)
+from .token_cache import discard, get_verified, set_verified
+from .tokens import PERMISSIONS_CLAIM, RBAC_VERSION_CLAIM
+from .user_cache import aget_user, get_user
+
+
+class RBACTokenUser(TokenUser):
+    """
+    Легковесный пользователь, построенный из клеймов access-токена.
+
+    Клеймам (маске разрешений и флагам is_staff, is_superuser) доверяют,
+    только пока версия RBAC совпадает с той, на которой выпущен токен.
+    Иначе флаги берутся из кэша пользователей (см. apps.users.user_cache),
+    а маска — из кэша разрешений.
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    @cached_property
+    def claims_are_fresh(self):
+        return self.token.get(RBAC_VERSION_CLAIM) == get_rbac_version()
+
+    @cached_property
+    def stored_user(self):
+        return get_user(self.id)
+
+    async def aload_claims(self):
+        """
+        Готовит проверку клеймов в асинхронном коде: загружает версию RBAC
+        и, если клеймы устарели, пользователя, без синхронного ввода-вывода.
+        """
+        await aget_rbac_version()
+        if not self.claims_are_fresh and "stored_user" not in self.__dict__:
+            self.__dict__["stored_user"] = await aget_user(self.id)
+
+    def _flag(self, name):
+        if self.claims_are_fresh:
+            return bool(self.token.get(name, False))
+        user = self.stored_user
+        if user is None or not user.is_active or user.is_deleted:
+            return False
+        return getattr(user, name)
+
+    @property
+    def is_staff(self):
+        return self._flag("is_staff")
+
+    @property
+    def is_superuser(self):
+        return self._flag("is_superuser")
+
+    @cached_property
+    def token_permission_mask(self):
+        """
+        Маска разрешений из токена или None, если с момента выпуска токена
+        версия RBAC изменилась и клеймам больше нельзя доверять.
+        """
+        if not self.claims_are_fresh:
+            return None
+        return mask_from_hex(self.token.get(PERMISSIONS_CLAIM))
+
+
+class RevocationCheckMixin:
+    """
+    Отклоняет отозванные токены (см. apps.users.revocation).
+    Проверенные токены кэшируются в процессе (см. apps.users.token_cache):
+    подпись повторно не проверяется, а отзыв — только если с прошлой
+    проверки в фильтре отзывов появились новые записи.
+    aauthenticate — аутентификация для асинхронных представлений
+    (см. apps.users.async_views).
+    """
+
+    def get_validated_token(self, raw_token):
+        epoch = revocation_epoch()
+        cached = get_verified(raw_token)
+        if cached is not None and cached[1] == epoch:
+            TOKENS_VERIFIED.labels("valid").inc()
+            return cached[0]
+
+        validated_token = cached[0] if cached else self.verify_token(raw_token)
+        if is_revoked(validated_token):
+            self.reject_revoked(raw_token)
+        set_verified(raw_token, validated_token, epoch)
+        TOKENS_VERIFIED.labels("valid").inc()
+        return validated_token
+
+    async def aget_validated_token(self, raw_token):
+        epoch = await arevocation_epoch()
+        cached = get_verified(raw_token)
+        if cached is not None and cached[1] == epoch:
+            TOKENS_VERIFIED.labels("valid").inc()
+            return cached[0]
+
+        # Разбор и проверка подписи — чистые вычисления, их можно делать в loop
+        validated_token = cached[0] if cached else self.verify_token(raw_token)
+        if await ais_revoked(validated_token):
+            self.reject_revoked(raw_token)
+        set_verified(raw_token, validated_token, epoch)
+        TOKENS_VERIFIED.labels("valid").inc()
+        return validated_token
+
+    def reject_revoked(self, raw_token):
+        discard(raw_token)
+        TOKENS_VERIFIED.labels("revoked").inc()
+        raise InvalidToken("Токен отозван")
+
+    def verify_token(self, raw_token):
+        """
+        Проверка подписи и срока действия токена (без проверки отзыва).
+        """
+        try:
+            return super().get_validated_token(raw_token)
+        except InvalidToken:
+            TOKENS_VERIFIED.labels("invalid").inc()
+            raise
+
+    async def aget_user(self, validated_token):
+        return self.get_user(validated_token)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = await self.aget_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+
+class RevocableJWTAuthentication(RevocationCheckMixin, JWTAuthentication):
+    """
+    Аутентификация по JWT с загрузкой пользователя и проверкой отзыва.
+    """
+
+    async def aget_user(self, validated_token):
+        """
+        Асинхронный JWTAuthentication.get_user().
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class CachedUserJWTAuthentication(RevocableJWTAuthentication):
+    """
+    RevocableJWTAuthentication, загружающая пользователя через кэш
+    (см. apps.users.user_cache) и отклоняющая удаленных пользователей.
+    С CHECK_REVOKE_TOKEN нужен хэш пароля, поэтому пользователь
+    загружается из БД целиком.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return self.check_user(super().get_user(validated_token))
+        return self.check_user(get_user(self.get_user_id(validated_token)))
+
+    async def aget_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return self.check_user(await super().aget_user(validated_token))
+        return self.check_user(await aget_user(self.get_user_id(validated_token)))
+
+    def get_user_id(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+        return self.user_model._meta.pk.to_python(user_id)
+
+    def check_user(self, user):
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if user.is_deleted:
+            raise AuthenticationFailed("Пользователь удален", code="user_deleted")
+
+        return user
+
+
+class StatelessJWTAuthentication(RevocationCheckMixin, JWTStatelessUserAuthentication):
+    """
+    Аутентификация по JWT без загрузки пользователя из базы данных.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Токен не содержит идентификатор пользователя")
+
+        return RBACTokenUser(validated_token)
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+
+UserModel = get_user_model()
+
+
+class PooledHashingBackend(ModelBackend):
+    """
+    ModelBackend, который проверяет пароль в ограниченном пуле хэширования
+    (см. apps.users.hashing). При перегрузке пула поднимает HashingUnavailable.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Хэшируем и для несуществующего пользователя, чтобы время ответа
+            # не выдавало, зарегистрирован ли email
+            hashing.make_password(password)
+            return None
+
+        is_correct, must_update = hashing.verify_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            # Параметры хэшера изменились — обновляем хэш
+            user.password = hashing.make_password(password)
+            user.save(update_fields=["password"])
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            await hashing.amake_password(password)
+            return None
+
+        is_correct, must_update = await hashing.averify_password(
+            password, user.password
+        )
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = await hashing.amake_password(password)
+            await user.asave(update_fields=["password"])
+        return user
@@ -0,0 +1,570 @@
+"""
+Нагрузочный бенчмарк API.
+
+Создает синтетический набор данных (N пользователей, R ролей, P разрешений)
+через модели и прогоняет по каждому маршруту API серию запросов через
+тестовый клиент Django в текущем процессе. Для каждого сценария считаются
+p50/p95/p99 задержки, пропускная способность (один клиент, запросы
+последовательно) и число SQL-запросов на HTTP-запрос.
+
+Результаты сравниваются с порогами (абсолютными и/или относительно
+предыдущего прогона), чтобы регрессии в HasPermission, сериализаторах
+и т.д. были видны в CI.
+"""
+
+import io
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Max, Min
+from rest_framework.request import Request
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework.test import APIRequestFactory
+
+from apps.documents.models import Document, DocumentGrant
+
+from . import bulk, token_cache
+from .models import CustomUser, Permission, Role
+from .rotation import issue_token_pair
+from .tokens import get_token_for_user
+
+PERCENTILES = (50, 95, 99)
+BENCH_PASSWORD = "bench-password-123"
+BENCH_PREFIX = "bench"
+
+
+def percentile(samples, pct):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(samples)
+    index = max(0, -(-len(ordered) * pct // 100) - 1)
+    return ordered[index]
+
+
+@dataclass
+class BenchContext:
+    """Данные, созданные seed(), и токены для сценариев."""
+
+    admin: CustomUser
+    user: CustomUser
+    user_ids: list
+    role_ids: list
+    password_hash: str
+    rng: random.Random
+    tokens: dict = field(default_factory=dict)
+
+    def token(self, user):
+        return str(get_token_for_user(user).access_token)
+
+
+@dataclass
+class BenchRequest:
+    method: str
+    path: str
+    data: object = None
+    token: str = None
+    multipart: bool = False
+
+
+def seed(users, roles, permissions, roles_per_user=3, permissions_per_role=10, rng=0):
+    """
+    Создает синтетические разрешения, роли и пользователей, а также двух
+    пользователей для сценариев: администратора (роль со всеми реальными
+    разрешениями, не суперпользователь — проверка HasPermission не
+    пропускается) и обычного пользователя.
+    """
+    rng = random.Random(rng)
+    real_permissions = list(Permission.objects.all())
+
+    synthetic_permissions = [
+        Permission.objects.create(name=f"{BENCH_PREFIX}_perm_{index}")
+        for index in range(permissions)
+    ]
+    synthetic_roles = []
+    for index in range(roles):
+        role = Role.objects.create(name=f"{BENCH_PREFIX}_role_{index}")
+        if synthetic_permissions:
+            role.permissions.add(
+                *rng.sample(
+                    synthetic_permissions,
+                    min(permissions_per_role, len(synthetic_permissions)),
+                )
+            )
+        if index:
+            # Дерево наследования: у каждой роли до четырех дочерних
+            role.parents.add(synthetic_roles[(index - 1) // 4])
+        synthetic_roles.append(role)
+
+    password_hash = make_password(BENCH_PASSWORD)
+    CustomUser.objects.bulk_create(
+        (
+            CustomUser(
+                email=f"{BENCH_PREFIX}-{index}@example.com",
+                password=password_hash,
+                first_name="Бенчмарк",
+                last_name=f"Пользователь{index}",
+            )
+            for index in range(users)
+        ),
+        batch_size=1000,
+    )
+    user_ids = list(
+        CustomUser.objects.filter(
+            email__startswith=f"{BENCH_PREFIX}-", email__endswith="@example.com"
+        ).values_list("pk", flat=True)
+    )
+
+    users_by_role = {role.pk: [] for role in synthetic_roles}
+    if synthetic_roles:
+        for user_id in user_ids:
+            for role in rng.sample(
+                synthetic_roles, min(roles_per_user, len(synthetic_roles))
+            ):
+                users_by_role[role.pk].append(user_id)
+    for role_id, role_user_ids in users_by_role.items():
+        bulk.assign_roles(role_user_ids, [role_id])
+
+    admin_role = Role.objects.create(name=f"{BENCH_PREFIX}_admin")
+    admin_role.permissions.add(*real_permissions)
+    admin = CustomUser.objects.create(
+        email=f"{BENCH_PREFIX}-admin@example.com", password=password_hash
+    )
+    admin.roles.add(admin_role)
+
+    user = CustomUser.objects.create(
+        email=f"{BENCH_PREFIX}-user@example.com", password=password_hash
+    )
+    user.roles.add(Role.objects.get(name="Пользователь"), *synthetic_roles[:3])
+
+    context = BenchContext(
+        admin=admin,
+        user=user,
+        user_ids=user_ids,
+        role_ids=[role.pk for role in synthetic_roles],
+        password_hash=password_hash,
+        rng=rng,
+    )
+    context.tokens = {"admin": context.token(admin), "user": context.token(user)}
+    return context
+
+
+SCENARIOS = {}
+
+
+def scenario(name, expected_status=200):
+    """
+    Регистрирует сценарий: функцию (context, iteration) -> BenchRequest.
+    Подготовка внутри функции в замер не входит.
+    """
+
+    def decorator(build):
+        SCENARIOS[name] = (build, expected_status)
+        return build
+
+    return decorator
+
+
+@scenario("public")
+def _public(ctx, i):
+    return BenchRequest("get", "/api/public/")
+
+
+@scenario("register", expected_status=201)
+def _register(ctx, i):
+    return BenchRequest(
+        "post",
+        "/api/auth/register/",
+        {
+            "email": f"{BENCH_PREFIX}-register-{i}@example.com",
+            "password": BENCH_PASSWORD,
+            "password2": BENCH_PASSWORD,
+        },
+    )
+
+
+@scenario("login")
+def _login(ctx, i):
+    return BenchRequest(
+        "post",
+        "/api/auth/login/",
+        {"email": ctx.user.email, "password": BENCH_PASSWORD},
+    )
+
+
+@scenario("refresh")
+def _refresh(ctx, i):
+    # Обновленный токен в ответе не виден сценарию: каждая итерация
+    # начинает свою цепочку
+    refresh = issue_token_pair(ctx.user)
+    return BenchRequest("post", "/api/auth/refresh/", {"refresh": str(refresh)})
+
+
+@scenario("logout", expected_status=204)
+def _logout(ctx, i):
+    # Каждый выход отзывает токен, поэтому токен новый на каждую итерацию
+    return BenchRequest("post", "/api/auth/logout/", {}, token=ctx.token(ctx.user))
+
+
+@scenario("me")
+def _me(ctx, i):
+    return BenchRequest("get", "/api/auth/me/", token=ctx.tokens["user"])
+
+
+@scenario("me_update")
+def _me_update(ctx, i):
+    return BenchRequest(
+        "patch", "/api/auth/me/", {"first_name": f"Имя{i}"}, token=ctx.tokens["user"]
+    )
+
+
+@scenario("me_delete", expected_status=204)
+def _me_delete(ctx, i):
+    user = CustomUser.objects.create(
+        email=f"{BENCH_PREFIX}-delete-{i}@example.com", password=ctx.password_hash
+    )
+    return BenchRequest("delete", "/api/auth/me/", token=ctx.token(user))
+
+
+@scenario("docs_my")
+def _docs_my(ctx, i):
+    return BenchRequest("get", "/api/docs/my/", token=ctx.tokens["user"])
+
+
+@scenario("report_financial")
+def _report_financial(ctx, i):
+    return BenchRequest("get", "/api/reports/financial/", token=ctx.tokens["admin"])
+
+
+@scenario("report_financial_denied", expected_status=403)
+def _report_financial_denied(ctx, i):
+    return BenchRequest("get", "/api/reports/financial/", token=ctx.tokens["user"])
+
+
+@scenario("roles_list")
+def _roles_list(ctx, i):
+    return BenchRequest("get", "/api/admin/roles/", token=ctx.tokens["admin"])
+
+
+@scenario("roles_list_expanded")
+def _roles_list_expanded(ctx, i):
+    return BenchRequest(
+        "get", "/api/admin/roles/?expand=permissions", token=ctx.tokens["admin"]
+    )
+
+
+@scenario("role_detail")
+def _role_detail(ctx, i):
+    role_id = ctx.rng.choice(ctx.role_ids)
+    return BenchRequest(
+        "get", f"/api/admin/roles/{role_id}/", token=ctx.tokens["admin"]
+    )
+
+
+@scenario("role_create", expected_status=201)
+def _role_create(ctx, i):
+    return BenchRequest(
+        "post",
+        "/api/admin/roles/",
+        {"name": f"{BENCH_PREFIX}_new_role_{i}"},
+        token=ctx.tokens["admin"],
+    )
+
+
+@scenario("permissions_list")
+def _permissions_list(ctx, i):
+    return BenchRequest("get", "/api/admin/permissions/", token=ctx.tokens["admin"])
+
+
+@scenario("users_list")
+def _users_list(ctx, i):
+    return BenchRequest("get", "/api/admin/users/", token=ctx.tokens["admin"])
+
+
+@scenario("users_search")
+def _users_search(ctx, i):
+    return BenchRequest(
+        "get",
+        f"/api/admin/users/?email={BENCH_PREFIX}-{ctx.rng.randrange(100)}",
+        token=ctx.tokens["admin"],
+    )
+
+
+@scenario("assign_role")
+def _assign_role(ctx, i):
+    return BenchRequest(
+        "post",
+        "/api/admin/assign-role/",
+        {
+            "user_id": ctx.rng.choice(ctx.user_ids),
+            "role_id": ctx.rng.choice(ctx.role_ids),
+        },
+        token=ctx.tokens["admin"],
+    )
+
+
+@scenario("assign_role_bulk")
+def _assign_role_bulk(ctx, i):
+    return BenchRequest(
+        "post",
+        "/api/admin/assign-role/bulk/",
+        {
+            "user_ids": ctx.rng.sample(ctx.user_ids, min(100, len(ctx.user_ids))),
+            "role_ids": [ctx.rng.choice(ctx.role_ids)],
+        },
+        token=ctx.tokens["admin"],
+    )
+
+
+@scenario("users_import")
+def _users_import(ctx, i):
+    rows = io.StringIO()
+    rows.write("email,password_hash,roles\n")
+    for index in range(10):
+        email = f"{BENCH_PREFIX}-import-{i}-{index}@example.com"
+        rows.write(f"{email},{ctx.password_hash},Пользователь\n")
+    upload = SimpleUploadedFile(
+        "users.csv", rows.getvalue().encode(), content_type="text/csv"
+    )
+    return BenchRequest(
+        "post",
+        "/api/admin/users/import/",
+        {"file": upload},
+        token=ctx.tokens["admin"],
+        multipart=True,
+    )
+
+
+@scenario("introspect")
+def _introspect(ctx, i):
+    # Последний: пакет заполняет кэш сотнями записей и в locmem (300 записей
+    # по умолчанию) вытеснил бы данные остальных сценариев.
+    # Пакет шлюза: половина — токены, половина — пары (пользователь, разрешение);
+    # шлюз проверяет одних и тех же активных пользователей
+    user_ids = ctx.user_ids[:100]
+    tokens = user_ids[: len(user_ids) // 2]
+    permissions = [f"{BENCH_PREFIX}_perm_{index}" for index in range(3)]
+    items = [
+        {"token": ctx.token(user), "permissions": permissions}
+        for user in CustomUser.objects.filter(pk__in=tokens)
+    ]
+    items += [
+        {"subject": user_id, "permissions": permissions}
+        for user_id in user_ids[len(tokens) :]
+    ]
+    return BenchRequest(
+        "post", "/api/auth/introspect/", {"items": items}, token=ctx.tokens["admin"]
+    )
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _send(client, request):
+    extra = {}
+    if request.token:
+        extra["HTTP_AUTHORIZATION"] = f"Bearer {request.token}"
+    send = getattr(client, request.method)
+    if request.multipart:
+        return send(request.path, request.data, **extra)
+    if request.method == "get":
+        return send(request.path, **extra)
+    return send(request.path, request.data, content_type="application/json", **extra)
+
+
+def run_scenario(client, context, name, iterations, warmup=5):
+    """
+    Выполняет сценарий и возвращает словарь с метриками.
+    """
+    build, expected_status = SCENARIOS[name]
+    timings, queries, statuses = [], [], Counter()
+    counter = _QueryCounter()
+    with connection.execute_wrapper(counter):
+        for iteration in range(warmup + iterations):
+            request = build(context, iteration)
+            counter.count = 0
+            started = time.perf_counter()
+            response = _send(client, request)
+            elapsed = time.perf_counter() - started
+            if iteration < warmup:
+                continue
+            timings.append(elapsed)
+            queries.append(counter.count)
+            statuses[response.status_code] += 1
+
+    total = sum(timings)
+    result = {
+        "method": request.method.upper(),
+        "path": request.path,
+        "iterations": iterations,
+        "expected_status": expected_status,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "errors": iterations - statuses[expected_status],
+        "mean_ms": round(total / iterations * 1000, 3),
+        "rps": round(iterations / total, 1) if total else 0.0,
+        "queries_mean": round(sum(queries) / iterations, 2),
+        "queries_max": max(queries),
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(timings, pct) * 1000, 3)
+    return result
+
+
+def seed_documents(context, documents, grants_per_user, batch_size=10000):
+    """
+    Создает documents документов случайных владельцев и доступы к ним:
+    пользователю сценариев и еще до 100 пользователям — по grants_per_user
+    личных доступов, каждой синтетической роли — столько же доступов роли.
+    Пользователь сценариев видит документы своих ролей и их предков.
+    """
+    rng = context.rng
+    owners = context.user_ids or [context.user.pk]
+
+    def document(index):
+        # Каждый тысячный документ — собственный у пользователя сценариев
+        owner_id = context.user.pk if index % 1000 == 0 else rng.choice(owners)
+        return Document(owner_id=owner_id, title=f"{BENCH_PREFIX} {index}")
+
+    Document.objects.bulk_create(
+        (document(index) for index in range(documents)), batch_size=batch_size
+    )
+    bounds = Document.objects.aggregate(first=Min("pk"), last=Max("pk"))
+    if bounds["first"] is None:
+        return
+    document_ids = range(bounds["first"], bounds["last"] + 1)
+    count = min(grants_per_user, len(document_ids))
+
+    grantees = [("user_id", context.user.pk)]
+    grantees += [("user_id", pk) for pk in context.user_ids[:100]]
+    grantees += [("role_id", pk) for pk in context.role_ids]
+    DocumentGrant.objects.bulk_create(
+        (
+            DocumentGrant(document_id=document_id, **{field: pk})
+            for field, pk in grantees
+            for document_id in rng.sample(document_ids, count)
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+def measure_document_listing(context, iterations, page_size=50):
+    """
+    Первая и средняя страница списка документов пользователя сценариев
+    (Document.objects.visible_to, keyset по id) в обход кэша ответов:
+    p50/p95, мс, и число SQL-запросов на страницу.
+    """
+    visible = Document.objects.visible_to(context.user)
+    ids = list(visible.order_by("-pk").values_list("pk", flat=True))
+    middle = ids[len(ids) // 2] if ids else 0
+    pages = {
+        "first_page": visible.order_by("-pk"),
+        "middle_page": visible.filter(pk__lt=middle).order_by("-pk"),
+    }
+
+    result = {
+        "documents": Document.objects.count(),
+        "grants": DocumentGrant.objects.count(),
+        "visible": len(ids),
+    }
+    counter = _QueryCounter()
+    for name, queryset in pages.items():
+        timings = []
+        with connection.execute_wrapper(counter):
+            for _ in range(iterations):
+                counter.count = 0
+                started = time.perf_counter()
+                list(queryset[:page_size])
+                timings.append(time.perf_counter() - started)
+        result[name] = {
+            "queries": counter.count,
+            **{
+                f"p{pct}_ms": round(percentile(timings, pct) * 1000, 3)
+                for pct in (50, 95)
+            },
+        }
+    return result
+
+
+def measure_auth_overhead(context, iterations):
+    """
+    Время аутентификации запроса по access-токену (DEFAULT_AUTHENTICATION_CLASSES),
+    мкс, p50: без кэша проверенных токенов (каждый раз полная проверка)
+    и с ним (клиент повторяет один и тот же токен).
+    """
+    authenticator = drf_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+    request = Request(
+        APIRequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {context.tokens['user']}"
+        )
+    )
+    # Прогрев кэшей пользователя и журнала отзывов
+    authenticator.authenticate(request)
+
+    def measure(cold):
+        timings = []
+        for _ in range(iterations):
+            if cold:
+                token_cache.clear()
+            started = time.perf_counter()
+            authenticator.authenticate(request)
+            timings.append(time.perf_counter() - started)
+        return percentile(timings, 50) * 1_000_000
+
+    uncached, cached = measure(cold=True), measure(cold=False)
+    return {
+        "uncached_us": round(uncached, 1),
+        "cached_us": round(cached, 1),
+        "speedup": round(uncached / cached, 1),
+    }
+
+
+def check_thresholds(results, thresholds):
+    """
+    Сравнивает результаты с абсолютными порогами вида
+    {"сценарий": {"p95_ms": 50, "queries_max": 4, "rps": 100}}.
+    rps — нижняя граница, остальные метрики — верхние.
+    """
+    violations = []
+    for name, limits in thresholds.items():
+        result = results.get(name)
+        if result is None:
+            continue
+        for metric, limit in limits.items():
+            value = result[metric]
+            failed = value < limit if metric == "rps" else value > limit
+            if failed:
+                violations.append(f"{name}: {metric}={value} (порог {limit})")
+    return violations
+
+
+def check_baseline(results, baseline, tolerance):
+    """
+    Сравнивает результаты с предыдущим прогоном: p95 не должен вырасти
+    больше чем на tolerance (доля), число запросов к БД — вообще.
+    """
+    violations = []
+    for name, previous in baseline.get("results", {}).items():
+        result = results.get(name)
+        if result is None:
+            continue
+        limit = round(previous["p95_ms"] * (1 + tolerance), 3)
+        if result["p95_ms"] > limit:
+            violations.append(
+                f"{name}: p95_ms={result['p95_ms']} (было {previous['p95_ms']})"
+            )
+        if result["queries_max"] > previous["queries_max"]:
+            violations.append(
+                f"{name}: queries_max={result['queries_max']} "
+                f"(было {previous['queries_max']})"
+            )
+    return violations
@@ -0,0 +1,78 @@
+"""
+Битовое представление разрешений.
+
+Каждому разрешению (Permission.bit_index) соответствует один бит. Маска
+пользователя собирается из битов его эффективных разрешений
+(UserEffectivePermission) и передается в токене hex-строкой, так как число
+разрешений не ограничено 64 битами. Проверка required_permissions — одно
+побитовое AND.
+"""
+
+from .cache import aget_rbac_version, get_rbac_version
+
+_bit_indexes = {"version": None, "bits": {}}
+
+
+def mask_to_hex(mask):
+    return format(mask, "x")
+
+
+def mask_from_hex(value):
+    return int(value or "0", 16)
+
+
+def mask_for_indexes(indexes):
+    mask = 0
+    for index in indexes:
+        mask |= 1 << index
+    return mask
+
+
+def get_bit_indexes():
+    """
+    Возвращает словарь {название разрешения: номер бита}.
+    Словарь загружается один раз на версию RBAC в каждом процессе.
+    """
+    from .models import Permission
+
+    version = get_rbac_version()
+    if _bit_indexes["version"] == version:
+        return _bit_indexes["bits"]
+
+    bits = dict(Permission.objects.values_list("name", "bit_index"))
+    _bit_indexes.update(version=version, bits=bits)
+    return bits
+
+
+async def aget_bit_indexes():
+    """
+    Асинхронный get_bit_indexes().
+    """
+    from .models import Permission
+
+    version = await aget_rbac_version()
+    if _bit_indexes["version"] == version:
+        return _bit_indexes["bits"]
+
+    bits = {
+        name: index
+        async for name, index in Permission.objects.values_list("name", "bit_index")
+    }
+    _bit_indexes.update(version=version, bits=bits)
+    return bits
+
+
+def mask_for_names(names):
+    """
+    Маска для набора названий разрешений. Неизвестные названия пропускаются.
+    """
+    bits = get_bit_indexes()
+    return mask_for_indexes(bits[name] for name in names if name in bits)
+
+
+async def amask_for_names(names):
+    """
+    Асинхронный mask_for_names().
+    """
+    bits = await aget_bit_indexes()
+    return mask_for_indexes(bits[name] for name in names if name in bits)
@@ -0,0 +1,102 @@
+"""
+Массовое назначение и снятие ролей.
+
+Пользователи обрабатываются пачками: для каждой пачки выполняется один
+bulk_create (или один DELETE) по таблице связей пользователь-роль и один
+set-based пересчет эффективных разрешений. Сигналы m2m_changed при этом не
+вызываются, поэтому кэш разрешений сбрасывается один раз после коммита.
+"""
+
+from django.db import transaction
+
+from . import effective
+from .cache import bump_rbac_version
+from .models import CustomUser
+
+UserRole = CustomUser.roles.through
+
+ASSIGNED = "assigned"
+ALREADY_ASSIGNED = "already_assigned"
+REMOVED = "removed"
+NOT_ASSIGNED = "not_assigned"
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _existing_pairs(user_ids, role_ids):
+    return set(
+        UserRole.objects.filter(
+            customuser_id__in=user_ids, role_id__in=role_ids
+        ).values_list("customuser_id", "role_id")
+    )
+
+
+def assign_roles(user_ids, role_ids, batch_size=1000, on_item=None):
+    """
+    Назначает роли role_ids пользователям user_ids (итерируемый объект).
+    on_item(user_id, role_id, status) вызывается для каждой пары.
+    Возвращает число новых назначений.
+    """
+    created = 0
+    with transaction.atomic():
+        for chunk in _chunks(user_ids, batch_size):
+            existing = _existing_pairs(chunk, role_ids)
+            new_pairs = []
+            for user_id in chunk:
+                for role_id in role_ids:
+                    pair = (user_id, role_id)
+                    if pair in existing:
+                        status = ALREADY_ASSIGNED
+                    else:
+                        status = ASSIGNED
+                        new_pairs.append(
+                            UserRole(customuser_id=user_id, role_id=role_id)
+                        )
+                    if on_item is not None:
+                        on_item(user_id, role_id, status)
+
+            UserRole.objects.bulk_create(
+                new_pairs, batch_size=batch_size, ignore_conflicts=True
+            )
+            effective.users_roles_added(chunk)
+            created += len(new_pairs)
+
+        transaction.on_commit(bump_rbac_version)
+    return created
+
+
+def remove_roles(user_ids, role_ids, batch_size=1000, on_item=None):
+    """
+    Снимает роли role_ids с пользователей user_ids (итерируемый объект).
+    on_item(user_id, role_id, status) вызывается для каждой пары.
+    Возвращает число снятых назначений.
+    """
+    removed = 0
+    with transaction.atomic():
+        for chunk in _chunks(user_ids, batch_size):
+            if on_item is not None:
+                existing = _existing_pairs(chunk, role_ids)
+                for user_id in chunk:
+                    for role_id in role_ids:
+                        status = (
+                            REMOVED if (user_id, role_id) in existing else NOT_ASSIGNED
+                        )
+                        on_item(user_id, role_id, status)
+
+            deleted, _ = UserRole.objects.filter(
+                customuser_id__in=chunk, role_id__in=role_ids
+            ).delete()
+            removed += deleted
+            effective.users_roles_removed(chunk)
+
+        transaction.on_commit(bump_rbac_version)
+    return removed
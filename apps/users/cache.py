@@ -0,0 +1,254 @@
+"""
+Кэш разрешений пользователей.
+
+Эффективная маска разрешений пользователя (см. apps.users.bitmap) хранится
+в общем кэше Django (один на все воркеры), а перед ним стоит небольшой LRU
+внутри процесса. Актуальность обеспечивается глобальным счетчиком версии
+RBAC: любое изменение ролей, разрешений или назначений ролей увеличивает
+версию, и записи, сохраненные под старой версией, больше не используются.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import PERMISSION_MASK_LOOKUPS
+
+RBAC_VERSION_KEY = "rbac:version"
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш ограниченного размера внутри процесса.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _VersionState:
+    value = None
+    checked_at = 0.0
+
+
+_version_state = _VersionState()
+_local_permissions = LRUCache(settings.RBAC_PERMISSION_CACHE["LOCAL_MAXSIZE"])
+
+
+def get_rbac_version():
+    """
+    Возвращает текущую версию RBAC.
+
+    Версия читается из общего кэша не чаще одного раза в VERSION_TTL секунд,
+    поэтому в установившемся режиме проверка не требует даже обращения к кэшу.
+    """
+    now = time.monotonic()
+    ttl = settings.RBAC_PERMISSION_CACHE["VERSION_TTL"]
+    if _version_state.value is not None and now - _version_state.checked_at < ttl:
+        return _version_state.value
+
+    version = cache.get(RBAC_VERSION_KEY)
+    if version is None:
+        # Стартуем со времени, а не с единицы: если ключ был вытеснен из
+        # кэша, новая версия не совпадет ни с одной из уже выданных.
+        cache.add(RBAC_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(RBAC_VERSION_KEY)
+
+    _version_state.value = version
+    _version_state.checked_at = now
+    return version
+
+
+async def aget_rbac_version():
+    """
+    Асинхронный get_rbac_version().
+    """
+    now = time.monotonic()
+    ttl = settings.RBAC_PERMISSION_CACHE["VERSION_TTL"]
+    if _version_state.value is not None and now - _version_state.checked_at < ttl:
+        return _version_state.value
+
+    version = await cache.aget(RBAC_VERSION_KEY)
+    if version is None:
+        await cache.aadd(RBAC_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = await cache.aget(RBAC_VERSION_KEY)
+
+    _version_state.value = version
+    _version_state.checked_at = now
+    return version
+
+
+def bump_rbac_version():
+    """
+    Увеличивает версию RBAC, делая недействительными все кэши разрешений.
+    """
+    try:
+        version = cache.incr(RBAC_VERSION_KEY)
+    except ValueError:
+        version = time.time_ns() // 1000
+        cache.set(RBAC_VERSION_KEY, version, timeout=None)
+
+    _version_state.value = version
+    _version_state.checked_at = time.monotonic()
+    _local_permissions.clear()
+    return version
+
+
+def load_user_permission_mask(user_id):
+    """
+    Загружает эффективную маску разрешений пользователя одним индексированным
+    запросом к таблице UserEffectivePermission.
+    """
+    from .bitmap import mask_for_indexes
+    from .models import UserEffectivePermission
+
+    return mask_for_indexes(
+        UserEffectivePermission.objects.filter(user_id=user_id).values_list(
+            "permission__bit_index", flat=True
+        )
+    )
+
+
+def get_user_permission_mask(user):
+    """
+    Возвращает эффективную маску разрешений пользователя (int).
+
+    Порядок поиска: LRU процесса -> общий кэш -> база данных.
+    """
+    version = get_rbac_version()
+
+    entry = _local_permissions.get(user.pk)
+    if entry is not None and entry[0] == version:
+        PERMISSION_MASK_LOOKUPS.labels("local").inc()
+        return entry[1]
+
+    key = f"rbac:mask:{version}:{user.pk}"
+    mask = cache.get(key)
+    if mask is None:
+        PERMISSION_MASK_LOOKUPS.labels("db").inc()
+        mask = load_user_permission_mask(user.pk)
+        cache.set(key, mask, settings.RBAC_PERMISSION_CACHE["TIMEOUT"])
+    else:
+        PERMISSION_MASK_LOOKUPS.labels("shared").inc()
+
+    _local_permissions.set(user.pk, (version, mask))
+    return mask
+
+
+async def aload_user_permission_mask(user_id):
+    """
+    Асинхронный load_user_permission_mask().
+    """
+    from .bitmap import mask_for_indexes
+    from .models import UserEffectivePermission
+
+    queryset = UserEffectivePermission.objects.filter(user_id=user_id).values_list(
+        "permission__bit_index", flat=True
+    )
+    return mask_for_indexes([index async for index in queryset])
+
+
+async def aget_user_permission_mask(user):
+    """
+    Асинхронный get_user_permission_mask().
+    """
+    version = await aget_rbac_version()
+
+    entry = _local_permissions.get(user.pk)
+    if entry is not None and entry[0] == version:
+        PERMISSION_MASK_LOOKUPS.labels("local").inc()
+        return entry[1]
+
+    key = f"rbac:mask:{version}:{user.pk}"
+    mask = await cache.aget(key)
+    if mask is None:
+        PERMISSION_MASK_LOOKUPS.labels("db").inc()
+        mask = await aload_user_permission_mask(user.pk)
+        await cache.aset(key, mask, settings.RBAC_PERMISSION_CACHE["TIMEOUT"])
+    else:
+        PERMISSION_MASK_LOOKUPS.labels("shared").inc()
+
+    _local_permissions.set(user.pk, (version, mask))
+    return mask
+
+
+def _load_permission_masks(version, user_ids):
+    from .bitmap import mask_for_indexes
+    from .models import UserEffectivePermission
+
+    indexes = {user_id: [] for user_id in user_ids}
+    rows = UserEffectivePermission.objects.filter(user_id__in=user_ids).values_list(
+        "user_id", "permission__bit_index"
+    )
+    for user_id, index in rows:
+        indexes[user_id].append(index)
+    masks = {user_id: mask_for_indexes(bits) for user_id, bits in indexes.items()}
+    cache.set_many(
+        {f"rbac:mask:{version}:{user_id}": mask for user_id, mask in masks.items()},
+        settings.RBAC_PERMISSION_CACHE["TIMEOUT"],
+    )
+    return masks
+
+
+async def aget_user_permission_masks(user_ids):
+    """
+    Маски разрешений нескольких пользователей {id: маска}: промахи общего
+    кэша загружаются одним запросом к БД на весь набор.
+    """
+    version = await aget_rbac_version()
+    masks, missing = {}, []
+    for user_id in user_ids:
+        entry = _local_permissions.get(user_id)
+        if entry is not None and entry[0] == version:
+            PERMISSION_MASK_LOOKUPS.labels("local").inc()
+            masks[user_id] = entry[1]
+        else:
+            missing.append(user_id)
+
+    if missing:
+        keys = {f"rbac:mask:{version}:{user_id}": user_id for user_id in missing}
+        # BaseCache.aget_many() читает ключи по одному; пакет — одним get_many()
+        for key, mask in (await sync_to_async(cache.get_many)(keys)).items():
+            PERMISSION_MASK_LOOKUPS.labels("shared").inc()
+            masks[keys[key]] = mask
+        missing = [user_id for user_id in missing if user_id not in masks]
+
+    if missing:
+        PERMISSION_MASK_LOOKUPS.labels("db").inc(len(missing))
+        masks.update(await sync_to_async(_load_permission_masks)(version, missing))
+
+    for user_id, mask in masks.items():
+        _local_permissions.set(user_id, (version, mask))
+    return masks
@@ -0,0 +1,207 @@
+"""
+Поддержка денормализованной таблицы UserEffectivePermission.
+
+Все изменения выполняются set-based SQL-запросами: вставляются только
+недостающие пары (пользователь, разрешение), а удаляются только те пары,
+которые больше не выдает ни одна роль пользователя. Поэтому изменение роли,
+общей для миллионов пользователей, не требует выборки этих пользователей
+в Python.
+
+Роль выдает и разрешения своих предков: роли пользователя соединяются
+с разрешениями через таблицу замыкания RoleClosure (алиас rc, см.
+apps.users.hierarchy), поэтому глубина наследования на запросы не влияет.
+"""
+
+from django.db import connection
+
+from .models import CustomUser, Role, RoleClosure, UserEffectivePermission
+from .sql import execute, in_clause
+
+
+def _tables():
+    user_roles = CustomUser.roles.through._meta
+    role_permissions = Role.permissions.through._meta
+    closure = RoleClosure._meta
+    effective = UserEffectivePermission._meta
+    return {
+        "ur": user_roles.db_table,
+        "ur_user": user_roles.get_field("customuser").column,
+        "ur_role": user_roles.get_field("role").column,
+        "rp": role_permissions.db_table,
+        "rp_role": role_permissions.get_field("role").column,
+        "rp_perm": role_permissions.get_field("permission").column,
+        "rc": closure.db_table,
+        "rc_anc": closure.get_field("ancestor").column,
+        "rc_desc": closure.get_field("descendant").column,
+        "uep": effective.db_table,
+        "uep_user": effective.get_field("user").column,
+        "uep_perm": effective.get_field("permission").column,
+    }
+
+
+def _granted(t):
+    """
+    Соединение ролей пользователей с разрешениями их ролей и предков.
+    """
+    return (
+        f"{t['ur']} ur JOIN {t['rc']} rc ON rc.{t['rc_desc']} = ur.{t['ur_role']} "
+        f"JOIN {t['rp']} rp ON rp.{t['rp_role']} = rc.{t['rc_anc']}"
+    )
+
+
+def insert_missing(where="1 = 1", params=()):
+    """
+    Добавляет недостающие пары, выданные ролями. Условие where накладывается
+    на таблицы связей ur (пользователь-роль), rc (предок-потомок)
+    и rp (роль-разрешение).
+    """
+    t = _tables()
+    sql = (
+        f"INSERT INTO {t['uep']} ({t['uep_user']}, {t['uep_perm']}) "
+        f"SELECT DISTINCT ur.{t['ur_user']}, rp.{t['rp_perm']} FROM {_granted(t)} "
+        f"WHERE ({where}) AND NOT EXISTS ("
+        f"SELECT 1 FROM {t['uep']} e WHERE e.{t['uep_user']} = ur.{t['ur_user']} "
+        f"AND e.{t['uep_perm']} = rp.{t['rp_perm']})"
+    )
+    return execute(sql, list(params))
+
+
+def delete_orphaned(where="1 = 1", params=(), exclude_role_id=None):
+    """
+    Удаляет пары, которые не выдает ни одна роль пользователя. Условие where
+    накладывается на колонки таблицы UserEffectivePermission. Роль
+    exclude_role_id не учитывается (она вот-вот будет удалена или очищена).
+    """
+    t = _tables()
+    params = list(params)
+    exclude = ""
+    if exclude_role_id is not None:
+        exclude = f"AND ur.{t['ur_role']} <> %s "
+        params.append(exclude_role_id)
+    sql = (
+        f"DELETE FROM {t['uep']} WHERE ({where}) AND NOT EXISTS ("
+        f"SELECT 1 FROM {_granted(t)} "
+        f"WHERE ur.{t['ur_user']} = {t['uep']}.{t['uep_user']} "
+        f"AND rp.{t['rp_perm']} = {t['uep']}.{t['uep_perm']} {exclude})"
+    )
+    return execute(sql, params)
+
+
+def _users_of_roles(role_ids):
+    """
+    Подзапрос с пользователями указанных ролей.
+    """
+    t = _tables()
+    where, params = in_clause(t["ur_role"], role_ids)
+    return f"SELECT {t['ur_user']} FROM {t['ur']} WHERE {where}", params
+
+
+def _users_inheriting(role_ids):
+    """
+    Подзапрос с пользователями указанных ролей и их потомков.
+    """
+    t = _tables()
+    where, params = in_clause("rc." + t["rc_anc"], role_ids)
+    return (
+        f"SELECT ur.{t['ur_user']} FROM {t['ur']} ur JOIN {t['rc']} rc "
+        f"ON rc.{t['rc_desc']} = ur.{t['ur_role']} WHERE {where}",
+        params,
+    )
+
+
+def users_roles_added(user_ids):
+    """Пользователям добавили роли."""
+    where, params = in_clause("ur." + _tables()["ur_user"], user_ids)
+    insert_missing(where, params)
+
+
+def users_roles_removed(user_ids):
+    """У пользователей сняли роли."""
+    where, params = in_clause(_tables()["uep_user"], user_ids)
+    delete_orphaned(where, params)
+
+
+def role_permissions_added(role_ids, permission_ids):
+    """
+    Ролям добавили разрешения: затрагивает всех пользователей этих ролей
+    и их потомков.
+    """
+    t = _tables()
+    roles_where, roles_params = in_clause("rp." + t["rp_role"], role_ids)
+    perms_where, perms_params = in_clause("rp." + t["rp_perm"], permission_ids)
+    insert_missing(f"{roles_where} AND {perms_where}", roles_params + perms_params)
+
+
+def role_permissions_removed(role_ids, permission_ids=None):
+    """
+    У ролей сняли разрешения (все, если permission_ids не указан).
+    """
+    t = _tables()
+    users_sql, params = _users_inheriting(role_ids)
+    where = f"{t['uep_user']} IN ({users_sql})"
+    if permission_ids is not None:
+        perms_where, perms_params = in_clause(t["uep_perm"], permission_ids)
+        where = f"{where} AND {perms_where}"
+        params += perms_params
+    delete_orphaned(where, params)
+
+
+def roles_inherited(role_ids):
+    """Ролям добавили родителей: затрагивает пользователей ролей и потомков."""
+    t = _tables()
+    where, params = in_clause(t["rc_anc"], role_ids)
+    insert_missing(
+        f"ur.{t['ur_role']} IN (SELECT {t['rc_desc']} FROM {t['rc']} WHERE {where})",
+        params,
+    )
+
+
+def roles_disinherited(role_ids):
+    """У ролей сняли родителей: затрагивает пользователей ролей и потомков."""
+    role_permissions_removed(role_ids)
+
+
+def role_detached(role_id):
+    """
+    Роль удаляется или очищается: убирает разрешения, которые пользователи
+    получали только через нее. Вызывается до удаления связей.
+    """
+    users_sql, params = _users_of_roles([role_id])
+    where = f"{_tables()['uep_user']} IN ({users_sql})"
+    delete_orphaned(where, params, exclude_role_id=role_id)
+
+
+def rebuild(user_ids=None):
+    """
+    Полностью пересобирает таблицу (или строки указанных пользователей).
+    """
+    t = _tables()
+    queryset = UserEffectivePermission.objects.all()
+    if user_ids is None:
+        where, params = "1 = 1", []
+    else:
+        queryset = queryset.filter(user_id__in=user_ids)
+        where, params = in_clause("ur." + t["ur_user"], user_ids)
+    queryset.delete()
+    return insert_missing(where, params)
+
+
+def check_consistency():
+    """
+    Сравнивает таблицу с фактическими назначениями.
+    Возвращает (число недостающих пар, число лишних пар).
+    """
+    t = _tables()
+    expected = (
+        f"SELECT DISTINCT ur.{t['ur_user']} AS user_id, rp.{t['rp_perm']} AS perm_id "
+        f"FROM {_granted(t)}"
+    )
+    actual = (
+        f"SELECT {t['uep_user']} AS user_id, {t['uep_perm']} AS perm_id FROM {t['uep']}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM ({expected} EXCEPT {actual}) missing")
+        missing = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COUNT(*) FROM ({actual} EXCEPT {expected}) extra")
+        extra = cursor.fetchone()[0]
+    return missing, extra
@@ -0,0 +1,173 @@
+"""
+Хэшеры паролей со стоимостью, подобранной под оборудование.
+
+Стоимость хэширования (итерации PBKDF2, memory_cost argon2, rounds bcrypt)
+подбирается так, чтобы один хэш занимал PASSWORD_HASHING["TARGET_MS"]
+миллисекунд. Замер выполняется один раз на кластер: первый процесс
+публикует результат в общем кэше, остальные берут его оттуда, иначе воркеры
+с разной стоимостью перехэшировали бы пароли при каждом входе.
+
+Хэш, посчитанный с другим алгоритмом или стоимостью, хэшер считает
+устаревшим (must_update), и при успешном входе он пересчитывается
+(см. apps.users.backends) — и в сторону увеличения, и в сторону уменьшения.
+"""
+
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_PASSWORD = "calibration-password"
+CALIBRATION_ROUNDS = 3
+
+# Стоимость, подобранная в этом процессе: {(алгоритм, TARGET_MS): стоимость}
+_costs = {}
+
+
+def _cost_key(algorithm, target_ms):
+    return f"auth:hash-cost:{algorithm}:{target_ms}"
+
+
+class CalibratedHasherMixin:
+    """
+    Подмешивается перед хэшером Django. Наследник задает атрибут стоимости
+    свойством, возвращающим get_cost().
+    """
+
+    # Стоимость без калибровки (TARGET_MS = 0) и границы подбора
+    default_cost = None
+    min_cost = 1
+    max_cost = None
+    # Стоимость пробного хэша при замере
+    probe_cost = None
+    # Время хэша растет со стоимостью линейно или как 2 ** cost
+    exponential = False
+
+    def __init__(self, cost=None):
+        self._cost = cost
+
+    def get_cost(self):
+        if self._cost is not None:
+            return self._cost
+        target_ms = settings.PASSWORD_HASHING["TARGET_MS"]
+        cost = _costs.get((self.algorithm, target_ms))
+        if cost is None:
+            cost = _costs[self.algorithm, target_ms] = self.resolve_cost(target_ms)
+        return cost
+
+    def resolve_cost(self, target_ms):
+        if not target_ms:
+            return self.default_cost
+
+        key = _cost_key(self.algorithm, target_ms)
+        try:
+            cost = cache.get(key)
+        except Exception:
+            logger.warning("Cache unavailable, calibrating locally", exc_info=True)
+            return self.calibrate(target_ms / 1000)
+        if cost is None:
+            cost = self.calibrate(target_ms / 1000)
+            cache.add(key, cost, None)
+            # Если другой процесс успел раньше, берем его значение
+            cost = cache.get(key, cost)
+        # В кэше может остаться значение, подобранное при прежних границах
+        return self.clamp(cost)
+
+    def measure(self, cost):
+        """
+        Время одного хэша с заданной стоимостью, секунды (лучшее из замеров).
+        """
+        probe = type(self)(cost=cost)
+        salt = probe.salt()
+        timings = []
+        for _ in range(CALIBRATION_ROUNDS):
+            started = time.perf_counter()
+            probe.encode(CALIBRATION_PASSWORD, salt)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def calibrate(self, target):
+        """
+        Стоимость, при которой хэш занимает около target секунд.
+        """
+        elapsed = self.measure(self.probe_cost)
+        if self.exponential:
+            cost = self.probe_cost + round(math.log2(target / elapsed))
+        else:
+            cost = self.round_cost(self.probe_cost * target / elapsed)
+        cost = self.clamp(cost)
+        logger.info(
+            "Calibrated %s cost %s for %.0f ms", self.algorithm, cost, target * 1000
+        )
+        return cost
+
+    def clamp(self, cost):
+        cost = max(self.min_cost, cost)
+        if self.max_cost is not None:
+            cost = min(self.max_cost, cost)
+        return cost
+
+    def round_cost(self, cost):
+        return max(1, round(cost))
+
+
+class PBKDF2PasswordHasher(CalibratedHasherMixin, hashers.PBKDF2PasswordHasher):
+    default_cost = hashers.PBKDF2PasswordHasher.iterations
+    # Калибровка может только повысить число итераций Django
+    min_cost = hashers.PBKDF2PasswordHasher.iterations
+    probe_cost = 50_000
+
+    @property
+    def iterations(self):
+        return self.get_cost()
+
+    def round_cost(self, cost):
+        # Замер шумит: округляем, чтобы повторная калибровка не меняла хэши
+        return max(10_000, round(cost / 10_000) * 10_000)
+
+
+class Argon2PasswordHasher(CalibratedHasherMixin, hashers.Argon2PasswordHasher):
+    """
+    Подбирается объем памяти (КиБ) при time_cost Django.
+    """
+
+    default_cost = hashers.Argon2PasswordHasher.memory_cost
+    # Калибровка может только повысить объем памяти Django
+    min_cost = hashers.Argon2PasswordHasher.memory_cost
+    probe_cost = 16 * 1024
+
+    @property
+    def memory_cost(self):
+        return self.get_cost()
+
+    def round_cost(self, cost):
+        return max(1024, round(cost / 1024) * 1024)
+
+
+class BCryptSHA256PasswordHasher(
+    CalibratedHasherMixin, hashers.BCryptSHA256PasswordHasher
+):
+    default_cost = hashers.BCryptSHA256PasswordHasher.rounds
+    min_cost = 10
+    max_cost = 16
+    probe_cost = 8
+    exponential = True
+
+    @property
+    def rounds(self):
+        return self.get_cost()
+
+
+def calibrate_default_hasher():
+    """
+    Подбирает стоимость основного хэшера заранее, чтобы замер не пришелся
+    на первый вход.
+    """
+    hasher = hashers.get_hasher()
+    if isinstance(hasher, CalibratedHasherMixin):
+        hasher.get_cost()
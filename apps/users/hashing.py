@@ -0,0 +1,145 @@
+"""
+Ограниченный пул для хэширования паролей.
+
+PBKDF2 при входе и регистрации занимает процессор на сотни миллисекунд.
+Хэширование выполняется в отдельном пуле (потоки — для хэшеров, которые
+отпускают GIL: PBKDF2 из hashlib, argon2, bcrypt; процессы — для остальных),
+а число одновременно выполняемых и ожидающих задач ограничено. Если свободного
+места в очереди нет, запрос сразу получает 503 с заголовком Retry-After,
+вместо того чтобы копиться в очереди воркера.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .metrics import PASSWORD_HASH_DURATION, timer
+
+# Как часто async-запрос проверяет, освободилось ли место в очереди, секунды
+SLOT_POLL_INTERVAL = 0.005
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Сервис перегружен, повторите попытку позже."
+    default_code = "hashing_unavailable"
+
+    def __init__(self, wait, detail=None, code=None):
+        super().__init__(detail, code)
+        # DRF выставляет Retry-After по атрибуту wait
+        self.wait = wait
+
+
+def init_worker():
+    # При запуске через spawn дочерний процесс начинает с чистого интерпретатора
+    if not apps.ready:
+        django.setup()
+
+
+class HashingExecutor:
+    """
+    Пул для хэширования с ограниченной очередью.
+
+    kind: "thread", "process" или "inline" (без пула, в текущем потоке).
+    """
+
+    def __init__(self, kind, workers, queue_size, queue_timeout, retry_after):
+        self.kind = kind
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        config = settings.PASSWORD_HASHING
+        return cls(
+            kind=config["EXECUTOR"],
+            workers=config["WORKERS"],
+            queue_size=config["QUEUE_SIZE"],
+            queue_timeout=config["QUEUE_TIMEOUT"],
+            retry_after=config["RETRY_AFTER"],
+        )
+
+    def _get_executor(self):
+        # Пул создается лениво, уже в воркере (после fork)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers, initializer=init_worker
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="hashing"
+                        )
+        return self._executor
+
+    def run(self, func, *args):
+        if self.kind == "inline":
+            return func(*args)
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingUnavailable(wait=self.retry_after)
+        try:
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    async def arun(self, func, *args):
+        """
+        Асинхронный run(): ожидание места в очереди и результата не блокирует
+        event loop.
+        """
+        if self.kind == "inline":
+            return func(*args)
+
+        deadline = time.monotonic() + self.queue_timeout
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise HashingUnavailable(wait=self.retry_after)
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+        try:
+            return await asyncio.wrap_future(self._get_executor().submit(func, *args))
+        finally:
+            self._slots.release()
+
+
+executor = HashingExecutor.from_settings()
+
+
+def make_password(password):
+    """Хэширует пароль в пуле."""
+    with timer(PASSWORD_HASH_DURATION, "make"):
+        return executor.run(hashers.make_password, password)
+
+
+def verify_password(password, encoded):
+    """
+    Проверяет пароль в пуле. Возвращает (пароль верный, хэш нужно обновить).
+    """
+    with timer(PASSWORD_HASH_DURATION, "verify"):
+        return executor.run(hashers.verify_password, password, encoded)
+
+
+async def amake_password(password):
+    """Асинхронный make_password()."""
+    with timer(PASSWORD_HASH_DURATION, "make"):
+        return await executor.arun(hashers.make_password, password)
+
+
+async def averify_password(password, encoded):
+    """Асинхронный verify_password()."""
+    with timer(PASSWORD_HASH_DURATION, "verify"):
+        return await executor.arun(hashers.verify_password, password, encoded)
@@ -0,0 +1,205 @@
+"""
+Наследование ролей и таблица транзитивного замыкания RoleClosure.
+
+Роль наследует разрешения своих родителей (Role.parents) на любую глубину.
+RoleClosure хранит все пары (предок, потомок), включая пару роли с самой
+собой, поэтому разрешения с учетом наследования получаются одним
+соединением user_roles -> RoleClosure -> role_permissions по индексам,
+без рекурсии (см. apps.users.effective).
+
+Замыкание поддерживается инкрементально set-based SQL-запросами: новое
+ребро дописывает пары (предок родителя, потомок ребенка), а удаление ребра
+пересчитывает пары только потомков дочерней роли. Ребро, образующее цикл,
+отклоняется до записи (check_no_cycles) под блокировкой затронутых ролей
+(lock_for_edges).
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .models import Role, RoleClosure
+from .sql import execute, in_clause
+
+
+def _tables():
+    edges = Role.parents.through._meta
+    closure = RoleClosure._meta
+    return {
+        "e": edges.db_table,
+        "e_child": edges.get_field("from_role").column,
+        "e_parent": edges.get_field("to_role").column,
+        "rc": closure.db_table,
+        "rc_anc": closure.get_field("ancestor").column,
+        "rc_desc": closure.get_field("descendant").column,
+    }
+
+
+def descendant_ids(role_ids):
+    """
+    Id ролей role_ids и всех их потомков.
+    """
+    return set(
+        RoleClosure.objects.filter(ancestor_id__in=role_ids).values_list(
+            "descendant_id", flat=True
+        )
+    )
+
+
+def lock_for_edges(child_ids, parent_ids):
+    """
+    Блокирует до конца транзакции детей и всех предков родителей (вызывать
+    перед check_no_cycles при записи ребер). Два изменения, которые вместе
+    замкнули бы цикл, блокируют общую роль: второе ждет коммита первого
+    и проверяется уже по обновленному замыканию. Возвращает id ролей.
+    """
+    ancestors = RoleClosure.objects.filter(descendant_id__in=parent_ids).values(
+        "ancestor_id"
+    )
+    roles = Role.objects.filter(Q(pk__in=child_ids) | Q(pk__in=ancestors))
+    # Единый порядок блокировки исключает взаимоблокировки
+    return list(roles.select_for_update().order_by("pk").values_list("pk", flat=True))
+
+
+def check_no_cycles(child_ids, parent_ids):
+    """
+    Отклоняет ребра (ребенок -> родитель), если родитель уже наследует
+    от ребенка или совпадает с ним.
+    """
+    cycle = (
+        RoleClosure.objects.filter(
+            ancestor_id__in=child_ids, descendant_id__in=parent_ids
+        )
+        .values_list("ancestor__name", "descendant__name")
+        .first()
+    )
+    if cycle is None:
+        return
+    child, parent = cycle
+    if child == parent:
+        message = f"Роль «{child}» не может наследовать сама от себя."
+    else:
+        message = (
+            f"Роль «{parent}» уже наследует от роли «{child}»: "
+            f"наследование образовало бы цикл."
+        )
+    raise ValidationError(message, code="cycle")
+
+
+def add_self_links(role_ids):
+    """Новые роли: пары (роль, роль)."""
+    RoleClosure.objects.bulk_create(
+        [RoleClosure(ancestor_id=pk, descendant_id=pk) for pk in role_ids],
+        ignore_conflicts=True,
+    )
+
+
+def _insert_paths(where, params):
+    """
+    Дописывает недостающие пары (предок родителя, потомок ребенка) для ребер
+    Role.parents, отобранных условием where (алиас таблицы ребер — e).
+    """
+    t = _tables()
+    sql = (
+        f"INSERT INTO {t['rc']} ({t['rc_anc']}, {t['rc_desc']}) "
+        f"SELECT DISTINCT a.{t['rc_anc']}, d.{t['rc_desc']} FROM {t['e']} e "
+        f"JOIN {t['rc']} a ON a.{t['rc_desc']} = e.{t['e_parent']} "
+        f"JOIN {t['rc']} d ON d.{t['rc_anc']} = e.{t['e_child']} "
+        f"WHERE ({where}) AND NOT EXISTS ("
+        f"SELECT 1 FROM {t['rc']} x WHERE x.{t['rc_anc']} = a.{t['rc_anc']} "
+        f"AND x.{t['rc_desc']} = d.{t['rc_desc']})"
+    )
+    return execute(sql, list(params))
+
+
+def _relink(role_ids):
+    """
+    Пересчитывает предков вне набора role_ids для ролей набора. Набор
+    должен быть замкнут по потомкам: пары внутри него от ребер над ним
+    не зависят.
+    """
+    t = _tables()
+    inside, inside_params = in_clause(t["rc_desc"], role_ids)
+    outside, outside_params = in_clause(t["rc_anc"], role_ids)
+    execute(
+        f"DELETE FROM {t['rc']} WHERE {inside} AND NOT ({outside})",
+        inside_params + outside_params,
+    )
+    # Пути в набор снаружи входят через граничные ребра
+    child, child_params = in_clause("e." + t["e_child"], role_ids)
+    parent, parent_params = in_clause("e." + t["e_parent"], role_ids)
+    _insert_paths(f"{child} AND NOT ({parent})", child_params + parent_params)
+
+
+def edges_added(child_ids, parent_ids):
+    """Ролям child_ids добавили родителей parent_ids."""
+    t = _tables()
+    child, child_params = in_clause("e." + t["e_child"], child_ids)
+    parent, parent_params = in_clause("e." + t["e_parent"], parent_ids)
+    _insert_paths(f"{child} AND {parent}", child_params + parent_params)
+
+
+def edges_removed(child_ids):
+    """
+    У ролей child_ids сняли родителей: пересчитываются предки их потомков.
+    """
+    _relink(descendant_ids(child_ids))
+
+
+def role_deleted(role_id):
+    """
+    Роль удаляется: снимает ее ребра и пересчитывает предков ее потомков
+    (каскадное удаление не вызывает m2m_changed). Возвращает id потомков.
+    """
+    descendants = descendant_ids([role_id]) - {role_id}
+    Role.parents.through.objects.filter(
+        Q(from_role_id=role_id) | Q(to_role_id=role_id)
+    ).delete()
+    if descendants:
+        _relink(descendants)
+    return descendants
+
+
+def _expected_pairs():
+    parents = defaultdict(set)
+    for child_id, parent_id in Role.parents.through.objects.values_list(
+        "from_role_id", "to_role_id"
+    ):
+        parents[child_id].add(parent_id)
+
+    ancestors = {}
+
+    def visit(role_id):
+        if role_id not in ancestors:
+            ancestors[role_id] = {role_id}
+            for parent_id in parents[role_id]:
+                ancestors[role_id] |= visit(parent_id)
+        return ancestors[role_id]
+
+    pairs = set()
+    for role_id in Role.objects.values_list("pk", flat=True):
+        pairs.update((ancestor, role_id) for ancestor in visit(role_id))
+    return pairs
+
+
+def rebuild():
+    """
+    Полностью пересобирает замыкание по таблице ребер.
+    """
+    RoleClosure.objects.all().delete()
+    add_self_links(Role.objects.values_list("pk", flat=True))
+    # Каждый проход удваивает длину учтенных путей
+    while _insert_paths("1 = 1", []):
+        pass
+    return RoleClosure.objects.count()
+
+
+def check_consistency():
+    """
+    Сравнивает замыкание с таблицей ребер.
+    Возвращает (число недостающих пар, число лишних пар).
+    """
+    expected = _expected_pairs()
+    actual = set(RoleClosure.objects.values_list("ancestor_id", "descendant_id"))
+    return len(expected - actual), len(actual - expected)
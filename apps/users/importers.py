@@ -0,0 +1,276 @@
+"""
+Потоковый импорт пользователей из CSV/JSONL.
+
+Записи читаются и обрабатываются пачками фиксированного размера, поэтому
+потребление памяти не зависит от размера файла. Пароли хэшируются в пуле
+(или передаются уже захэшированными в поле password_hash), пользователи
+вставляются через bulk_create, роли назначаются одной вставкой на пачку.
+
+Импорт через API хэширует в общем ограниченном пуле (apps.users.hashing)
+порциями по одной задаче, не отнимая у входа больше одного воркера.
+Команда import_users работает в отдельном процессе и заводит свой пул.
+"""
+
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from . import effective, hashing
+from .cache import bump_rbac_version
+from .hashing import init_worker
+from .models import CustomUser, Role
+
+UserRole = CustomUser.roles.through
+
+USER_FIELDS = ("first_name", "last_name", "patronymic")
+MAX_REPORTED_ERRORS = 100
+# Паролей в одной задаче общего пула хэширования
+SHARED_POOL_CHUNK_SIZE = 16
+
+
+@dataclass
+class ImportResult:
+    """Итоги импорта."""
+
+    created: int = 0
+    skipped: int = 0
+    failed: int = 0
+    roles_assigned: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def processed(self):
+        return self.created + self.skipped + self.failed
+
+    @property
+    def rate(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        return {
+            "processed": self.processed,
+            "created": self.created,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "roles_assigned": self.roles_assigned,
+            "elapsed": round(self.elapsed, 3),
+            "rate": round(self.rate, 1),
+            "errors": self.errors,
+        }
+
+
+def iter_csv(stream):
+    """
+    Записи из CSV с заголовком. Роли перечисляются через ';' в колонке roles.
+    """
+    for record in csv.DictReader(stream):
+        roles = record.get("roles") or ""
+        record["roles"] = [name.strip() for name in roles.split(";") if name.strip()]
+        yield record
+
+
+def iter_jsonl(stream):
+    """
+    Записи из JSONL: один JSON-объект на строку, roles — список названий.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield {"_error": "Некорректная строка JSON"}
+
+
+READERS = {"csv": iter_csv, "jsonl": iter_jsonl}
+
+
+class UserImporter:
+    """
+    Импортирует пользователей пачками.
+
+    workers — число процессов собственного пула для хэширования паролей
+    (0 — в текущем процессе, None — общий пул apps.users.hashing),
+    on_batch(result) вызывается после каждой пачки.
+    """
+
+    def __init__(self, batch_size=None, workers=None, on_batch=None):
+        config = settings.USER_IMPORT
+        self.batch_size = batch_size or config["BATCH_SIZE"]
+        self.workers = workers
+        self.on_batch = on_batch
+        self._roles = dict(Role.objects.values_list("name", "pk"))
+
+    def run(self, records):
+        result = ImportResult()
+        started = time.monotonic()
+        executor = None
+        if self.workers is None:
+            executor = hashing.executor
+        elif self.workers:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=init_worker
+            )
+        try:
+            batch = []
+            for line, record in enumerate(records, start=1):
+                batch.append((line, record))
+                if len(batch) >= self.batch_size:
+                    self._import_batch(batch, result, executor)
+                    result.elapsed = time.monotonic() - started
+                    batch = []
+                    if self.on_batch is not None:
+                        self.on_batch(result)
+            if batch:
+                self._import_batch(batch, result, executor)
+        finally:
+            if self.workers:
+                executor.shutdown()
+
+        if result.roles_assigned:
+            bump_rbac_version()
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def _clean(self, line, record, result):
+        if "_error" in record:
+            result.add_error(line, record["_error"])
+            return None
+
+        email = CustomUser.objects.normalize_email((record.get("email") or "").strip())
+        try:
+            validate_email(email)
+        except ValidationError:
+            result.add_error(line, f"Некорректный email: {email!r}")
+            return None
+
+        password_hash = record.get("password_hash")
+        if password_hash:
+            try:
+                identify_hasher(password_hash)
+            except ValueError:
+                result.add_error(line, "Неизвестный формат password_hash")
+                return None
+
+        role_ids = []
+        for name in record.get("roles") or []:
+            if name not in self._roles:
+                result.add_error(line, f"Роль не найдена: {name!r}")
+                return None
+            role_ids.append(self._roles[name])
+
+        return {
+            "email": email,
+            "password": record.get("password") or None,
+            "password_hash": password_hash,
+            "fields": {name: record.get(name) or "" for name in USER_FIELDS},
+            "role_ids": role_ids,
+        }
+
+    def _hash_passwords(self, rows, executor):
+        pending = [row for row in rows if not row["password_hash"]]
+        passwords = [row["password"] for row in pending]
+        if isinstance(executor, hashing.HashingExecutor):
+            hashes = [
+                encoded
+                for start in range(0, len(passwords), SHARED_POOL_CHUNK_SIZE)
+                for encoded in executor.run(
+                    make_passwords, passwords[start : start + SHARED_POOL_CHUNK_SIZE]
+                )
+            ]
+        elif executor is not None:
+            chunksize = max(1, len(passwords) // (self.workers * 4))
+            hashes = executor.map(make_password, passwords, chunksize=chunksize)
+        else:
+            hashes = map(make_password, passwords)
+        for row, encoded in zip(pending, hashes):
+            row["password_hash"] = encoded
+
+    def _import_batch(self, batch, result, executor):
+        rows = {}
+        for line, record in batch:
+            row = self._clean(line, record, result)
+            if row is None:
+                continue
+            if row["email"] in rows:
+                result.skipped += 1
+                continue
+            rows[row["email"]] = row
+
+        existing = _existing_emails(rows.keys())
+        result.skipped += len(existing)
+        rows = [row for email, row in rows.items() if email not in existing]
+        if not rows:
+            return
+
+        self._hash_passwords(rows, executor)
+
+        with transaction.atomic():
+            created = self._create_users(rows, result)
+            links = [
+                UserRole(customuser_id=user.pk, role_id=role_id)
+                for row, user in created
+                for role_id in row["role_ids"]
+            ]
+            if links:
+                UserRole.objects.bulk_create(links, ignore_conflicts=True)
+                effective.users_roles_added({link.customuser_id for link in links})
+
+        result.created += len(created)
+        result.roles_assigned += len(links)
+
+    def _create_users(self, rows, result):
+        """
+        Вставляет пользователей, возвращает пары (запись, пользователь).
+        Email, занятые параллельно (другим импортом или регистрацией),
+        пропускаются: роли из файла не назначаются чужим аккаунтам.
+        """
+        while rows:
+            try:
+                with transaction.atomic():
+                    users = CustomUser.objects.bulk_create(
+                        [
+                            CustomUser(
+                                email=row["email"],
+                                password=row["password_hash"],
+                                **row["fields"],
+                            )
+                            for row in rows
+                        ]
+                    )
+                return list(zip(rows, users))
+            except IntegrityError:
+                taken = _existing_emails(row["email"] for row in rows)
+                if not taken:
+                    raise
+                result.skipped += len(taken)
+                rows = [row for row in rows if row["email"] not in taken]
+        return []
+
+
+def _existing_emails(emails):
+    return set(
+        CustomUser.objects.filter(email__in=list(emails)).values_list(
+            "email", flat=True
+        )
+    )
+
+
+def make_passwords(passwords):
+    """Хэширует пачку паролей (задача для пула хэширования)."""
+    return [make_password(password) for password in passwords]
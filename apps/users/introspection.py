@@ -0,0 +1,128 @@
+"""
+Пакетная проверка токенов и решений авторизации для шлюзов.
+
+Один вызов отвечает на вопросы «действителен ли токен и может ли его
+владелец X» и «может ли пользователь N сделать X» для сотен запросов сразу.
+Решение принимается по тем же правилам, что и HasPermission. Отзыв токенов
+проверяется одним обращением к кэшу, пользователи и их маски разрешений
+берутся из кэшей, а промахи загружаются одним запросом к БД на весь пакет
+(для пользователей и для масок).
+
+Каждое решение сопровождается ttl — сколько секунд шлюз может его кэшировать:
+не дольше INTROSPECTION["DECISION_TTL"] (за это время доходят отзыв токенов
+и изменения RBAC) и не дольше срока жизни токена.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .bitmap import amask_for_names
+from .cache import aget_user_permission_masks
+from .models import CustomUser
+from .permissions import mask_allows
+from .revocation import ais_revoked_many
+from .token_cache import get_verified, set_verified
+from .user_cache import aget_users
+
+
+def _ttl(expires_at=None):
+    ttl = settings.INTROSPECTION["DECISION_TTL"]
+    if expires_at is not None:
+        ttl = min(ttl, max(0, int(expires_at - time.time())))
+    return ttl
+
+
+def _parse_token(raw_token):
+    """
+    Провалидированный access-токен и id его владельца или (None, None).
+    """
+    cached = get_verified(raw_token)
+    try:
+        if cached is not None:
+            token = cached[0]
+        else:
+            token = AccessToken(raw_token)
+            # Отзыв проверяется ниже для всего пакета
+            set_verified(raw_token, token)
+        return token, CustomUser._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+    except (TokenError, KeyError, ValidationError):
+        return None, None
+
+
+def _inactive(error, subject=None):
+    result = {"active": False, "error": error, "ttl": _ttl()}
+    if subject is not None:
+        result["subject"] = subject
+    return result
+
+
+def _is_active(user):
+    return user.is_active and not user.is_deleted
+
+
+async def aintrospect(items):
+    """
+    Решения по элементам пакета в том же порядке.
+
+    Элемент — словарь с token (access-токен) или subject (id пользователя)
+    и списком permissions; разрешено, если у пользователя есть хотя бы одно
+    из них (пустой список — только проверка токена или пользователя).
+    """
+    results = [None] * len(items)
+    tokens, subjects = {}, {}
+    for index, item in enumerate(items):
+        if item.get("token") is None:
+            subjects[index] = item["subject"]
+            continue
+        token, user_id = _parse_token(item["token"])
+        if token is None:
+            results[index] = _inactive("token_invalid")
+        else:
+            tokens[index] = token
+            subjects[index] = user_id
+
+    revoked = await ais_revoked_many(list(tokens.values()))
+    for index, is_revoked in zip(list(tokens), revoked):
+        if is_revoked:
+            results[index] = _inactive("token_revoked", subjects.pop(index))
+
+    users = await aget_users(set(subjects.values()))
+    masks = await aget_user_permission_masks(
+        [
+            user_id
+            for user_id, user in users.items()
+            if _is_active(user) and not user.is_superuser
+        ]
+    )
+
+    required_masks = {}
+    for index, user_id in subjects.items():
+        user = users.get(user_id)
+        if user is None:
+            results[index] = _inactive("user_not_found", user_id)
+            continue
+        if not _is_active(user):
+            results[index] = _inactive("user_inactive", user_id)
+            continue
+
+        names = frozenset(items[index]["permissions"])
+        if not names or user.is_superuser:
+            allowed = True
+        else:
+            if names not in required_masks:
+                required_masks[names] = await amask_for_names(names)
+            allowed = mask_allows(masks[user_id], required_masks[names])
+
+        token = tokens.get(index)
+        results[index] = {
+            "active": True,
+            "subject": user_id,
+            "allowed": allowed,
+            "ttl": _ttl(token["exp"] if token is not None else None),
+        }
+    return results
@@ -0,0 +1,226 @@
+"""
+Асимметричная подпись JWT набором ключей (key ring).
+
+Ключи лежат в каталоге JWT_SIGNING["KEYS_DIR"] файлами <kid>.pem:
+закрытый ключ (Ed25519 — EdDSA, RSA — RS256) подписывает и проверяет,
+открытый — только проверяет. Новые токены подписываются ключом
+JWT_SIGNING["ACTIVE_KID"], его kid пишется в заголовок токена; проверка
+выбирает ключ по kid. Открытые части всех ключей публикуются в
+/.well-known/jwks.json, и другие сервисы проверяют токены сами.
+
+Ротация без разлогина пользователей:
+1. новый ключ кладется в каталог — он публикуется в JWKS, но не подписывает;
+2. спустя JWKS_MAX_AGE он становится активным (ACTIVE_KID);
+3. старый ключ заменяется открытой частью и удаляется, когда истекут
+   подписанные им refresh-токены.
+
+Ключи читаются и разбираются один раз на процесс. Без KEYS_DIR токены
+подписываются HS256 с SECRET_KEY, как раньше.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import (
+    TokenBackendError,
+    TokenBackendExpiredToken,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+ALGORITHMS = {
+    ed25519.Ed25519PrivateKey: "EdDSA",
+    ed25519.Ed25519PublicKey: "EdDSA",
+    rsa.RSAPrivateKey: "RS256",
+    rsa.RSAPublicKey: "RS256",
+}
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    algorithm: str
+    public_key: object
+    private_key: object = None
+
+
+def _algorithm(key, path):
+    for key_class, algorithm in ALGORITHMS.items():
+        if isinstance(key, key_class):
+            return algorithm
+    raise ImproperlyConfigured(f"{path}: поддерживаются ключи Ed25519 и RSA")
+
+
+def load_key(path):
+    """
+    Ключ из PEM-файла; kid — имя файла без расширения.
+    """
+    data = path.read_bytes()
+    if b"PRIVATE KEY" in data:
+        private_key = load_pem_private_key(data, password=None)
+        return SigningKey(
+            path.stem,
+            _algorithm(private_key, path),
+            private_key.public_key(),
+            private_key,
+        )
+    public_key = load_pem_public_key(data)
+    return SigningKey(path.stem, _algorithm(public_key, path), public_key)
+
+
+class KeyRing:
+    def __init__(self, keys, active_kid):
+        self.keys = {key.kid: key for key in keys}
+        self.active_kid = active_kid
+        # Без активного ключа набор только проверяет токены (см. check_key_ring)
+        self.active = self.keys.get(active_kid)
+        if self.active is not None and self.active.private_key is None:
+            self.active = None
+
+    @classmethod
+    def from_dir(cls, keys_dir, active_kid=""):
+        keys = [load_key(path) for path in sorted(Path(keys_dir).glob("*.pem"))]
+        if not active_kid:
+            # Единственный закрытый ключ активен и без явного указания
+            private = [key.kid for key in keys if key.private_key is not None]
+            if len(private) == 1:
+                active_kid = private[0]
+        return cls(keys, active_kid)
+
+    def get(self, kid):
+        return self.keys.get(kid)
+
+    def jwks(self):
+        keys = []
+        for key in self.keys.values():
+            algorithm = jwt.get_algorithm_by_name(key.algorithm)
+            jwk = algorithm.to_jwk(key.public_key, as_dict=True)
+            jwk.update(kid=key.kid, alg=key.algorithm, use="sig")
+            keys.append(jwk)
+        return {"keys": keys}
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    TokenBackend simplejwt, подписывающий активным ключом набора
+    и проверяющий ключом из заголовка kid.
+    """
+
+    def __init__(self, ring):
+        # Алгоритм и ключи задает набор, TokenBackend.__init__ не вызывается
+        self.ring = ring
+        self.audience = api_settings.AUDIENCE
+        self.issuer = api_settings.ISSUER
+        self.leeway = api_settings.LEEWAY
+        self.json_encoder = api_settings.JSON_ENCODER
+
+    def encode(self, payload):
+        if self.ring.active is None:
+            raise ImproperlyConfigured(
+                f"JWT_ACTIVE_KID={self.ring.active_kid!r}: "
+                f"нет закрытого ключа с таким kid"
+            )
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+        return jwt.encode(
+            jwt_payload,
+            self.ring.active.private_key,
+            algorithm=self.ring.active.algorithm,
+            headers={"kid": self.ring.active.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError as e:
+            raise TokenBackendError(_("Token is invalid")) from e
+        key = self.ring.get(kid)
+        if key is None and verify:
+            raise TokenBackendError(_("Token is invalid"))
+
+        try:
+            return jwt.decode(
+                token,
+                key.public_key if key is not None else None,
+                # Алгоритм задается ключом, а не заголовком токена
+                algorithms=[key.algorithm] if key is not None else None,
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    "verify_aud": self.audience is not None,
+                    "verify_signature": verify,
+                },
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise TokenBackendExpiredToken(_("Token is expired")) from e
+        except jwt.InvalidTokenError as e:
+            raise TokenBackendError(_("Token is invalid")) from e
+
+
+@cache
+def get_key_ring():
+    """
+    Набор ключей процесса или None, если подпись симметричная (HS256).
+    """
+    keys_dir = settings.JWT_SIGNING["KEYS_DIR"]
+    if not keys_dir:
+        return None
+    return KeyRing.from_dir(keys_dir, settings.JWT_SIGNING["ACTIVE_KID"])
+
+
+@cache
+def get_jwks():
+    """
+    JWKS и его ETag, сериализованные один раз на процесс.
+    """
+    ring = get_key_ring()
+    jwks = ring.jwks() if ring is not None else {"keys": []}
+    content = json.dumps(jwks, sort_keys=True).encode()
+    return content, '"%s"' % hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def check_key_ring(app_configs, **kwargs):
+    """
+    Системная проверка: при асимметричной подписи есть активный закрытый ключ.
+    """
+    ring = get_key_ring()
+    if ring is None or ring.active is not None:
+        return []
+    return [
+        checks.Error(
+            f"JWT_ACTIVE_KID={ring.active_kid!r}: нет закрытого ключа с таким "
+            f"kid в {settings.JWT_SIGNING['KEYS_DIR']}.",
+            hint="Создайте ключ командой signing_keys --generate.",
+            id="users.E001",
+        )
+    ]
+
+
+def install():
+    """
+    Подключает набор ключей ко всем токенам simplejwt (вызывается из
+    UsersConfig.ready()).
+    """
+    from rest_framework_simplejwt.tokens import Token
+
+    ring = get_key_ring()
+    if ring is not None:
+        Token._token_backend = KeyRingTokenBackend(ring)
@@ -0,0 +1,198 @@
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from apps.users.benchmark import (
+    SCENARIOS,
+    check_baseline,
+    check_thresholds,
+    measure_auth_overhead,
+    measure_document_listing,
+    run_scenario,
+    seed,
+    seed_documents,
+)
+
+DEFAULT_THRESHOLDS = Path(__file__).resolve().parents[2] / "benchmark_thresholds.json"
+# Сценарии с хэшированием пароля: по умолчанию меньше итераций
+SLOW_SCENARIOS = {"login", "register"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет бенчмарк API на синтетических данных во временной тестовой "
+        "базе и выводит p50/p95/p99, RPS и число SQL-запросов в JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Пользователи.")
+        parser.add_argument("--roles", type=int, default=50, help="Роли.")
+        parser.add_argument("--permissions", type=int, default=100, help="Разрешения.")
+        parser.add_argument(
+            "--roles-per-user", type=int, default=3, help="Ролей у пользователя."
+        )
+        parser.add_argument(
+            "--permissions-per-role", type=int, default=10, help="Разрешений у роли."
+        )
+        parser.add_argument(
+            "--documents",
+            type=int,
+            default=10000,
+            help="Документы (масштабный прогон: 1000000).",
+        )
+        parser.add_argument(
+            "--grants-per-user",
+            type=int,
+            default=200,
+            help="Доступов к документам у пользователя и у роли (масштабный "
+            "прогон: 2000).",
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=100, help="Запросов на сценарий."
+        )
+        parser.add_argument(
+            "--slow-iterations",
+            type=int,
+            default=20,
+            help="Запросов на сценарий с хэшированием пароля (login, register).",
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=5, help="Прогревочных запросов."
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=sorted(SCENARIOS),
+            help="Запустить только указанные сценарии (можно несколько раз).",
+        )
+        parser.add_argument(
+            "--output", help="Файл для JSON-отчета (по умолчанию stdout)."
+        )
+        parser.add_argument(
+            "--thresholds",
+            default=str(DEFAULT_THRESHOLDS),
+            help="JSON с порогами по сценариям ('' — не проверять).",
+        )
+        parser.add_argument(
+            "--baseline", help="JSON-отчет предыдущего прогона для сравнения."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Допустимый рост p95 относительно --baseline (доля).",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed генератора.")
+
+    def handle(self, *args, **options):
+        names = options["scenario"] or list(SCENARIOS)
+        results, auth_overhead, documents = self.run(names, options)
+
+        report = {
+            "meta": {
+                "users": options["users"],
+                "roles": options["roles"],
+                "permissions": options["permissions"],
+                "documents": options["documents"],
+                "grants_per_user": options["grants_per_user"],
+                "database": connection.vendor,
+                "stateless_tokens": settings.RBAC_STATELESS_TOKENS,
+            },
+            "results": results,
+            "auth_overhead": auth_overhead,
+            "documents": documents,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(output + "\n", encoding="utf-8")
+            for name, result in results.items():
+                self.stdout.write(
+                    f"{name:<24} p50={result['p50_ms']:>8} мс  "
+                    f"p95={result['p95_ms']:>8} мс  p99={result['p99_ms']:>8} мс  "
+                    f"rps={result['rps']:>8}  queries={result['queries_max']}"
+                )
+            self.stdout.write(
+                f"Аутентификация: {auth_overhead['uncached_us']} мкс без кэша "
+                f"токенов, {auth_overhead['cached_us']} мкс с кэшем "
+                f"(x{auth_overhead['speedup']})"
+            )
+            self.stdout.write(
+                f"Документы: {documents['visible']} видимых из "
+                f"{documents['documents']} ({documents['grants']} доступов), "
+                f"первая страница p95={documents['first_page']['p95_ms']} мс, "
+                f"средняя p95={documents['middle_page']['p95_ms']} мс, "
+                f"запросов на страницу: {documents['first_page']['queries']}"
+            )
+        else:
+            self.stdout.write(output)
+
+        violations = []
+        for name, result in results.items():
+            if result["errors"]:
+                violations.append(f"{name}: неожиданные статусы {result['statuses']}")
+        if options["thresholds"]:
+            thresholds = json.loads(Path(options["thresholds"]).read_text())
+            violations += check_thresholds(results, thresholds)
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())
+            violations += check_baseline(results, baseline, options["tolerance"])
+        if violations:
+            raise CommandError("Регрессии:\n" + "\n".join(violations))
+
+    def run(self, names, options):
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Троттлинг входа отключен: сценарий login повторяет вход одного
+        # пользователя много раз
+        unlimited = 10**9
+        throttle = {
+            **settings.LOGIN_THROTTLE,
+            "IP_LIMIT": unlimited,
+            "EMAIL_LIMIT": unlimited,
+            "LOCKOUT_THRESHOLD": unlimited,
+            "IP_LOCKOUT_THRESHOLD": unlimited,
+        }
+        # Ожидаемые 4xx сценариев не должны засорять вывод
+        request_logger = logging.getLogger("django.request")
+        log_level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(LOGIN_THROTTLE=throttle):
+                context = seed(
+                    options["users"],
+                    options["roles"],
+                    options["permissions"],
+                    roles_per_user=options["roles_per_user"],
+                    permissions_per_role=options["permissions_per_role"],
+                    rng=options["seed"],
+                )
+                seed_documents(
+                    context, options["documents"], options["grants_per_user"]
+                )
+                client = Client()
+                results = {}
+                for name in names:
+                    iterations = options["iterations"]
+                    if name in SLOW_SCENARIOS:
+                        iterations = min(iterations, options["slow_iterations"])
+                    results[name] = run_scenario(
+                        client, context, name, iterations, warmup=options["warmup"]
+                    )
+                auth_overhead = measure_auth_overhead(context, options["iterations"])
+                documents = measure_document_listing(context, options["iterations"])
+        finally:
+            request_logger.setLevel(log_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        return results, auth_overhead, documents
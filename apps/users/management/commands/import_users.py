@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.importers import READERS, UserImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково импортирует пользователей из CSV или JSONL "
+        "(колонки: email, password или password_hash, first_name, "
+        "last_name, patronymic, roles)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу или '-' для stdin.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="Формат файла. По умолчанию определяется по расширению.",
+        )
+        parser.add_argument("--batch-size", type=int, help="Размер пачки.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Число процессов для хэширования паролей (0 — без пула).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or Path(path).suffix.lstrip(".").lower()
+        if fmt not in READERS:
+            raise CommandError("Укажите --format: csv или jsonl.")
+
+        workers = options["workers"]
+        if workers is None:
+            workers = settings.USER_IMPORT["HASH_WORKERS"]
+        importer = UserImporter(
+            batch_size=options["batch_size"],
+            workers=workers,
+            on_batch=self._report_progress,
+        )
+        if path == "-":
+            result = importer.run(READERS[fmt](sys.stdin))
+        else:
+            with open(path, encoding="utf-8", newline="") as stream:
+                result = importer.run(READERS[fmt](stream))
+
+        for error in result.errors:
+            self.stderr.write(f"Строка {error['line']}: {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово: создано {result.created}, пропущено {result.skipped}, "
+                f"ошибок {result.failed}, назначено ролей {result.roles_assigned} "
+                f"за {result.elapsed:.1f} с ({result.rate:.0f} записей/с)."
+            )
+        )
+
+    def _report_progress(self, result):
+        self.stdout.write(
+            f"Обработано {result.processed} записей, {result.rate:.0f} записей/с"
+        )
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from apps.users.benchmark import PERCENTILES, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Измеряет задержку запроса к БД с новым соединением и в настроенном "
+        "режиме (CONN_MAX_AGE или пул соединений)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=200,
+            help="Сколько запросов выполнить в каждом режиме.",
+        )
+        parser.add_argument("--database", default="default", help="Алиас базы данных.")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        iterations = options["iterations"]
+
+        baseline = [self.new_connection_query(connection) for _ in range(iterations)]
+        configured = [self.request_query(connection) for _ in range(iterations)]
+
+        if getattr(connection, "pool", None) is not None:
+            mode = "пул соединений"
+        else:
+            mode = f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}"
+        self.report("Новое соединение на запрос", baseline)
+        self.report(f"Настроенный режим ({mode})", configured)
+        close_old_connections()
+
+    @staticmethod
+    def new_connection_query(connection):
+        # Соединение открывается драйвером напрямую: get_new_connection при
+        # включенном пуле выдал бы соединение из пула, а не новое
+        started = time.perf_counter()
+        raw = connection.Database.connect(**connection.get_connection_params())
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+        finally:
+            raw.close()
+        return time.perf_counter() - started
+
+    @staticmethod
+    def request_query(connection):
+        # Повторяет жизненный цикл запроса: close_old_connections вызывается
+        # по сигналам request_started и request_finished
+        started = time.perf_counter()
+        close_old_connections()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        close_old_connections()
+        return time.perf_counter() - started
+
+    def report(self, title, samples):
+        values = ", ".join(
+            f"p{pct}={percentile(samples, pct) * 1000:.2f} мс" for pct in PERCENTILES
+        )
+        self.stdout.write(f"{title}: {values}")
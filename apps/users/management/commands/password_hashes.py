@@ -0,0 +1,72 @@
+from collections import Counter
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+
+from apps.users.models import CustomUser
+
+# Параметры стоимости в результате hasher.decode()
+COST_FIELDS = ("iterations", "work_factor", "time_cost", "memory_cost", "parallelism")
+
+
+def describe(hasher, encoded):
+    """
+    Алгоритм и параметры стоимости хэша, например ("argon2", "time_cost=2, ...").
+    """
+    try:
+        decoded = hasher.decode(encoded)
+    except Exception:
+        return hasher.algorithm, "?"
+    params = ", ".join(
+        f"{field}={decoded[field]}" for field in COST_FIELDS if field in decoded
+    )
+    return hasher.algorithm, params
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает распределение хэшей паролей пользователей по алгоритмам "
+        "и параметрам стоимости. Устаревшие хэши пересчитываются при входе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Сколько пользователей читать из базы за раз.",
+        )
+
+    def handle(self, *args, **options):
+        preferred = hashers.get_hasher()
+        current = describe(preferred, preferred.encode("password", preferred.salt()))
+        self.stdout.write(f"Текущая политика: {current[0]} ({current[1]})")
+
+        groups, outdated = Counter(), Counter()
+        passwords = CustomUser.objects.values_list("password", flat=True)
+        for encoded in passwords.iterator(chunk_size=options["chunk_size"]):
+            if not hashers.is_password_usable(encoded):
+                groups["unusable", ""] += 1
+                continue
+            try:
+                hasher = hashers.identify_hasher(encoded)
+            except ValueError:
+                groups["unknown", ""] += 1
+                continue
+            key = describe(hasher, encoded)
+            groups[key] += 1
+            if hasher.algorithm != preferred.algorithm or preferred.must_update(
+                encoded
+            ):
+                outdated[key] += 1
+
+        total = sum(groups.values())
+        self.stdout.write(f"{'Алгоритм':<16} {'Параметры':<48} {'Число':>8}   Доля")
+        for (algorithm, params), count in groups.most_common():
+            share = count / total
+            status = " устарел" if outdated[algorithm, params] else ""
+            self.stdout.write(
+                f"{algorithm:<16} {params:<48} {count:>8} {share:>7.1%}{status}"
+            )
+        summary = f"Всего: {total}, устаревших: {sum(outdated.values())}."
+        self.stdout.write(self.style.SUCCESS(summary))
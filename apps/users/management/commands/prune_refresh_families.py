@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.users.models import RefreshTokenFamily
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет истекшие цепочки refresh-токенов. Запускается по расписанию "
+        "(cron) или постоянно с --interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Сколько записей удалять одним запросом.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Повторять каждые N секунд (0 — выполнить один раз).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = self.prune(options["batch_size"])
+            self.stdout.write(f"Удалено истекших цепочек: {deleted}.")
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+
+    def prune(self, batch_size):
+        # Удаление пачками: короткие транзакции не блокируют вход и обновление
+        expired = RefreshTokenFamily.objects.filter(expires_at__lt=timezone.now())
+        deleted = 0
+        while True:
+            ids = list(expired.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += RefreshTokenFamily.objects.filter(pk__in=ids).delete()[0]
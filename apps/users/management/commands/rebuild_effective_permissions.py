@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.users import effective, hierarchy
+from apps.users.cache import bump_rbac_version
+from apps.users.models import CustomUser, UserEffectivePermission
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает замыкание наследования ролей и таблицу эффективных "
+        "разрешений пользователей или проверяет их согласованность (--check)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только проверить согласованность, ничего не изменяя.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Сколько пользователей пересобирать в одной транзакции.",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            self._check()
+            return
+
+        with transaction.atomic():
+            closure = hierarchy.rebuild()
+        self.stdout.write(f"Замыкание наследования ролей пересобрано, пар: {closure}.")
+
+        batch_size = options["batch_size"]
+        user_ids = CustomUser.objects.order_by("pk").values_list("pk", flat=True)
+        batch, inserted = [], 0
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                inserted += self._rebuild_batch(batch)
+                batch = []
+        if batch:
+            inserted += self._rebuild_batch(batch)
+
+        bump_rbac_version()
+        self.stdout.write(
+            self.style.SUCCESS(f"Таблица пересобрана, записей: {inserted}.")
+        )
+
+    def _rebuild_batch(self, user_ids):
+        with transaction.atomic():
+            return effective.rebuild(user_ids)
+
+    def _check(self):
+        missing, extra = hierarchy.check_consistency()
+        self.stdout.write(
+            f"Замыкание наследования ролей: недостающих пар: {missing}, "
+            f"лишних: {extra}."
+        )
+        if missing or extra:
+            raise CommandError(
+                "Замыкание наследования ролей не согласовано. "
+                "Запустите команду без --check."
+            )
+
+        missing, extra = effective.check_consistency()
+        total = UserEffectivePermission.objects.count()
+        self.stdout.write(f"Записей: {total}, недостающих: {missing}, лишних: {extra}.")
+        if missing or extra:
+            raise CommandError(
+                "Таблица эффективных разрешений не согласована. "
+                "Запустите команду без --check."
+            )
+        self.stdout.write(self.style.SUCCESS("Таблица согласована."))
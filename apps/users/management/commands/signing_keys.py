@@ -0,0 +1,104 @@
+from datetime import date
+from pathlib import Path
+from secrets import token_hex
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.keyring import load_key
+
+GENERATORS = {
+    "EdDSA": ed25519.Ed25519PrivateKey.generate,
+    "RS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Управляет ключами подписи токенов в JWT_KEYS_DIR: показывает их, "
+        "создает новый ключ (--generate) или выводит старый из ротации, "
+        "оставляя только открытую часть (--retire KID)."
+    )
+    # Команда нужна и для исправления ошибки users.E001 (нет активного ключа)
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate",
+            action="store_true",
+            help="Создать новый закрытый ключ.",
+        )
+        parser.add_argument(
+            "--algorithm",
+            choices=GENERATORS,
+            default="EdDSA",
+            help="Алгоритм нового ключа.",
+        )
+        parser.add_argument(
+            "--kid",
+            help="kid нового ключа (по умолчанию дата и случайный суффикс).",
+        )
+        parser.add_argument(
+            "--retire",
+            metavar="KID",
+            help="Заменить закрытый ключ KID его открытой частью.",
+        )
+
+    def handle(self, *args, **options):
+        keys_dir = settings.JWT_SIGNING["KEYS_DIR"]
+        if not keys_dir:
+            raise CommandError("JWT_KEYS_DIR не задан.")
+        keys_dir = Path(keys_dir)
+        keys_dir.mkdir(parents=True, exist_ok=True)
+
+        if options["generate"]:
+            self.generate(keys_dir, options["algorithm"], options["kid"])
+        if options["retire"]:
+            self.retire(keys_dir, options["retire"])
+
+        active = settings.JWT_SIGNING["ACTIVE_KID"]
+        for path in sorted(keys_dir.glob("*.pem")):
+            key = load_key(path)
+            kind = "закрытый" if key.private_key is not None else "открытый"
+            mark = " (активный)" if key.kid == active else ""
+            self.stdout.write(f"{key.kid:<24} {key.algorithm:<6} {kind}{mark}")
+
+    def generate(self, keys_dir, algorithm, kid):
+        kid = kid or f"{date.today():%Y%m%d}-{token_hex(3)}"
+        path = keys_dir / f"{kid}.pem"
+        if path.exists():
+            raise CommandError(f"Ключ {kid} уже существует.")
+        pem = GENERATORS[algorithm]().private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        path.touch(mode=0o600)
+        path.write_bytes(pem)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создан ключ {kid}. Он уже публикуется в JWKS; сделайте его "
+                f"активным (JWT_ACTIVE_KID) не раньше чем через JWKS_MAX_AGE."
+            )
+        )
+
+    def retire(self, keys_dir, kid):
+        path = keys_dir / f"{kid}.pem"
+        if not path.exists():
+            raise CommandError(f"Ключа {kid} нет в {keys_dir}.")
+        if kid == settings.JWT_SIGNING["ACTIVE_KID"]:
+            raise CommandError(f"Ключ {kid} активен, сначала смените JWT_ACTIVE_KID.")
+        key = load_key(path)
+        pem = key.public_key.public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        path.write_bytes(pem)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ключ {kid} только проверяет токены. Удалите файл, когда "
+                f"истекут подписанные им refresh-токены."
+            )
+        )
@@ -0,0 +1,197 @@
+"""
+Метрики Prometheus для горячих путей аутентификации.
+
+Под gunicorn значения пишутся в файлы каталога PROMETHEUS_MULTIPROC_DIR
+(переменная окружения задается до запуска воркеров, см. config/gunicorn.conf.py),
+и /metrics суммирует их по всем воркерам. Без этой переменной метрики
+хранятся в памяти процесса.
+
+Время входа раскладывается на составляющие:
+auth_authenticate_duration_seconds — проверка учетных данных целиком,
+auth_password_hash_duration_seconds — из нее хэширование в пуле (с ожиданием
+в очереди); разница — поиск пользователя в БД.
+"""
+
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Проверки в памяти и по кэшу: от десятков микросекунд
+FAST_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+)
+# Операции с хэшированием пароля: сотни миллисекунд
+SLOW_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.5, 5.0)
+
+LOGIN_DURATION = Histogram(
+    "auth_login_duration_seconds",
+    "Время обработки входа (LoginView.post) по исходу.",
+    ["outcome"],
+    buckets=SLOW_BUCKETS,
+)
+AUTHENTICATE_DURATION = Histogram(
+    "auth_authenticate_duration_seconds",
+    "Проверка учетных данных (LoginSerializer.validate), включая хэширование.",
+    buckets=SLOW_BUCKETS,
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "auth_password_hash_duration_seconds",
+    "Хэширование и проверка пароля в пуле, включая ожидание в очереди.",
+    ["operation"],
+    buckets=SLOW_BUCKETS,
+)
+PERMISSION_CHECK_DURATION = Histogram(
+    "auth_permission_check_duration_seconds",
+    "Проверка HasPermission по результату.",
+    ["result"],
+    buckets=FAST_BUCKETS,
+)
+PERMISSION_MASK_LOOKUPS = Counter(
+    "auth_permission_mask_lookups",
+    "Поиск маски разрешений по месту, где она найдена (local, shared, db).",
+    ["source"],
+)
+USER_CACHE_LOOKUPS = Counter(
+    "auth_user_cache_lookups",
+    "Загрузка пользователя при аутентификации по результату (hit, miss).",
+    ["result"],
+)
+VERIFIED_TOKEN_CACHE_LOOKUPS = Counter(
+    "auth_verified_token_cache_lookups",
+    "Поиск проверенного access-токена в LRU процесса по результату (hit, miss).",
+    ["result"],
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "response_cache_lookups",
+    "Кэш ответов представлений по результату (hit, miss, not_modified).",
+    ["result"],
+)
+TOKEN_ISSUE_DURATION = Histogram(
+    "auth_token_issue_duration_seconds",
+    "Выпуск пары токенов (RefreshToken.for_user).",
+    buckets=FAST_BUCKETS,
+)
+TOKENS_VERIFIED = Counter(
+    "auth_tokens_verified",
+    "Проверенные access-токены по результату (valid, invalid, revoked).",
+    ["result"],
+)
+
+
+@contextmanager
+def timer(histogram, *labels):
+    """
+    Записывает в histogram время успешно завершившегося блока.
+    """
+    started = time.perf_counter()
+    yield
+    metric = histogram.labels(*labels) if labels else histogram
+    metric.observe(time.perf_counter() - started)
+
+
+def timed(histogram, result=None, errors=()):
+    """
+    Декоратор: записывает в histogram время вызова функции (sync или async).
+
+    result — метка успешного вызова: строка или функция от возвращенного
+    значения; None — у histogram нет меток. errors — пары (класс исключения,
+    метка); для прочих исключений метка "error".
+    """
+
+    def observe(started, label):
+        metric = histogram if label is None else histogram.labels(label)
+        metric.observe(time.perf_counter() - started)
+
+    def success_label(value):
+        return result(value) if callable(result) else result
+
+    def error_label(exc):
+        if result is None:
+            return None
+        for exc_class, label in errors:
+            if isinstance(exc, exc_class):
+                return label
+        return "error"
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    value = await func(*args, **kwargs)
+                except Exception as exc:
+                    observe(started, error_label(exc))
+                    raise
+                observe(started, success_label(value))
+                return value
+
+        else:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    value = func(*args, **kwargs)
+                except Exception as exc:
+                    observe(started, error_label(exc))
+                    raise
+                observe(started, success_label(value))
+                return value
+
+        return wrapper
+
+    return decorator
+
+
+def render_metrics():
+    """
+    Метрики в текстовом формате Prometheus и их Content-Type.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def scrape_allowed(request):
+    """
+    Разрешен ли сбор метрик: по токену в заголовке
+    Authorization: Bearer <METRICS["TOKEN"]> или по адресу клиента
+    из METRICS["ALLOWED_IPS"]. Без настроек эндпоинт закрыт.
+    """
+    config = settings.METRICS
+    if request.META.get("REMOTE_ADDR") in config["ALLOWED_IPS"]:
+        return True
+    token = config["TOKEN"]
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if not token or scheme.lower() != "bearer":
+        return False
+    return hmac.compare_digest(credentials.encode(), token.encode())
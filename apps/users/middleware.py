@@ -0,0 +1,133 @@
+"""
+Бюджет SQL-запросов на HTTP-запрос.
+
+Middleware считает SQL-запросы и их суммарное время для каждого запроса
+(в production — для доли SAMPLE_RATE запросов) и сравнивает число запросов
+с бюджетом представления: атрибут max_queries — число или словарь
+{действие ViewSet или HTTP-метод: число}. При превышении бюджета пишет
+предупреждение в лог или, с ACTION="raise", поднимает QueryBudgetExceeded.
+Результат отдается в заголовках X-DB-Queries и Server-Timing.
+"""
+
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    """
+    execute_wrapper, считающий запросы и их суммарное время.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def get_query_budget(view_func, method):
+    """
+    Бюджет запросов представления или None, если он не задан.
+    """
+    view_class = getattr(view_func, "cls", None) or getattr(
+        view_func, "view_class", None
+    )
+    budget = getattr(view_class, "max_queries", None)
+    if not isinstance(budget, dict):
+        return budget
+    # У ViewSet бюджет задается по действию (list, retrieve, ...)
+    actions = getattr(view_func, "actions", None) or {}
+    return budget.get(actions.get(method), budget.get(method))
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @property
+    def config(self):
+        return settings.QUERY_BUDGET
+
+    def _sampled(self):
+        config = self.config
+        return config["ENABLED"] and random.random() < config["SAMPLE_RATE"]
+
+    @staticmethod
+    def _track(stats):
+        # Соединения локальны для потока: обертки ставятся в том потоке,
+        # где выполняются запросы к БД
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        stats = QueryStats()
+        with self._track(stats):
+            response = self.get_response(request)
+        return self._finish(request, response, stats)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        # Под ASGI синхронный код запроса (ORM) выполняется в одном потоке
+        # (thread_sensitive), туда же ставятся обертки
+        stats = QueryStats()
+        stack = await sync_to_async(self._track)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._finish(request, response, stats)
+
+    def _finish(self, request, response, stats):
+        config = self.config
+        if config["HEADERS"]:
+            response["X-DB-Queries"] = str(stats.count)
+            response["Server-Timing"] = (
+                f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+            )
+
+        match = getattr(request, "resolver_match", None)
+        budget = None
+        if match is not None:
+            budget = get_query_budget(match.func, request.method.lower())
+        if budget is not None and stats.count > budget:
+            message = (
+                f"Query budget exceeded: {request.method} {request.path} "
+                f"executed {stats.count} queries (budget {budget})"
+            )
+            if config["ACTION"] == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+
+def assign_bit_indexes(apps, schema_editor):
+    """
+    Назначает разрешениям номера битов и вычисляет маски ролей.
+    """
+    permission_model = apps.get_model("users", "Permission")
+    role_model = apps.get_model("users", "Role")
+
+    for index, permission in enumerate(permission_model.objects.order_by("id")):
+        permission.bit_index = index
+        permission.save(update_fields=["bit_index"])
+
+    for role in role_model.objects.prefetch_related("permissions"):
+        mask = 0
+        for permission in role.permissions.all():
+            mask |= 1 << permission.bit_index
+        role.permission_mask = format(mask, "x")
+        role.save(update_fields=["permission_mask"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0003_populate_initial_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="permission",
+            name="bit_index",
+            field=models.PositiveIntegerField(
+                editable=False, null=True, verbose_name="Номер бита"
+            ),
+        ),
+        migrations.AddField(
+            model_name="role",
+            name="permission_mask",
+            field=models.TextField(
+                default="0", editable=False, verbose_name="Маска разрешений"
+            ),
+        ),
+        migrations.RunPython(assign_bit_indexes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="permission",
+            name="bit_index",
+            field=models.PositiveIntegerField(
+                editable=False, unique=True, verbose_name="Номер бита"
+            ),
+        ),
+    ]
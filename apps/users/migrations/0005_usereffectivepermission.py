@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_effective_permissions(apps, schema_editor):
+    """
+    Заполняет таблицу эффективных разрешений по текущим назначениям ролей.
+    """
+    user_model = apps.get_model("users", "CustomUser")
+    role_model = apps.get_model("users", "Role")
+    effective_model = apps.get_model("users", "UserEffectivePermission")
+
+    user_roles = user_model.roles.through._meta.db_table
+    role_permissions = role_model.permissions.through._meta.db_table
+    schema_editor.execute(
+        f"INSERT INTO {effective_model._meta.db_table} (user_id, permission_id) "
+        f"SELECT DISTINCT ur.customuser_id, rp.permission_id FROM {user_roles} ur "
+        f"JOIN {role_permissions} rp ON rp.role_id = ur.role_id"
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0004_permission_bitmap"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserEffectivePermission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "permission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="users.permission",
+                        verbose_name="Разрешение",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_permissions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Эффективное разрешение",
+                "verbose_name_plural": "Эффективные разрешения",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "permission"),
+                        name="users_uep_user_permission_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_effective_permissions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from ._helpers import add_admin_permission
+
+
+def add_import_users_permission(apps, schema_editor):
+    """
+    Добавляет разрешение 'import_users' и выдает его роли "Администратор".
+    """
+    add_admin_permission(
+        apps, "import_users", "Разрешает массово импортировать пользователей."
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0005_usereffectivepermission"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_import_users_permission, migrations.RunPython.noop),
+    ]
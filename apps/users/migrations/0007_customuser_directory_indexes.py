@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0006_import_users_permission"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["-date_joined", "-id"],
+                name="users_active_joined_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                condition=models.Q(("is_deleted", True)),
+                fields=["-date_joined", "-id"],
+                name="users_deleted_joined_idx",
+            ),
+        ),
+    ]
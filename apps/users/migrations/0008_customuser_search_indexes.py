@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Индексы под поиск в справочнике пользователей (только PostgreSQL):
+# - префиксный поиск по email (email__istartswith -> UPPER(email) LIKE 'X%');
+# - поиск подстроки в фамилии (last_name__icontains) через pg_trgm.
+# Создаются CONCURRENTLY, чтобы не блокировать запись в большую таблицу.
+SEARCH_INDEXES = [
+    (
+        "users_email_upper_prefix_idx",
+        "ON users_customuser (UPPER(email) text_pattern_ops)",
+    ),
+    (
+        "users_last_name_trgm_idx",
+        "ON users_customuser USING gin (UPPER(last_name) gin_trgm_ops)",
+    ),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, definition in SEARCH_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("users", "0007_customuser_directory_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
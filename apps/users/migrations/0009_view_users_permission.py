@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from ._helpers import add_admin_permission
+
+
+def add_view_users_permission(apps, schema_editor):
+    """
+    Добавляет разрешение 'view_users' и выдает его роли "Администратор".
+    """
+    add_admin_permission(
+        apps, "view_users", "Разрешает просматривать справочник пользователей."
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0008_customuser_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_view_users_permission, migrations.RunPython.noop),
+    ]
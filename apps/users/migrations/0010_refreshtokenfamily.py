@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0009_view_users_permission"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RefreshTokenFamily",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("current_jti", models.UUIDField(verbose_name="jti текущего токена")),
+                (
+                    "expires_at",
+                    models.DateTimeField(db_index=True, verbose_name="Истекает"),
+                ),
+                (
+                    "revoked",
+                    models.BooleanField(default=False, verbose_name="Отозвана"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Цепочка refresh-токенов",
+                "verbose_name_plural": "Цепочки refresh-токенов",
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from ._helpers import add_admin_permission
+
+
+def add_introspect_tokens_permission(apps, schema_editor):
+    """
+    Добавляет разрешение 'introspect_tokens' и выдает его роли "Администратор".
+    """
+    add_admin_permission(
+        apps,
+        "introspect_tokens",
+        "Разрешает пакетную проверку токенов и разрешений (шлюзы).",
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0010_refreshtokenfamily"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            add_introspect_tokens_permission, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_role_closure(apps, schema_editor):
+    """
+    Заполняет замыкание парами (роль, роль): родителей у ролей еще нет.
+    """
+    role_model = apps.get_model("users", "Role")
+    closure_model = apps.get_model("users", "RoleClosure")
+    closure_model.objects.bulk_create(
+        [
+            closure_model(ancestor_id=role_id, descendant_id=role_id)
+            for role_id in role_model.objects.values_list("pk", flat=True)
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0011_introspect_tokens_permission"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="role",
+            name="parents",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="children",
+                to="users.role",
+                verbose_name="Родительские роли",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RoleClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="users.role",
+                        verbose_name="Предок",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="users.role",
+                        verbose_name="Потомок",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Наследование роли",
+                "verbose_name_plural": "Наследование ролей",
+            },
+        ),
+        migrations.AddField(
+            model_name="role",
+            name="ancestors",
+            field=models.ManyToManyField(
+                editable=False,
+                related_name="descendants",
+                through="users.RoleClosure",
+                through_fields=("descendant", "ancestor"),
+                to="users.role",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="roleclosure",
+            index=models.Index(
+                fields=["descendant", "ancestor"], name="users_roleclosure_desc_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="roleclosure",
+            constraint=models.UniqueConstraint(
+                fields=("ancestor", "descendant"),
+                name="users_roleclosure_ancestor_descendant_uniq",
+            ),
+        ),
+        migrations.RunPython(populate_role_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:39
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0012_role_hierarchy"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="role",
+            name="permission_mask",
+        ),
+    ]
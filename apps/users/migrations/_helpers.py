@@ -0,0 +1,36 @@
+from django.db.models import Max
+
+
+def add_admin_permission(apps, name, description):
+    """
+    Создает разрешение name со следующим свободным номером бита и выдает его
+    роли "Администратор". Сигналы в миграциях не работают, поэтому таблица
+    эффективных разрешений дополняется здесь же.
+    """
+    permission_model = apps.get_model("users", "Permission")
+    role_model = apps.get_model("users", "Role")
+    effective_model = apps.get_model("users", "UserEffectivePermission")
+
+    max_index = permission_model.objects.aggregate(m=Max("bit_index"))["m"]
+    permission, created = permission_model.objects.get_or_create(
+        name=name,
+        defaults={
+            "description": description,
+            "bit_index": 0 if max_index is None else max_index + 1,
+        },
+    )
+    if not created:
+        return
+
+    admin_role = role_model.objects.filter(name="Администратор").first()
+    if admin_role is None:
+        return
+
+    admin_role.permissions.add(permission)
+    effective_model.objects.bulk_create(
+        [
+            effective_model(user_id=user_id, permission=permission)
+            for user_id in admin_role.users.values_list("pk", flat=True)
+        ],
+        ignore_conflicts=True,
+    )
@@ -3,9 +3,17 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
 )
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Max
 from django.utils import timezone
 
+from . import hashing
+
+# Флаги пользователя, от которых зависят его права (см. signals.py)
+ACCESS_FLAGS = ("is_active", "is_staff", "is_superuser")
+# Попыток выделить номер бита разрешения при параллельном создании
+BIT_INDEX_ATTEMPTS = 10
+
 
 class CustomUserManager(BaseUserManager):
     """
@@ -20,7 +28,7 @@ class CustomUserManager(BaseUserManager):
             raise ValueError("Поле Email должно быть установлено")
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)  # Хэширует пароль
+        user.password = hashing.make_password(password)  # Хэширует пароль в пуле
         user.save(using=self._db)
         return user
 
@@ -69,9 +77,42 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     objects = CustomUserManager()
 
+    class Meta:
+        indexes = [
+            # Keyset-пагинация справочника пользователей по (date_joined, id)
+            models.Index(
+                fields=["-date_joined", "-id"],
+                condition=models.Q(is_deleted=False),
+                name="users_active_joined_idx",
+            ),
+            models.Index(
+                fields=["-date_joined", "-id"],
+                condition=models.Q(is_deleted=True),
+                name="users_deleted_joined_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Загруженные значения флагов доступа: их изменение отслеживают сигналы
+        user._loaded_access_flags = {
+            name: user.__dict__[name] for name in ACCESS_FLAGS if name in user.__dict__
+        }
+        return user
+
+    def access_flags_changed(self):
+        """
+        Изменились ли is_active, is_staff или is_superuser с момента загрузки.
+        """
+        loaded = self.__dict__.get("_loaded_access_flags", {})
+        return any(
+            self.__dict__.get(name, value) != value for name, value in loaded.items()
+        )
+
     def get_full_name(self):
         full_name = "%s %s %s" % (self.last_name, self.first_name, self.patronymic)
         return full_name.strip()
@@ -86,6 +127,7 @@ class Permission(models.Model):
         "Название разрешения (кодовое)", max_length=100, unique=True
     )
     description = models.TextField("Описание", blank=True)
+    bit_index = models.PositiveIntegerField("Номер бита", unique=True, editable=False)
 
     class Meta:
         verbose_name = "Разрешение"
@@ -94,6 +136,27 @@ class Permission(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def next_bit_index(cls):
+        max_index = cls.objects.aggregate(m=Max("bit_index"))["m"]
+        return 0 if max_index is None else max_index + 1
+
+    def save(self, *args, **kwargs):
+        if self.bit_index is not None:
+            return super().save(*args, **kwargs)
+        # Параллельное создание может занять тот же бит: уникальный индекс
+        # отклоняет вставку, и следующий свободный бит ищется заново
+        for attempt in range(BIT_INDEX_ATTEMPTS):
+            self.bit_index = self.next_bit_index()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                self.bit_index = None
+                taken = Permission.objects.filter(name=self.name).exists()
+                if taken or attempt == BIT_INDEX_ATTEMPTS - 1:
+                    raise
+
 
 class Role(models.Model):
     """
@@ -105,6 +168,23 @@ class Role(models.Model):
     permissions = models.ManyToManyField(
         Permission, verbose_name="Разрешения", blank=True, related_name="roles"
     )
+    # Роль наследует разрешения родителей на любую глубину (см. apps.users.hierarchy)
+    parents = models.ManyToManyField(
+        "self",
+        verbose_name="Родительские роли",
+        blank=True,
+        symmetrical=False,
+        related_name="children",
+    )
+    # Все предки роли, включая ее саму; поддерживается сигналами, не изменять
+    ancestors = models.ManyToManyField(
+        "self",
+        through="RoleClosure",
+        through_fields=("descendant", "ancestor"),
+        symmetrical=False,
+        related_name="descendants",
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Роль"
@@ -112,3 +192,96 @@ class Role(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class RoleClosure(models.Model):
+    """
+    Транзитивное замыкание наследования ролей: все пары (предок, потомок),
+    включая пару роли с самой собой (см. apps.users.hierarchy).
+    """
+
+    ancestor = models.ForeignKey(
+        Role, on_delete=models.CASCADE, related_name="+", verbose_name="Предок"
+    )
+    descendant = models.ForeignKey(
+        Role, on_delete=models.CASCADE, related_name="+", verbose_name="Потомок"
+    )
+
+    class Meta:
+        verbose_name = "Наследование роли"
+        verbose_name_plural = "Наследование ролей"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"],
+                name="users_roleclosure_ancestor_descendant_uniq",
+            ),
+        ]
+        indexes = [
+            # Разрешения роли с учетом наследования: потомок -> его предки
+            models.Index(
+                fields=["descendant", "ancestor"],
+                name="users_roleclosure_desc_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id}"
+
+
+class UserEffectivePermission(models.Model):
+    """
+    Денормализованная таблица эффективных разрешений пользователя.
+    Поддерживается сигналами (см. apps.users.effective).
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="effective_permissions",
+        verbose_name="Пользователь",
+    )
+    permission = models.ForeignKey(
+        Permission,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Разрешение",
+    )
+
+    class Meta:
+        verbose_name = "Эффективное разрешение"
+        verbose_name_plural = "Эффективные разрешения"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "permission"], name="users_uep_user_permission_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.permission_id}"
+
+
+class RefreshTokenFamily(models.Model):
+    """
+    Цепочка refresh-токенов, начатая одним входом (см. apps.users.rotation).
+    Хранится только jti последнего выданного токена: предъявление любого
+    другого токена цепочки означает его повторное использование.
+    Истекшие записи удаляет команда prune_refresh_families.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Пользователь",
+    )
+    current_jti = models.UUIDField("jti текущего токена")
+    expires_at = models.DateTimeField("Истекает", db_index=True)
+    revoked = models.BooleanField("Отозвана", default=False)
+
+    class Meta:
+        verbose_name = "Цепочка refresh-токенов"
+        verbose_name_plural = "Цепочки refresh-токенов"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.pk}"
@@ -0,0 +1,114 @@
+import json
+from base64 import b64decode, b64encode
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация по первичному ключу: стоимость страницы не зависит
+    от ее номера, в отличие от LIMIT/OFFSET.
+    """
+
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset-пагинация по нескольким полям (по умолчанию по убыванию).
+
+    Курсор содержит значения ключевых полей последней записи страницы.
+    Последнее поле должно быть уникальным (обычно id), чтобы порядок был
+    однозначным. Ссылка есть только на следующую страницу.
+    """
+
+    keyset_fields = ("date_joined", "id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Некорректный курсор."
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, values):
+        # isoformat() вместо DjangoJSONEncoder: тот обрезает микросекунды
+        values = [v.isoformat() if hasattr(v, "isoformat") else v for v in values]
+        raw = json.dumps(values)
+        return b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.keyset_fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def filter_after(self, queryset, values):
+        """
+        Записи строго после курсора в порядке убывания. Для двух полей
+        (a, b) < (x, y) записывается как a <= x AND (a < x OR b < y), чтобы
+        первое условие задавало диапазон по индексу.
+        """
+        head, *tail = self.keyset_fields
+        condition = Q(**{f"{head}__lt": values[0]})
+        for index, name in enumerate(tail, start=1):
+            equal = Q(**dict(zip(self.keyset_fields, values[:index])))
+            condition |= equal & Q(**{f"{name}__lt": values[index]})
+        return queryset.filter(**{f"{head}__lte": values[0]}).filter(condition)
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        queryset = queryset.order_by(*(f"-{name}" for name in self.keyset_fields))
+
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = self.filter_after(queryset, values)
+        # Лишняя запись показывает, есть ли следующая страница
+        return queryset[: self.get_page_size(request) + 1]
+
+    def _set_page(self, rows):
+        page_size = self.get_page_size(self.request)
+        self.has_next = len(rows) > page_size
+        page = rows[:page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._set_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Асинхронный paginate_queryset().
+        """
+        queryset = self._page_queryset(queryset, request)
+        return self._set_page([obj async for obj in queryset])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        values = [getattr(self.last, name) for name in self.keyset_fields]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(values)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
@@ -1,13 +1,35 @@
 from rest_framework.permissions import BasePermission
 
+from .bitmap import amask_for_names, mask_for_names
+from .cache import (
+    aget_rbac_version,
+    aget_user_permission_mask,
+    get_user_permission_mask,
+)
+from .metrics import PERMISSION_CHECK_DURATION, timed
+
+
+def mask_allows(user_mask, required_mask):
+    """
+    Правило HasPermission: достаточно любого из требуемых разрешений.
+    """
+    return bool(user_mask & required_mask)
+
+
+def _check_result(allowed):
+    return "allowed" if allowed else "denied"
+
 
 class HasPermission(BasePermission):
     """
     Кастомный класс разрешений для проверки доступа на основе моделей Role и Permission.
+    Маска разрешений пользователя берется из кэша (см. apps.users.cache).
+    ahas_permission — та же проверка для асинхронных представлений.
     """
 
     message = "У вас нет разрешения на выполнение этого действия."
 
+    @timed(PERMISSION_CHECK_DURATION, result=_check_result)
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
@@ -20,13 +42,31 @@ class HasPermission(BasePermission):
         if not required_permissions:
             return True
 
-        user_permissions = set()
+        # В stateless-режиме маска разрешений уже есть в токене
+        user_mask = getattr(request.user, "token_permission_mask", None)
+        if user_mask is None:
+            user_mask = get_user_permission_mask(request.user)
 
-        for role in request.user.roles.all():
-            for perm in role.permissions.all():
-                user_permissions.add(perm.name)
+        return mask_allows(user_mask, mask_for_names(required_permissions))
 
-        if not user_permissions.intersection(required_permissions):
+    @timed(PERMISSION_CHECK_DURATION, result=_check_result)
+    async def ahas_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
             return False
 
-        return True
+        if request.user.is_superuser:
+            return True
+
+        required_permissions = getattr(view, "required_permissions", [])
+
+        if not required_permissions:
+            return True
+
+        # После загрузки версии RBAC token_permission_mask берет ее из памяти
+        # процесса и не обращается к кэшу
+        await aget_rbac_version()
+        user_mask = getattr(request.user, "token_permission_mask", None)
+        if user_mask is None:
+            user_mask = await aget_user_permission_mask(request.user)
+
+        return mask_allows(user_mask, await amask_for_names(required_permissions))
@@ -0,0 +1,216 @@
+"""
+Кэширование ответов DRF-представлений с учетом разрешений.
+
+Декоратор cache_response оборачивает обработчик (get) представления:
+аутентификация и проверка разрешений выполняются как обычно, а тело
+обработчика — только при промахе кэша. Ключ строится из представления,
+URL запроса, отпечатка разрешений пользователя и версии данных:
+- отпечаток — биты эффективной маски, относящиеся к разрешениям
+  представления (required_permissions или vary_on), поэтому все обладатели
+  одних и тех же прав получают одну запись; с per_user=True запись своя
+  у каждого пользователя;
+- версия данных — счетчик в общем кэше, bump_data_version() делает
+  недействительными все ответы, построенные по этим данным; с rbac=True
+  к ней добавляется версия RBAC (ответ зависит от ролей пользователя).
+
+Кэшируются данные ответа (а не отрендеренные байты), поэтому согласование
+формата не ломается. ETag считается по данным; запрос с совпадающим
+If-None-Match получает 304 без тела.
+"""
+
+import hashlib
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .bitmap import amask_for_names, mask_for_names, mask_to_hex
+from .cache import (
+    aget_rbac_version,
+    aget_user_permission_mask,
+    get_rbac_version,
+    get_user_permission_mask,
+)
+from .metrics import RESPONSE_CACHE_LOOKUPS
+
+
+def _version_key(name):
+    return f"data:version:{name}"
+
+
+def get_data_version(name):
+    version = cache.get(_version_key(name))
+    if version is None:
+        # Как и версия RBAC, стартует со времени: вытесненный из кэша счетчик
+        # не совпадет с уже использованными значениями
+        cache.add(_version_key(name), time.time_ns() // 1000, timeout=None)
+        version = cache.get(_version_key(name))
+    return version
+
+
+async def aget_data_version(name):
+    version = await cache.aget(_version_key(name))
+    if version is None:
+        await cache.aadd(_version_key(name), time.time_ns() // 1000, timeout=None)
+        version = await cache.aget(_version_key(name))
+    return version
+
+
+def bump_data_version(name):
+    """
+    Делает недействительными закэшированные ответы, построенные по данным name.
+    """
+    try:
+        return cache.incr(_version_key(name))
+    except ValueError:
+        version = time.time_ns() // 1000
+        cache.set(_version_key(name), version, timeout=None)
+        return version
+
+
+def _permission_names(view, vary_on):
+    if vary_on is not None:
+        return vary_on
+    return getattr(view, "required_permissions", [])
+
+
+def _fingerprint(user, mask, required, per_user):
+    if user.is_superuser:
+        mask = required
+    parts = [mask_to_hex(mask & required)]
+    if per_user:
+        parts.append(str(user.pk))
+    return ":".join(parts)
+
+
+def _user_mask(user):
+    if not user.is_authenticated or user.is_superuser:
+        return 0
+    mask = getattr(user, "token_permission_mask", None)
+    if mask is None:
+        mask = get_user_permission_mask(user)
+    return mask
+
+
+async def _auser_mask(user):
+    if not user.is_authenticated or user.is_superuser:
+        return 0
+    mask = getattr(user, "token_permission_mask", None)
+    if mask is None:
+        mask = await aget_user_permission_mask(user)
+    return mask
+
+
+def _key(view, request, fingerprint, version):
+    raw = ":".join(
+        [
+            f"{type(view).__module__}.{type(view).__qualname__}",
+            request.get_full_path(),
+            fingerprint,
+            str(version),
+        ]
+    )
+    return "resp:" + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def _etag(data):
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return '"%s"' % hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _respond(request, etag, data, result):
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        RESPONSE_CACHE_LOOKUPS.labels("not_modified").inc()
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        RESPONSE_CACHE_LOOKUPS.labels(result).inc()
+        response = Response(data)
+    response["ETag"] = etag
+    # Ответ зависит от пользователя: общие кэши не хранят, браузер сверяет ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def cache_response(
+    data_version, per_user=False, vary_on=None, timeout=None, rbac=False
+):
+    """
+    Декоратор обработчика DRF-представления (sync или async).
+
+    data_version — имя версии данных, от которых зависит ответ;
+    per_user — ответ зависит от самого пользователя, а не только от его прав;
+    rbac — ответ зависит от ролей пользователя (например, доступы ролям),
+    запись сбрасывается при любом изменении RBAC;
+    vary_on — разрешения, от которых зависит ответ (по умолчанию
+    required_permissions представления); timeout — время жизни записи,
+    секунды (по умолчанию RESPONSE_CACHE["TIMEOUT"]).
+    """
+
+    def get_timeout():
+        return settings.RESPONSE_CACHE["TIMEOUT"] if timeout is None else timeout
+
+    def decorator(handler):
+        if iscoroutinefunction(handler):
+
+            @wraps(handler)
+            async def wrapper(self, request, *args, **kwargs):
+                names = _permission_names(self, vary_on)
+                fingerprint = _fingerprint(
+                    request.user,
+                    await _auser_mask(request.user),
+                    await amask_for_names(names),
+                    per_user,
+                )
+                version = await aget_data_version(data_version)
+                if rbac:
+                    version = f"{version}:{await aget_rbac_version()}"
+                key = _key(self, request, fingerprint, version)
+
+                entry = await cache.aget(key)
+                if entry is not None:
+                    return _respond(request, *entry, "hit")
+
+                response = await handler(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = (_etag(response.data), response.data)
+                await cache.aset(key, entry, get_timeout())
+                return _respond(request, *entry, "miss")
+
+        else:
+
+            @wraps(handler)
+            def wrapper(self, request, *args, **kwargs):
+                names = _permission_names(self, vary_on)
+                fingerprint = _fingerprint(
+                    request.user,
+                    _user_mask(request.user),
+                    mask_for_names(names),
+                    per_user,
+                )
+                version = get_data_version(data_version)
+                if rbac:
+                    version = f"{version}:{get_rbac_version()}"
+                key = _key(self, request, fingerprint, version)
+
+                entry = cache.get(key)
+                if entry is not None:
+                    return _respond(request, *entry, "hit")
+
+                response = handler(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = (_etag(response.data), response.data)
+                cache.set(key, entry, get_timeout())
+                return _respond(request, *entry, "miss")
+
+        return wrapper
+
+    return decorator
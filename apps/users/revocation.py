@@ -0,0 +1,321 @@
+"""
+Отзыв JWT-токенов (logout).
+
+Отозванные токены хранятся в общем кэше с TTL до истечения токена: по jti
+для отдельного токена, по цепочке refresh-токенов (см. apps.users.rotation)
+для всех токенов одного входа и как отметка «токены, выпущенные раньше T,
+недействительны» для всех токенов пользователя. Каждый отзыв дописывается
+в журнал (последовательные ключи в кэше), по которому процессы пополняют
+локальный фильтр Блума. Проверка токена, которого нет в фильтре, не требует
+обращения к кэшу; в кэш идут только срабатывания фильтра.
+
+Другие процессы узнают об отзыве в течение SYNC_INTERVAL секунд.
+BLOOM_CAPACITY должен превышать число отзывов за время жизни refresh-токена.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import FAMILY_CLAIM
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SEQ_KEY = "auth:revocations:seq"
+FETCH_CHUNK_SIZE = 1000
+
+
+class BloomFilter:
+    """
+    Фильтр Блума: принадлежность множеству с ложноположительными ответами
+    с вероятностью около error_rate при не более чем capacity элементах.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Двойное хэширование: k позиций из двух независимых половин дайджеста
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+def _config():
+    return settings.TOKEN_REVOCATION
+
+
+def _new_bloom():
+    config = _config()
+    return BloomFilter(config["BLOOM_CAPACITY"], config["BLOOM_ERROR_RATE"])
+
+
+def _journal_key(seq):
+    return f"auth:revocations:{seq}"
+
+
+def _jti_member(jti):
+    return f"jti:{jti}"
+
+
+def _family_member(family_id):
+    return f"fam:{family_id}"
+
+
+def _user_member(user_id):
+    return f"user:{user_id}"
+
+
+def _revoked_key(member):
+    return f"auth:revoked:{member}"
+
+
+def _journal_timeout():
+    # Дольше всех живет refresh-токен: после этого запись журнала не нужна
+    return int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()) + 1
+
+
+class _SyncState:
+    def __init__(self):
+        self.bloom = _new_bloom()
+        self.seq = None
+        self.checked_at = float("-inf")
+        # Меняется при каждом пополнении фильтра (см. revocation_epoch)
+        self.epoch = 0
+        self.lock = threading.Lock()
+
+
+_state = _SyncState()
+
+
+def _load_journal(start, end):
+    """
+    Добавляет в фильтр записи журнала с номерами [start, end].
+    """
+    for chunk_start in range(start, end + 1, FETCH_CHUNK_SIZE):
+        chunk_end = min(chunk_start + FETCH_CHUNK_SIZE, end + 1)
+        keys = [_journal_key(seq) for seq in range(chunk_start, chunk_end)]
+        for member in cache.get_many(keys).values():
+            _state.bloom.add(member)
+
+
+def _sync_due():
+    return time.monotonic() - _state.checked_at >= _config()["SYNC_INTERVAL"]
+
+
+def sync_journal():
+    """
+    Дочитывает журнал отзывов, не чаще раза в SYNC_INTERVAL секунд.
+    """
+    if not _sync_due():
+        return
+    with _state.lock:
+        if not _sync_due():
+            return
+        config = _config()
+        seq = cache.get(JOURNAL_SEQ_KEY, 0)
+        start = (_state.seq or 0) + 1
+        capacity = config["BLOOM_CAPACITY"]
+        if (
+            _state.seq is None
+            or seq < _state.seq
+            or seq - _state.seq > capacity
+            or _state.bloom.count > capacity
+        ):
+            # Первый запуск, сброс кэша или переполнение фильтра: собираем
+            # фильтр заново по последним записям журнала (старые уже истекли)
+            _state.bloom = _new_bloom()
+            start = max(1, seq - capacity + 1)
+        _load_journal(start, seq)
+        if seq != _state.seq:
+            _state.epoch += 1
+        _state.seq = seq
+        _state.checked_at = time.monotonic()
+
+
+def _next_seq():
+    if cache.add(JOURNAL_SEQ_KEY, 1, None):
+        return 1
+    return cache.incr(JOURNAL_SEQ_KEY)
+
+
+def _record(member, key, value, timeout):
+    cache.set(key, value, timeout)
+    cache.set(_journal_key(_next_seq()), member, _journal_timeout())
+    # Текущий процесс видит отзыв сразу, не дожидаясь синхронизации
+    _state.bloom.add(member)
+    _state.epoch += 1
+
+
+def revoke_token(token):
+    """
+    Отзывает токен (access или refresh) до момента его истечения.
+    """
+    member = _jti_member(token[api_settings.JTI_CLAIM])
+    timeout = max(1, math.ceil(token["exp"] - time.time()))
+    _record(member, _revoked_key(member), True, timeout)
+
+
+def revoke_token_family(family_id):
+    """
+    Отзывает все токены цепочки, включая уже выданные access-токены.
+    """
+    member = _family_member(family_id)
+    _record(member, _revoked_key(member), True, _journal_timeout())
+
+
+def revoke_user_tokens(user_id, before=None):
+    """
+    Отзывает все токены пользователя, выпущенные раньше before (по умолчанию
+    сейчас). Токены, выпущенные в ту же секунду, тоже считаются отозванными.
+    """
+    before = time.time() if before is None else before
+    member = _user_member(user_id)
+    _record(member, _revoked_key(member), before, _journal_timeout())
+
+
+def revocation_epoch():
+    """
+    Номер состояния фильтра отзывов процесса (дочитав журнал, если пора).
+    Пока номер не изменился, токен, признанный неотозванным, таким и остается.
+    """
+    try:
+        sync_journal()
+    except Exception:
+        logger.warning("Cache unavailable, revocation list not synced", exc_info=True)
+    return _state.epoch
+
+
+async def arevocation_epoch():
+    """
+    Асинхронный revocation_epoch().
+    """
+    if _sync_due():
+        try:
+            await sync_to_async(sync_journal)()
+        except Exception:
+            logger.warning(
+                "Cache unavailable, revocation list not synced", exc_info=True
+            )
+    return _state.epoch
+
+
+def _candidates(token):
+    """
+    Ключи отзыва, подходящие токену по фильтру Блума.
+    """
+    members = [
+        _jti_member(token.get(api_settings.JTI_CLAIM)),
+        _user_member(token.get(api_settings.USER_ID_CLAIM)),
+    ]
+    if FAMILY_CLAIM in token:
+        members.append(_family_member(token[FAMILY_CLAIM]))
+    return [member for member in members if member in _state.bloom]
+
+
+def _check(token, values):
+    if values.get(_revoked_key(_jti_member(token.get(api_settings.JTI_CLAIM)))):
+        return True
+    if values.get(_revoked_key(_family_member(token.get(FAMILY_CLAIM)))):
+        return True
+    before = values.get(
+        _revoked_key(_user_member(token.get(api_settings.USER_ID_CLAIM)))
+    )
+    return before is not None and token.get("iat", 0) < before
+
+
+def is_revoked(token):
+    """
+    Проверяет, отозван ли провалидированный токен.
+    """
+    try:
+        sync_journal()
+    except Exception:
+        logger.warning("Cache unavailable, revocation list not synced", exc_info=True)
+
+    candidates = _candidates(token)
+    if not candidates:
+        return False
+
+    try:
+        values = cache.get_many([_revoked_key(member) for member in candidates])
+    except Exception:
+        # Токен есть в фильтре, а проверить его нельзя: считаем отозванным
+        logger.warning("Cache unavailable, treating token as revoked", exc_info=True)
+        return True
+    return _check(token, values)
+
+
+async def ais_revoked(token):
+    """
+    Асинхронный is_revoked(). В установившемся режиме не покидает event loop:
+    синхронизация журнала уходит в поток раз в SYNC_INTERVAL секунд.
+    """
+    if _sync_due():
+        try:
+            await sync_to_async(sync_journal)()
+        except Exception:
+            logger.warning(
+                "Cache unavailable, revocation list not synced", exc_info=True
+            )
+
+    candidates = _candidates(token)
+    if not candidates:
+        return False
+
+    try:
+        values = await cache.aget_many([_revoked_key(member) for member in candidates])
+    except Exception:
+        logger.warning("Cache unavailable, treating token as revoked", exc_info=True)
+        return True
+    return _check(token, values)
+
+
+async def ais_revoked_many(tokens):
+    """
+    ais_revoked() для набора токенов: одно обращение к кэшу на весь набор.
+    """
+    if _sync_due():
+        try:
+            await sync_to_async(sync_journal)()
+        except Exception:
+            logger.warning(
+                "Cache unavailable, revocation list not synced", exc_info=True
+            )
+
+    candidates = {member for token in tokens for member in _candidates(token)}
+    if not candidates:
+        return [False] * len(tokens)
+
+    keys = [_revoked_key(member) for member in candidates]
+    try:
+        # BaseCache.aget_many() читает ключи по одному; пакет — одним get_many()
+        values = await sync_to_async(cache.get_many)(keys)
+    except Exception:
+        logger.warning("Cache unavailable, treating tokens as revoked", exc_info=True)
+        return [bool(_candidates(token)) for token in tokens]
+    return [_check(token, values) for token in tokens]
@@ -0,0 +1,119 @@
+"""
+Ротация refresh-токенов с обнаружением повторного использования.
+
+Каждый вход начинает цепочку (RefreshTokenFamily), ее id записывается
+в токены клеймом fam. При обновлении предъявленный refresh-токен меняется
+на новый, а в цепочке запоминается jti нового токена — одним условным
+UPDATE. Если предъявлен уже замененный токен (его украли или клиент
+использовал его повторно), цепочка отзывается целиком вместе с выданными
+по ней access-токенами.
+"""
+
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RefreshTokenFamily
+from .revocation import ais_revoked, revoke_token_family
+from .tokens import FAMILY_CLAIM, aupdate_user_claims, get_token_for_user
+from .user_cache import aget_user
+
+
+class TokenReused(AuthenticationFailed):
+    default_detail = "Refresh-токен уже использован, все токены входа отозваны."
+    default_code = "token_reused"
+
+
+def _expires_at(token):
+    return datetime_from_epoch(token["exp"])
+
+
+def issue_token_pair(user):
+    """
+    Выпускает refresh-токен (access-токен берется из него) и начинает цепочку.
+    """
+    refresh = get_token_for_user(user)
+    family_id = uuid.uuid4()
+    refresh[FAMILY_CLAIM] = family_id.hex
+    RefreshTokenFamily.objects.create(
+        id=family_id,
+        user_id=user.pk,
+        current_jti=refresh[api_settings.JTI_CLAIM],
+        expires_at=_expires_at(refresh),
+    )
+    return refresh
+
+
+def revoke_family(token):
+    """
+    Отзывает цепочку, к которой принадлежит токен (при выходе).
+    """
+    family_id = token.get(FAMILY_CLAIM)
+    if family_id is None:
+        return
+    RefreshTokenFamily.objects.filter(pk=family_id).update(revoked=True)
+    revoke_token_family(family_id)
+
+
+def revoke_user_families(user_id):
+    """
+    Отмечает отозванными все цепочки пользователя (выход на всех устройствах).
+    Сами токены отзывает revocation.revoke_user_tokens().
+    """
+    RefreshTokenFamily.objects.filter(user_id=user_id, revoked=False).update(
+        revoked=True
+    )
+
+
+async def _arevoke_family(family_id):
+    await RefreshTokenFamily.objects.filter(pk=family_id).aupdate(revoked=True)
+    await sync_to_async(revoke_token_family)(family_id)
+
+
+async def arotate(raw_token):
+    """
+    Меняет refresh-токен на новый. Поднимает InvalidToken для недействительного
+    или отозванного токена и TokenReused для уже замененного.
+    """
+    try:
+        refresh = RefreshToken(raw_token)
+    except TokenError as e:
+        raise InvalidToken(e.args[0]) from e
+
+    if await ais_revoked(refresh):
+        raise InvalidToken("Токен отозван")
+
+    family_id = refresh.get(FAMILY_CLAIM)
+    if family_id is None:
+        raise InvalidToken("Токен выпущен без цепочки, войдите заново")
+
+    user = await aget_user(refresh[api_settings.USER_ID_CLAIM])
+    if user is None or not user.is_active or user.is_deleted:
+        raise AuthenticationFailed("Пользователь неактивен или удален")
+
+    old_jti = refresh[api_settings.JTI_CLAIM]
+    refresh.set_jti()
+    refresh.set_exp()
+    refresh.set_iat()
+    if settings.RBAC_STATELESS_TOKENS:
+        await aupdate_user_claims(refresh, user)
+
+    rotated = await RefreshTokenFamily.objects.filter(
+        pk=family_id, current_jti=old_jti, revoked=False
+    ).aupdate(
+        current_jti=refresh[api_settings.JTI_CLAIM], expires_at=_expires_at(refresh)
+    )
+    if not rotated:
+        # Замененный токен, отозванная или удаленная цепочка
+        await _arevoke_family(family_id)
+        raise TokenReused()
+    return refresh
@@ -1,6 +1,13 @@
-from django.contrib.auth import authenticate
+from django.conf import settings
+from django.contrib.auth import aauthenticate, authenticate
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from . import hierarchy
+from .metrics import AUTHENTICATE_DURATION, timed
 from .models import CustomUser, Permission, Role
 
 
@@ -64,35 +71,127 @@ class LoginSerializer(serializers.Serializer):
         label="Пароль", style={"input_type": "password"}, trim_whitespace=False
     )
 
+    @timed(AUTHENTICATE_DURATION)
     def validate(self, data):
+        email, password = self.get_credentials(data)
+        user = authenticate(
+            request=self.context.get("request"), email=email, password=password
+        )
+        data["user"] = self.validate_user(user)
+        return data
+
+    @timed(AUTHENTICATE_DURATION)
+    async def avalidate(self, data):
+        email, password = self.get_credentials(data)
+        user = await aauthenticate(
+            request=self.context.get("request"), email=email, password=password
+        )
+        data["user"] = self.validate_user(user)
+        return data
+
+    async def ais_valid(self):
+        """
+        Асинхронный аналог is_valid(): поля проверяются синхронно
+        (без ввода-вывода), а учетные данные — через aauthenticate.
+        """
+        try:
+            data = self.to_internal_value(self.initial_data)
+            self.run_validators(data)
+            self._validated_data = await self.avalidate(data)
+        except serializers.ValidationError as exc:
+            self._validated_data = {}
+            self._errors = serializers.as_serializer_error(exc)
+        else:
+            self._errors = {}
+        return not self._errors
+
+    @staticmethod
+    def get_credentials(data):
         email = data.get("email")
         password = data.get("password")
+        if not (email and password):
+            msg = 'Необходимо указать "email" и "password".'
+            raise serializers.ValidationError(msg, code="authorization")
+        return email, password
 
-        if email and password:
-            user = authenticate(
-                request=self.context.get("request"), email=email, password=password
-            )
+    @staticmethod
+    def validate_user(user):
+        if not user:
+            msg = "Невозможно войти с предоставленными учетными данными."
+            raise serializers.ValidationError(msg, code="authorization")
 
-            if not user:
-                msg = "Невозможно войти с предоставленными учетными данными."
-                raise serializers.ValidationError(msg, code="authorization")
+        if not isinstance(user, CustomUser):
+            msg = "Некорректный тип пользователя."
+            raise serializers.ValidationError(msg, code="authorization")
 
-            if not isinstance(user, CustomUser):
-                msg = "Некорректный тип пользователя."
-                raise serializers.ValidationError(msg, code="authorization")
+        if user.is_deleted:
+            msg = "Аккаунт этого пользователя удален."
+            raise serializers.ValidationError(msg, code="authorization")
 
-            if user.is_deleted:
-                msg = "Аккаунт этого пользователя удален."
-                raise serializers.ValidationError(msg, code="authorization")
+        return user
 
-        else:
-            msg = 'Необходимо указать "email" и "password".'
-            raise serializers.ValidationError(msg, code="authorization")
 
-        data["user"] = user
+class LogoutSerializer(serializers.Serializer):
+    """
+    Сериализатор для выхода: refresh-токен, который нужно отозвать вместе
+    с текущим access-токеном, и флаг выхода на всех устройствах.
+    """
+
+    refresh = serializers.CharField(required=False, label="Refresh-токен")
+    all = serializers.BooleanField(default=False, label="Выйти на всех устройствах")
+
+    def validate_refresh(self, value):
+        try:
+            token = RefreshToken(value)
+        except TokenError:
+            raise serializers.ValidationError("Некорректный refresh-токен.")
+
+        user = self.context["request"].user
+        if str(token.get(api_settings.USER_ID_CLAIM)) != str(user.pk):
+            raise serializers.ValidationError("Токен выдан другому пользователю.")
+        return token
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    """
+    Сериализатор для обновления токенов по refresh-токену.
+    """
+
+    refresh = serializers.CharField(label="Refresh-токен")
+
+
+class IntrospectionItemSerializer(serializers.Serializer):
+    """
+    Элемент пакета проверки: access-токен или id пользователя
+    и разрешения, хотя бы одно из которых требуется.
+    """
+
+    token = serializers.CharField(required=False, label="Access-токен")
+    subject = serializers.IntegerField(required=False, label="Id пользователя")
+    permissions = serializers.ListField(
+        child=serializers.CharField(), default=list, label="Разрешения"
+    )
+
+    def validate(self, data):
+        if ("token" in data) == ("subject" in data):
+            raise serializers.ValidationError(
+                "Необходимо указать либо token, либо subject."
+            )
         return data
 
 
+class IntrospectionSerializer(serializers.Serializer):
+    """
+    Сериализатор пакетной проверки токенов и разрешений.
+    """
+
+    items = IntrospectionItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.INTROSPECTION["MAX_ITEMS"],
+    )
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """
     Сериализатор для профиля пользователя.
@@ -106,7 +205,68 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ("email",)
 
 
-class PermissionSerializer(serializers.ModelSerializer):
+def get_query_list(request, name):
+    """
+    Значение query-параметра со списком через запятую (?fields=id,name)
+    в виде множества или None, если параметр не передан.
+    """
+    if request is None:
+        return None
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+class FieldProjectionMixin:
+    """
+    Позволяет запросить только нужные поля (?fields=id,name) и раскрыть
+    вложенные объекты (?expand=permissions). Проекция применяется только
+    к корневому сериализатору GET-запроса.
+    """
+
+    def is_expanded(self, field_name):
+        expand = get_query_list(self.context.get("request"), "expand")
+        return expand is not None and field_name in expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        root = self.root
+        is_root = root is self or getattr(root, "child", None) is self
+        if request is None or request.method != "GET" or not is_root:
+            return fields
+
+        requested = get_query_list(request, "fields")
+        if requested:
+            for name in list(fields):
+                if name not in requested:
+                    fields.pop(name)
+        return fields
+
+
+class UserDirectorySerializer(serializers.ModelSerializer):
+    """Сериализатор для справочника пользователей."""
+
+    roles = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
+
+    class Meta:
+        model = CustomUser
+        fields = (
+            "id",
+            "email",
+            "first_name",
+            "last_name",
+            "patronymic",
+            "is_active",
+            "is_deleted",
+            "date_joined",
+            "roles",
+        )
+        read_only_fields = fields
+
+
+class PermissionSerializer(FieldProjectionMixin, serializers.ModelSerializer):
     """Сериализатор для модели Разрешений."""
 
     class Meta:
@@ -114,31 +274,120 @@ class PermissionSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class RoleSerializer(serializers.ModelSerializer):
-    """Сериализатор для модели Ролей."""
+class RoleSerializer(FieldProjectionMixin, serializers.ModelSerializer):
+    """
+    Сериализатор для модели Ролей.
+    По умолчанию permissions — список id, с ?expand=permissions — объекты.
+    parents — прямые родители роли, ancestors — все роли, от которых она
+    наследует разрешения.
+    """
 
-    permissions = PermissionSerializer(many=True, read_only=True)
+    permissions = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    parents = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    ancestors = serializers.SerializerMethodField()
 
     permission_ids = serializers.ListField(
         child=serializers.IntegerField(), write_only=True, required=False
     )
+    parent_ids = serializers.ListField(
+        child=serializers.IntegerField(), write_only=True, required=False
+    )
 
     class Meta:
         model = Role
-        fields = ["id", "name", "description", "permissions", "permission_ids"]
+        fields = [
+            "id",
+            "name",
+            "description",
+            "permissions",
+            "permission_ids",
+            "parents",
+            "parent_ids",
+            "ancestors",
+        ]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if "permissions" in fields and self.is_expanded("permissions"):
+            fields["permissions"] = PermissionSerializer(many=True, read_only=True)
+        return fields
+
+    def get_ancestors(self, obj):
+        # Замыкание содержит и пару роли с самой собой
+        return [role.pk for role in obj.ancestors.all() if role.pk != obj.pk]
+
+    def validate_parent_ids(self, value):
+        if self.instance is not None:
+            try:
+                hierarchy.check_no_cycles([self.instance.pk], value)
+            except DjangoValidationError as e:
+                raise serializers.ValidationError(e.messages)
+        return value
 
     def create(self, validated_data):
         permission_ids = validated_data.pop("permission_ids", [])
+        parent_ids = validated_data.pop("parent_ids", [])
         role = Role.objects.create(**validated_data)
         if permission_ids:
             permissions = Permission.objects.filter(id__in=permission_ids)
             role.permissions.set(permissions)
+        if parent_ids:
+            role.parents.set(Role.objects.filter(id__in=parent_ids))
         return role
 
     def update(self, instance, validated_data):
         permission_ids = validated_data.pop("permission_ids", None)
+        parent_ids = validated_data.pop("parent_ids", None)
         instance = super().update(instance, validated_data)
         if permission_ids is not None:
             permissions = Permission.objects.filter(id__in=permission_ids)
             instance.permissions.set(permissions)
+        if parent_ids is not None:
+            instance.parents.set(Role.objects.filter(id__in=parent_ids))
         return instance
+
+
+class BulkUserFilterSerializer(serializers.Serializer):
+    """Фильтр пользователей для массовых операций с ролями."""
+
+    email_domain = serializers.CharField(required=False, label="Домен email")
+    role_id = serializers.IntegerField(required=False, label="Текущая роль")
+    is_active = serializers.BooleanField(required=False, label="Активен")
+
+
+class BulkRoleAssignmentSerializer(serializers.Serializer):
+    """
+    Сериализатор для массового назначения и снятия ролей.
+    Пользователи задаются либо списком user_ids, либо фильтром user_filter.
+    """
+
+    role_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False
+    )
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    user_filter = BulkUserFilterSerializer(required=False)
+
+    def validate(self, data):
+        if ("user_ids" in data) == ("user_filter" in data):
+            raise serializers.ValidationError(
+                "Необходимо указать либо user_ids, либо user_filter."
+            )
+        return data
+
+    def get_users_queryset(self):
+        """
+        Пользователи, выбранные фильтром user_filter.
+        """
+        user_filter = self.validated_data["user_filter"]
+        queryset = CustomUser.objects.all()
+        if "email_domain" in user_filter:
+            queryset = queryset.filter(
+                email__iendswith="@" + user_filter["email_domain"]
+            )
+        if "role_id" in user_filter:
+            queryset = queryset.filter(roles=user_filter["role_id"])
+        if "is_active" in user_filter:
+            queryset = queryset.filter(is_active=user_filter["is_active"])
+        return queryset
@@ -0,0 +1,197 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from . import effective, hierarchy
+from .cache import bump_rbac_version
+from .models import (
+    ACCESS_FLAGS,
+    CustomUser,
+    Permission,
+    Role,
+    UserEffectivePermission,
+)
+from .revocation import revoke_user_tokens
+from .rotation import revoke_user_families
+from .user_cache import invalidate_user
+
+RBAC_M2M_ACTIONS = ("post_add", "post_remove", "post_clear")
+
+
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+@receiver(m2m_changed, sender=Role.permissions.through)
+@receiver(m2m_changed, sender=Role.parents.through)
+def invalidate_on_m2m_change(sender, action, **kwargs):
+    """
+    Сбрасывает кэш разрешений при изменении ролей пользователя,
+    разрешений роли или ее родителей.
+    """
+    if action in RBAC_M2M_ACTIONS:
+        transaction.on_commit(bump_rbac_version)
+
+
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+def update_effective_on_user_roles_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Поддерживает UserEffectivePermission при изменении CustomUser.roles.
+    """
+    if not reverse:
+        # user.roles.add/remove/clear(...)
+        if action == "post_add":
+            effective.users_roles_added([instance.pk])
+        elif action in ("post_remove", "post_clear"):
+            effective.users_roles_removed([instance.pk])
+        return
+
+    # role.users.add/remove/clear(...)
+    if action == "post_add":
+        effective.users_roles_added(pk_set)
+    elif action == "post_remove":
+        effective.users_roles_removed(pk_set)
+    elif action == "pre_clear":
+        effective.role_detached(instance.pk)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def update_effective_on_role_permissions_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Поддерживает UserEffectivePermission при изменении Role.permissions.
+    Затрагивает сразу всех пользователей роли одним запросом.
+    """
+    if not reverse:
+        # role.permissions.add/remove/clear(...)
+        if action == "post_add":
+            effective.role_permissions_added([instance.pk], pk_set)
+        elif action == "post_remove":
+            effective.role_permissions_removed([instance.pk], pk_set)
+        elif action == "post_clear":
+            # Разрешения, унаследованные через роль, остаются
+            effective.role_permissions_removed([instance.pk])
+        return
+
+    # permission.roles.add/remove/clear(...)
+    if action == "post_add":
+        effective.role_permissions_added(pk_set, [instance.pk])
+    elif action == "post_remove":
+        effective.role_permissions_removed(pk_set, [instance.pk])
+    elif action == "pre_clear":
+        UserEffectivePermission.objects.filter(permission=instance).delete()
+
+
+@receiver(m2m_changed, sender=Role.parents.through)
+def update_hierarchy_on_parents_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Поддерживает RoleClosure и UserEffectivePermission при изменении
+    Role.parents. Ребро, образующее цикл, отклоняется до записи.
+    """
+    if action == "pre_clear" and reverse:
+        # После очистки со стороны родителя список детей уже не получить
+        instance._cleared_child_ids = list(
+            instance.children.values_list("pk", flat=True)
+        )
+        return
+
+    if not reverse:
+        # role.parents.add/remove/clear(...)
+        child_ids, parent_ids = [instance.pk], pk_set
+    elif action == "post_clear":
+        child_ids = instance.__dict__.pop("_cleared_child_ids", [])
+    else:
+        # parent.children.add/remove(...)
+        child_ids, parent_ids = pk_set, [instance.pk]
+
+    if action == "pre_add":
+        hierarchy.lock_for_edges(child_ids, parent_ids)
+        hierarchy.check_no_cycles(child_ids, parent_ids)
+    elif action == "post_add":
+        hierarchy.edges_added(child_ids, parent_ids)
+        effective.roles_inherited(child_ids)
+    elif action in ("post_remove", "post_clear") and child_ids:
+        hierarchy.edges_removed(child_ids)
+        effective.roles_disinherited(child_ids)
+
+
+@receiver(post_save, sender=Role)
+def add_role_self_link(sender, instance, created, **kwargs):
+    """
+    Новая роль — сама себе предок в RoleClosure.
+    """
+    if created:
+        hierarchy.add_self_links([instance.pk])
+
+
+@receiver(pre_delete, sender=Role)
+def detach_deleted_role(sender, instance, **kwargs):
+    """
+    Каскадное удаление связей роли не вызывает m2m_changed, поэтому
+    наследование и эффективные разрешения пересчитываются до удаления.
+    """
+    descendants = hierarchy.role_deleted(instance.pk)
+    effective.role_detached(instance.pk)
+    if descendants:
+        effective.roles_disinherited(descendants)
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_delete, sender=Role)
+def invalidate_on_rbac_change(sender, **kwargs):
+    """
+    Сбрасывает кэш разрешений при изменении или удалении разрешения
+    и при удалении роли.
+    """
+    transaction.on_commit(bump_rbac_version)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_on_access_flags_change(sender, instance, created, **kwargs):
+    """
+    is_active, is_staff и is_superuser попадают в клеймы stateless-токенов:
+    их изменение делает клеймы всех токенов недоверенными (версия RBAC),
+    а уже выданные токены пользователя отзываются вместе с цепочками.
+    QuerySet.update() сигналы не вызывает.
+    """
+    if created or not instance.access_flags_changed():
+        return
+    instance._loaded_access_flags = {
+        name: getattr(instance, name) for name in ACCESS_FLAGS
+    }
+    revoke_user_families(instance.pk)
+    transaction.on_commit(bump_rbac_version)
+    transaction.on_commit(lambda: revoke_user_tokens(instance.pk))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Сбрасывает пользователя в кэше аутентификации при любом изменении
+    (профиль, мягкое удаление, админка).
+    """
+    if kwargs.get("created"):
+        return
+    # Метка ставится сразу и после коммита: до коммита загрузка из БД
+    # еще видит старую строку
+    invalidate_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+
+@receiver(post_migrate)
+def invalidate_after_migrate(sender, **kwargs):
+    """
+    Миграции данных меняют RBAC в обход сигналов моделей.
+    """
+    if sender.name == "apps.users":
+        bump_rbac_version()
@@ -0,0 +1,23 @@
+"""
+Общие помощники для set-based SQL (apps.users.effective, apps.users.hierarchy).
+"""
+
+from django.db import connection
+
+
+def in_clause(column, values):
+    """
+    Условие «column IN (...)» и его параметры; для пустого набора — ложное
+    условие.
+    """
+    values = list(values)
+    if not values:
+        return "1 = 0", []
+    return f"{column} IN ({', '.join(['%s'] * len(values))})", values
+
+
+def execute(sql, params):
+    """Выполняет запрос и возвращает число затронутых строк."""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
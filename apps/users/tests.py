@@ -1 +1,794 @@
-# Create your tests here.
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import jwt
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import hashers as django_hashers
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenBackendError,
+)
+
+from apps.documents.models import Document
+from apps.documents.views import UserDocumentListView
+
+from . import (
+    benchmark,
+    bitmap,
+    effective,
+    hashing,
+    hierarchy,
+    importers,
+    revocation,
+    token_cache,
+    user_cache,
+)
+from . import cache as rbac_cache
+from .authentication import CachedUserJWTAuthentication, RBACTokenUser
+from .hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, _cost_key
+from .introspection import aintrospect
+from .keyring import KeyRing, KeyRingTokenBackend
+from .management.commands.benchmark import DEFAULT_THRESHOLDS
+from .models import CustomUser, Permission, RefreshTokenFamily, Role
+from .permissions import HasPermission, mask_allows
+from .response_cache import bump_data_version, cache_response
+from .rotation import TokenReused, arotate, issue_token_pair
+from .throttling import LoginThrottle
+from .tokens import RBACRefreshToken
+from .views import UserProfileView
+
+
+class RBACStateMixin:
+    """
+    Сбрасывает общий кэш и состояние процесса (версию RBAC, LRU масок,
+    кэш проверенных токенов, фильтр отзывов) перед каждым тестом.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        rbac_cache._version_state.value = None
+        rbac_cache._version_state.checked_at = 0.0
+        rbac_cache._local_permissions.clear()
+        bitmap._bit_indexes.update(version=None, bits={})
+        token_cache.clear()
+        revocation._state = revocation._SyncState()
+
+
+class ReportView(APIView):
+    required_permissions = ["view_financial_reports"]
+
+
+def _request_as(user):
+    request = APIRequestFactory().get("/")
+    request.user = user
+    return request
+
+
+class StatelessClaimsTests(RBACStateMixin, TestCase):
+    def test_demoted_superuser_claims_are_not_trusted(self):
+        user = CustomUser.objects.create_superuser(email="root@example.com")
+        access = RBACRefreshToken.for_user(user).access_token
+        self.assertTrue(RBACTokenUser(access).is_superuser)
+
+        user = CustomUser.objects.get(pk=user.pk)
+        user.is_superuser = False
+        user.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        token_user = RBACTokenUser(access)
+        self.assertFalse(token_user.is_superuser)
+        self.assertFalse(token_user.is_staff)
+        self.assertIsNone(token_user.token_permission_mask)
+        self.assertFalse(
+            HasPermission().has_permission(_request_as(token_user), ReportView())
+        )
+
+    def test_fresh_claims_are_used_without_loading_user(self):
+        user = CustomUser.objects.create_superuser(email="root@example.com")
+        access = RBACRefreshToken.for_user(user).access_token
+        token_user = RBACTokenUser(access)
+        with self.assertNumQueries(0):
+            self.assertTrue(token_user.is_superuser)
+        self.assertNotIn("stored_user", token_user.__dict__)
+
+    def test_unrelated_profile_change_keeps_rbac_version(self):
+        user = CustomUser.objects.create_user(email="member@example.com")
+        version = rbac_cache.get_rbac_version()
+        user = CustomUser.objects.get(pk=user.pk)
+        user.first_name = "Имя"
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(rbac_cache.get_rbac_version(), version)
+
+    def test_token_user_lists_visible_documents(self):
+        user = CustomUser.objects.create_user(email="member@example.com")
+        user.roles.add(Role.objects.get(name="Пользователь"))
+        Document.objects.create(owner=user, title="Свой")
+        token_user = RBACTokenUser(RBACRefreshToken.for_user(user).access_token)
+
+        request = APIRequestFactory().get("/api/docs/my/")
+        force_authenticate(request, user=token_user)
+        response = async_to_sync(UserDocumentListView.as_view())(request)
+
+        self.assertEqual(response.status_code, 200)
+        expected = list(
+            Document.objects.visible_to(user)
+            .order_by("-pk")
+            .values_list("pk", flat=True)
+        )
+        ids = [item["id"] for item in json.loads(response.content)["results"]]
+        self.assertEqual(ids, expected)
+
+
+@override_settings(RBAC_STATELESS_TOKENS=True)
+class RotationClaimsTests(RBACStateMixin, TestCase):
+    def test_rotation_rederives_user_claims(self):
+        user = CustomUser.objects.create_user(email="member@example.com")
+        refresh = issue_token_pair(user)
+        # Клеймы, выданные до понижения в обход сигналов (QuerySet.update)
+        refresh["is_superuser"] = True
+        refresh["is_staff"] = True
+        refresh["email"] = "old@example.com"
+
+        rotated = async_to_sync(arotate)(str(refresh))
+
+        self.assertFalse(rotated["is_superuser"])
+        self.assertFalse(rotated["is_staff"])
+        self.assertEqual(rotated["email"], "member@example.com")
+
+    def test_access_flags_change_revokes_tokens(self):
+        user = CustomUser.objects.create_superuser(email="root@example.com")
+        refresh = issue_token_pair(user)
+
+        user = CustomUser.objects.get(pk=user.pk)
+        user.is_superuser = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        self.assertTrue(revocation.is_revoked(refresh.access_token))
+        self.assertFalse(
+            RefreshTokenFamily.objects.filter(user=user, revoked=False).exists()
+        )
+        with self.assertRaises(InvalidToken):
+            async_to_sync(arotate)(str(refresh))
+
+
+class RefreshRotationTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(email="member@example.com")
+
+    def _rotate(self, refresh):
+        return async_to_sync(arotate)(str(refresh))
+
+    def test_rotation_replaces_refresh_token(self):
+        refresh = issue_token_pair(self.user)
+        rotated = self._rotate(refresh)
+
+        self.assertNotEqual(rotated["jti"], refresh["jti"])
+        self.assertEqual(rotated["fam"], refresh["fam"])
+        family = RefreshTokenFamily.objects.get(pk=refresh["fam"])
+        self.assertEqual(family.current_jti.hex, rotated["jti"])
+
+    def test_reuse_revokes_whole_family(self):
+        refresh = issue_token_pair(self.user)
+        rotated = self._rotate(refresh)
+
+        with self.assertRaises(TokenReused):
+            self._rotate(refresh)
+
+        self.assertTrue(RefreshTokenFamily.objects.get(pk=refresh["fam"]).revoked)
+        self.assertTrue(revocation.is_revoked(rotated.access_token))
+        with self.assertRaises(InvalidToken):
+            self._rotate(rotated)
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_refresh_endpoint_rotates_token(self):
+        refresh = issue_token_pair(self.user)
+        data = {"refresh": str(refresh)}
+        response = self.client.post(reverse("auth-refresh"), data)
+        reused = self.client.post(reverse("auth-refresh"), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+        self.assertEqual(reused.status_code, 401)
+        self.assertEqual(reused.json()["code"], "token_reused")
+
+
+class VerifiedTokenCacheTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(email="member@example.com")
+        self.access = RBACRefreshToken.for_user(self.user).access_token
+        self.authentication = CachedUserJWTAuthentication()
+
+    def test_repeated_token_skips_signature_check(self):
+        raw = str(self.access)
+        with mock.patch.object(
+            CachedUserJWTAuthentication,
+            "verify_token",
+            autospec=True,
+            side_effect=CachedUserJWTAuthentication.verify_token,
+        ) as verify:
+            self.authentication.get_validated_token(raw)
+            token = self.authentication.get_validated_token(raw)
+        self.assertEqual(verify.call_count, 1)
+        self.assertEqual(token["jti"], self.access["jti"])
+
+    def test_revocation_reaches_cached_token(self):
+        raw = str(self.access)
+        self.authentication.get_validated_token(raw)
+        revocation.revoke_token(self.access)
+
+        with self.assertRaises(InvalidToken):
+            self.authentication.get_validated_token(raw)
+        self.assertIsNone(token_cache.get_verified(raw))
+
+    def test_expired_entry_is_dropped(self):
+        raw = str(self.access)
+        self.access["exp"] = 0
+        token_cache.set_verified(raw, self.access)
+        self.assertIsNone(token_cache.get_verified(raw))
+
+
+class RevocationTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(email="member@example.com")
+
+    def test_user_revocation_covers_earlier_tokens_only(self):
+        access = RBACRefreshToken.for_user(self.user).access_token
+        revocation.revoke_user_tokens(self.user.pk, before=access["iat"] - 10)
+        self.assertFalse(revocation.is_revoked(access))
+
+        revocation.revoke_user_tokens(self.user.pk)
+        self.assertTrue(revocation.is_revoked(access))
+
+    def test_account_deletion_revokes_tokens(self):
+        access = RBACRefreshToken.for_user(self.user).access_token
+        request = APIRequestFactory().delete("/api/users/me/")
+        force_authenticate(request, user=CustomUser.objects.get(pk=self.user.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = async_to_sync(UserProfileView.as_view())(request)
+
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(revocation.is_revoked(access))
+
+    def test_revocation_is_batched_for_many_tokens(self):
+        tokens = [RBACRefreshToken.for_user(self.user).access_token for _ in range(3)]
+        revocation.revoke_token(tokens[1])
+        revoked = async_to_sync(revocation.ais_revoked_many)(tokens)
+        self.assertEqual(revoked, [False, True, False])
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = revocation.BloomFilter(capacity=1000, error_rate=0.01)
+        members = [f"jti:{i}" for i in range(1000)]
+        for member in members:
+            bloom.add(member)
+        self.assertTrue(all(member in bloom for member in members))
+        false_positives = sum(f"other:{i}" in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+
+class PermissionBitmapTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.read = Permission.objects.create(name="read_ledger")
+        self.write = Permission.objects.create(name="write_ledger")
+        self.role = Role.objects.create(name="Бухгалтер")
+        self.user = CustomUser.objects.create_user(email="member@example.com")
+        self.user.roles.add(self.role)
+
+    def test_hex_round_trip_beyond_64_bits(self):
+        mask = bitmap.mask_for_indexes([0, 63, 64, 200])
+        self.assertEqual(bitmap.mask_from_hex(bitmap.mask_to_hex(mask)), mask)
+        self.assertEqual(bitmap.mask_from_hex(""), 0)
+
+    def test_user_mask_is_checked_with_single_and(self):
+        self.role.permissions.add(self.read)
+        user_mask = rbac_cache.get_user_permission_mask(self.user)
+
+        self.assertTrue(
+            mask_allows(user_mask, bitmap.mask_for_names(["read_ledger", "missing"]))
+        )
+        self.assertFalse(
+            mask_allows(user_mask, bitmap.mask_for_names(["write_ledger"]))
+        )
+
+
+class PermissionBitIndexTests(TestCase):
+    def test_taken_bit_is_reallocated(self):
+        taken = Permission.next_bit_index()
+        Permission.objects.create(name="first_permission")
+
+        # Первый вызов видит состояние до параллельной вставки
+        with mock.patch.object(
+            Permission, "next_bit_index", side_effect=[taken, taken + 1]
+        ) as next_bit_index:
+            second = Permission.objects.create(name="second_permission")
+
+        self.assertEqual(second.bit_index, taken + 1)
+        self.assertEqual(next_bit_index.call_count, 2)
+
+    def test_duplicate_name_is_not_retried(self):
+        Permission.objects.create(name="first_permission")
+        with self.assertRaises(IntegrityError):
+            Permission.objects.create(name="first_permission")
+
+
+def _login_request(forwarded_for, email="member@example.com"):
+    request = APIRequestFactory().post(
+        "/",
+        {"email": email},
+        format="json",
+        REMOTE_ADDR="10.0.0.1",
+        HTTP_X_FORWARDED_FOR=forwarded_for,
+    )
+    return Request(request, parsers=[JSONParser()])
+
+
+class LoginThrottleTests(RBACStateMixin, TestCase):
+    def test_spoofed_forwarded_for_is_ignored(self):
+        idents = LoginThrottle().get_idents(_login_request("203.0.113.7"))
+        self.assertEqual(idents, [("ip", "10.0.0.1"), ("email", "member@example.com")])
+
+    @override_settings(REST_FRAMEWORK={"NUM_PROXIES": 1})
+    def test_forwarded_for_is_used_behind_trusted_proxy(self):
+        request = _login_request("203.0.113.7, 198.51.100.2")
+        idents = LoginThrottle().get_idents(request)
+        self.assertEqual(
+            idents, [("ip", "198.51.100.2"), ("email", "member@example.com")]
+        )
+
+    def test_rotating_forwarded_for_does_not_bypass_ip_limit(self):
+        config = {**settings.LOGIN_THROTTLE, "IP_LIMIT": 2}
+        with override_settings(LOGIN_THROTTLE=config):
+            allowed = [
+                LoginThrottle().allow_request(
+                    _login_request(f"203.0.113.{i}", f"user{i}@example.com"), None
+                )
+                for i in range(3)
+            ]
+        self.assertEqual(allowed, [True, True, False])
+
+
+class PasswordHasherCalibrationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_pbkdf2_calibration_keeps_django_iterations_floor(self):
+        hasher = PBKDF2PasswordHasher()
+        with mock.patch.object(PBKDF2PasswordHasher, "measure", return_value=1.0):
+            cost = hasher.resolve_cost(target_ms=1)
+        self.assertEqual(cost, django_hashers.PBKDF2PasswordHasher.iterations)
+
+    def test_argon2_calibration_keeps_django_memory_floor(self):
+        hasher = Argon2PasswordHasher()
+        with mock.patch.object(Argon2PasswordHasher, "measure", return_value=1.0):
+            cost = hasher.resolve_cost(target_ms=1)
+        self.assertEqual(cost, django_hashers.Argon2PasswordHasher.memory_cost)
+
+    def test_cached_cost_below_floor_is_raised(self):
+        cache.set(_cost_key("pbkdf2_sha256", 50), 100_000, None)
+        cost = PBKDF2PasswordHasher().resolve_cost(target_ms=50)
+        self.assertEqual(cost, django_hashers.PBKDF2PasswordHasher.iterations)
+
+
+@override_settings(
+    ALLOWED_HOSTS=["testserver"],
+    METRICS={"TOKEN": "scrape-secret", "ALLOWED_IPS": ["10.0.0.9"]},
+)
+class MetricsAccessTests(TestCase):
+    def test_anonymous_scrape_is_forbidden(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+    def test_wrong_token_is_forbidden(self):
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+
+    def test_scrape_with_token(self):
+        response = self.client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"auth_", response.content)
+
+    def test_scrape_from_allowed_ip(self):
+        response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.9")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS={"TOKEN": "", "ALLOWED_IPS": []})
+    def test_empty_token_does_not_match(self):
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class UserImporterTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.role = Role.objects.create(name="Импорт")
+
+    def test_email_taken_concurrently_is_skipped(self):
+        taken = CustomUser.objects.create_user(email="taken@example.com")
+        records = [
+            {"email": "taken@example.com", "password": "x", "roles": ["Импорт"]},
+            {"email": "new@example.com", "password": "x", "roles": ["Импорт"]},
+        ]
+        existing_emails = importers._existing_emails
+        stale = [set()]
+
+        def racing_existing_emails(emails):
+            # Первая проверка не видит аккаунт, созданный параллельно
+            return stale.pop() if stale else existing_emails(emails)
+
+        with mock.patch.object(
+            importers, "_existing_emails", side_effect=racing_existing_emails
+        ) as check:
+            result = importers.UserImporter().run(records)
+
+        self.assertEqual(check.call_count, 2)
+
+        self.assertEqual((result.created, result.skipped), (1, 1))
+        self.assertEqual(result.roles_assigned, 1)
+        self.assertFalse(taken.roles.exists())
+        new = CustomUser.objects.get(email="new@example.com")
+        self.assertEqual(list(new.roles.all()), [self.role])
+
+    def test_api_import_uses_shared_hashing_pool(self):
+        records = [{"email": "new@example.com", "password": "secret-password"}]
+        with (
+            mock.patch.object(importers, "ProcessPoolExecutor") as process_pool,
+            mock.patch.object(
+                hashing.executor, "run", wraps=hashing.executor.run
+            ) as run,
+        ):
+            result = importers.UserImporter().run(records)
+
+        self.assertEqual(result.created, 1)
+        process_pool.assert_not_called()
+        run.assert_called_once()
+        user = CustomUser.objects.get(email="new@example.com")
+        self.assertTrue(user.check_password("secret-password"))
+
+
+class RoleHierarchyTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.permission = Permission.objects.create(name="inherited_permission")
+        self.grandparent = Role.objects.create(name="Предок")
+        self.grandparent.permissions.add(self.permission)
+        self.parent = Role.objects.create(name="Родитель")
+        self.child = Role.objects.create(name="Потомок")
+        self.user = CustomUser.objects.create_user(email="member@example.com")
+        self.user.roles.add(self.child)
+
+    def _user_permissions(self):
+        return set(
+            self.user.effective_permissions.values_list("permission__name", flat=True)
+        )
+
+    def _assert_consistent(self):
+        self.assertEqual(hierarchy.check_consistency(), (0, 0))
+        self.assertEqual(effective.check_consistency(), (0, 0))
+
+    def test_permissions_are_inherited_through_closure(self):
+        self.child.parents.add(self.parent)
+        self.parent.parents.add(self.grandparent)
+
+        self.assertIn(self.grandparent, self.child.ancestors.all())
+        self.assertIn("inherited_permission", self._user_permissions())
+        self._assert_consistent()
+
+        self.parent.parents.remove(self.grandparent)
+
+        self.assertNotIn(self.grandparent, self.child.ancestors.all())
+        self.assertNotIn("inherited_permission", self._user_permissions())
+        self._assert_consistent()
+
+    def test_deleting_middle_role_relinks_descendants(self):
+        self.child.parents.add(self.parent)
+        self.parent.parents.add(self.grandparent)
+
+        self.parent.delete()
+
+        self.assertNotIn("inherited_permission", self._user_permissions())
+        self._assert_consistent()
+
+    def test_cycle_is_rejected(self):
+        self.child.parents.add(self.parent)
+        self.parent.parents.add(self.grandparent)
+
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.grandparent.parents.add(self.child)
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.child.parents.add(self.child)
+        self._assert_consistent()
+
+    def test_lock_covers_children_and_parent_ancestors(self):
+        self.child.parents.add(self.parent)
+        self.parent.parents.add(self.grandparent)
+        other = Role.objects.create(name="Другая")
+
+        locked = hierarchy.lock_for_edges([other.pk], [self.child.pk])
+
+        expected = [other, self.grandparent, self.parent, self.child]
+        self.assertEqual(locked, sorted(role.pk for role in expected))
+
+
+class UserCacheTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(email="member@example.com")
+
+    def test_second_lookup_is_served_from_cache(self):
+        user_cache.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            cached = user_cache.get_user(self.user.pk)
+        self.assertEqual(cached.email, "member@example.com")
+        self.assertTrue(cached.is_active)
+
+    def test_save_invalidates_cached_user(self):
+        user_cache.get_user(self.user.pk)
+        self.user.is_deleted = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertTrue(user_cache.get_user(self.user.pk).is_deleted)
+
+    def test_authentication_rejects_deleted_user(self):
+        access = RBACRefreshToken.for_user(self.user).access_token
+        self.user.is_deleted = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            CachedUserJWTAuthentication().get_user(access)
+
+    def test_batch_misses_are_loaded_in_one_query(self):
+        other = CustomUser.objects.create_user(email="other@example.com")
+        cache.clear()
+        with self.assertNumQueries(1):
+            users = async_to_sync(user_cache.aget_users)([self.user.pk, other.pk, 0])
+        self.assertEqual(set(users), {self.user.pk, other.pk})
+
+
+class CountingReportView(APIView):
+    required_permissions = ["view_financial_reports"]
+    calls = 0
+
+    @cache_response("test-reports")
+    def get(self, request):
+        CountingReportView.calls += 1
+        return Response({"calls": CountingReportView.calls})
+
+
+class ResponseCacheTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        CountingReportView.calls = 0
+        self.user = CustomUser.objects.create_user(email="member@example.com")
+
+    def _get(self, user, **headers):
+        request = APIRequestFactory().get("/reports/", **headers)
+        force_authenticate(request, user=user)
+        return CountingReportView.as_view()(request)
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = self._get(self.user)
+        second = self._get(self.user)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(CountingReportView.calls, 1)
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertIn("private", second["Cache-Control"])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self._get(self.user)["ETag"]
+        response = self._get(self.user, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_data_version_bump_invalidates_entry(self):
+        self._get(self.user)
+        bump_data_version("test-reports")
+        self.assertEqual(self._get(self.user).data, {"calls": 2})
+
+    def test_entries_are_shared_only_by_equal_permissions(self):
+        other = CustomUser.objects.create_user(email="other@example.com")
+        root = CustomUser.objects.create_superuser(email="root@example.com")
+        self._get(self.user)
+        self._get(other)
+        self.assertEqual(CountingReportView.calls, 1)
+        self._get(root)
+        self.assertEqual(CountingReportView.calls, 2)
+
+
+class KeyRingTests(TestCase):
+    def setUp(self):
+        keys_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(keys_dir.cleanup)
+        self.keys_dir = keys_dir.name
+
+    def _signing_keys(self, **options):
+        signing = {"KEYS_DIR": self.keys_dir, "ACTIVE_KID": "", "JWKS_MAX_AGE": 60}
+        with override_settings(JWT_SIGNING=signing):
+            call_command("signing_keys", stdout=StringIO(), **options)
+
+    def _backend(self, active_kid=""):
+        return KeyRingTokenBackend(KeyRing.from_dir(self.keys_dir, active_kid))
+
+    def test_tokens_outlive_key_rotation(self):
+        self._signing_keys(generate=True, kid="old")
+        token = self._backend().encode({"user_id": 1})
+        self.assertEqual(jwt.get_unverified_header(token)["kid"], "old")
+
+        self._signing_keys(generate=True, kid="new", algorithm="RS256")
+        self._signing_keys(retire="old")
+        backend = self._backend("new")
+
+        self.assertEqual(backend.decode(token)["user_id"], 1)
+        new_token = backend.encode({"user_id": 2})
+        header = jwt.get_unverified_header(new_token)
+        self.assertEqual((header["kid"], header["alg"]), ("new", "RS256"))
+
+    def test_unknown_kid_is_rejected(self):
+        self._signing_keys(generate=True, kid="current")
+        forged = jwt.encode({"user_id": 1}, "secret", headers={"kid": "missing"})
+        with self.assertRaises(TokenBackendError):
+            self._backend().decode(forged)
+
+    def test_algorithm_comes_from_key_not_header(self):
+        self._signing_keys(generate=True, kid="current")
+        forged = jwt.encode(
+            {"user_id": 1}, "secret", algorithm="HS256", headers={"kid": "current"}
+        )
+        with self.assertRaises(TokenBackendError):
+            self._backend().decode(forged)
+
+    def test_jwks_publishes_public_parts_only(self):
+        self._signing_keys(generate=True, kid="ed", algorithm="EdDSA")
+        self._signing_keys(generate=True, kid="rsa", algorithm="RS256")
+        keys = KeyRing.from_dir(self.keys_dir, "ed").jwks()["keys"]
+
+        self.assertEqual({key["kid"] for key in keys}, {"ed", "rsa"})
+        for key in keys:
+            self.assertNotIn("d", key)
+            self.assertEqual(key["use"], "sig")
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_jwks_endpoint_supports_conditional_requests(self):
+        response = self.client.get(reverse("jwks"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age", response["Cache-Control"])
+
+        cached = self.client.get(reverse("jwks"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+
+class IntrospectionTests(RBACStateMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        permission = Permission.objects.create(name="read_ledger")
+        role = Role.objects.create(name="Бухгалтер")
+        role.permissions.add(permission)
+        self.reader = CustomUser.objects.create_user(email="reader@example.com")
+        self.reader.roles.add(role)
+        self.member = CustomUser.objects.create_user(email="member@example.com")
+
+    def _access(self, user):
+        return str(RBACRefreshToken.for_user(user).access_token)
+
+    def _introspect(self, items):
+        return async_to_sync(aintrospect)(items)
+
+    def test_decisions_keep_item_order(self):
+        root = CustomUser.objects.create_superuser(email="root@example.com")
+        inactive = CustomUser.objects.create_user(
+            email="inactive@example.com", is_active=False
+        )
+        results = self._introspect(
+            [
+                {"token": self._access(self.reader), "permissions": ["read_ledger"]},
+                {"token": self._access(self.member), "permissions": ["read_ledger"]},
+                {"subject": root.pk, "permissions": ["read_ledger"]},
+                {"token": "not-a-token", "permissions": []},
+                {"subject": inactive.pk, "permissions": []},
+                {"subject": 0, "permissions": []},
+            ]
+        )
+
+        self.assertEqual(
+            [result.get("allowed", result.get("error")) for result in results],
+            [
+                True,
+                False,
+                True,
+                "token_invalid",
+                "user_inactive",
+                "user_not_found",
+            ],
+        )
+        self.assertTrue(all(result["ttl"] > 0 for result in results))
+
+    def test_revoked_token_is_inactive(self):
+        access = RBACRefreshToken.for_user(self.reader).access_token
+        revocation.revoke_token(access)
+        [result] = self._introspect([{"token": str(access), "permissions": []}])
+        self.assertEqual(result["error"], "token_revoked")
+
+    def test_queries_do_not_grow_with_batch(self):
+        def count_queries(users):
+            cache.clear()
+            rbac_cache._local_permissions.clear()
+            items = [
+                {"token": self._access(user), "permissions": ["read_ledger"]}
+                for user in users
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self._introspect(items)
+            return len(queries)
+
+        users = [
+            CustomUser.objects.create_user(email=f"user{i}@example.com")
+            for i in range(6)
+        ]
+        # Первый пакет загружает номера битов разрешений процесса
+        count_queries(users[:1])
+        self.assertEqual(count_queries(users[:2]), count_queries(users))
+
+
+@override_settings(
+    ALLOWED_HOSTS=["testserver"],
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class QueryBudgetTests(RBACStateMixin, TransactionTestCase):
+    """
+    Сценарии бенчмарка на малом наборе данных: статусы ответов и число
+    SQL-запросов укладываются в пороги benchmark_thresholds.json. Без
+    внешней транзакции TestCase запросы считаются так же, как в бенчмарке.
+    """
+
+    serialized_rollback = True
+
+    def test_scenarios_stay_within_query_thresholds(self):
+        unlimited = 10**9
+        throttle = {
+            **settings.LOGIN_THROTTLE,
+            "IP_LIMIT": unlimited,
+            "EMAIL_LIMIT": unlimited,
+        }
+        thresholds = json.loads(DEFAULT_THRESHOLDS.read_text())
+        query_limits = {
+            name: {"queries_max": limits["queries_max"]}
+            for name, limits in thresholds.items()
+            if "queries_max" in limits
+        }
+
+        with override_settings(LOGIN_THROTTLE=throttle):
+            context = benchmark.seed(
+                20, 5, 10, roles_per_user=2, permissions_per_role=3
+            )
+            benchmark.seed_documents(context, 50, grants_per_user=5)
+            results = {
+                name: benchmark.run_scenario(self.client, context, name, 3, warmup=1)
+                for name in benchmark.SCENARIOS
+            }
+
+        errors = {name: r["statuses"] for name, r in results.items() if r["errors"]}
+        self.assertEqual(errors, {})
+        self.assertEqual(benchmark.check_thresholds(results, query_limits), [])
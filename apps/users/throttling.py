@@ -0,0 +1,225 @@
+"""
+Защита эндпоинта входа от перебора паролей и credential stuffing.
+
+Попытки входа ограничиваются скользящим окном по IP и по email, а после
+серии неудачных попыток ключ блокируется на экспоненциально растущее время.
+Все проверки выполняются до хэширования пароля, поэтому отклоненная попытка
+стоит несколько обращений к кэшу вместо полного расчета PBKDF2.
+
+Счетчики атомарны (cache.add + cache.incr). Если общий кэш недоступен,
+используется локальное хранилище процесса.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCounterStore:
+    """
+    Счетчики с TTL в памяти процесса (fallback при недоступном кэше).
+    """
+
+    def __init__(self, maxsize=100000):
+        self._data = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return default
+        return entry[0]
+
+    def set(self, key, value, timeout):
+        self._data.set(key, (value, time.monotonic() + timeout))
+
+    def incr(self, key, timeout):
+        with self._lock:
+            value = self.get(key, 0) + 1
+            entry = self._data.get(key)
+            expires = entry[1] if value > 1 else time.monotonic() + timeout
+            self._data.set(key, (value, expires))
+            return value
+
+    def delete(self, key):
+        self._data.pop(key)
+
+
+class CounterStore:
+    """
+    Атомарные счетчики в кэше Django с локальным fallback.
+    """
+
+    def __init__(self):
+        self.local = LocalCounterStore()
+
+    def incr(self, key, timeout):
+        try:
+            if cache.add(key, 1, timeout):
+                return 1
+            return cache.incr(key)
+        except ValueError:
+            # Ключ истек между add и incr
+            cache.set(key, 1, timeout)
+            return 1
+        except Exception:
+            logger.warning("Cache unavailable, using local counters", exc_info=True)
+            return self.local.incr(key, timeout)
+
+    def get(self, key, default=None):
+        try:
+            return cache.get(key, default)
+        except Exception:
+            logger.warning("Cache unavailable, using local counters", exc_info=True)
+            return self.local.get(key, default)
+
+    def get_many(self, keys):
+        try:
+            return cache.get_many(keys)
+        except Exception:
+            logger.warning("Cache unavailable, using local counters", exc_info=True)
+            values = {key: self.local.get(key) for key in keys}
+            return {key: value for key, value in values.items() if value is not None}
+
+    def set(self, key, value, timeout):
+        try:
+            cache.set(key, value, timeout)
+        except Exception:
+            logger.warning("Cache unavailable, using local counters", exc_info=True)
+            self.local.set(key, value, timeout)
+
+    def delete(self, key):
+        try:
+            cache.delete(key)
+        except Exception:
+            logger.warning("Cache unavailable, using local counters", exc_info=True)
+        self.local.delete(key)
+
+
+class LoginGuard:
+    """
+    Скользящее окно попыток и экспоненциальная блокировка после неудач.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or CounterStore()
+
+    @property
+    def config(self):
+        return settings.LOGIN_THROTTLE
+
+    def hit(self, scope, ident):
+        """
+        Регистрирует попытку и возвращает (оценка числа попыток в окне,
+        секунды до освобождения слота).
+
+        Окно приближается двумя соседними фиксированными окнами: счетчик
+        предыдущего окна берется с весом оставшейся доли текущего окна.
+        """
+        window = self.config["WINDOW"]
+        now = time.time()
+        bucket, elapsed = divmod(now, window)
+        current_key = f"login:rl:{scope}:{ident}:{int(bucket)}"
+        previous_key = f"login:rl:{scope}:{ident}:{int(bucket) - 1}"
+
+        current = self.store.incr(current_key, timeout=int(window * 2))
+        previous = self.store.get(previous_key, 0) or 0
+        estimate = previous * (1 - elapsed / window) + current
+        return estimate, window - elapsed
+
+    def lockout_remaining(self, idents):
+        """
+        Сколько секунд еще действует блокировка для любого из ключей.
+        """
+        keys = [f"login:lock:{scope}:{ident}" for scope, ident in idents]
+        now = time.time()
+        until = max(self.store.get_many(keys).values(), default=0)
+        return max(0.0, until - now)
+
+    def register_failure(self, idents):
+        """
+        Учитывает неудачную попытку и при превышении порога блокирует ключ
+        на LOCKOUT_BASE * 2^(n - порог) секунд, но не более LOCKOUT_MAX.
+        """
+        config = self.config
+        thresholds = {
+            "ip": config["IP_LOCKOUT_THRESHOLD"],
+            "email": config["LOCKOUT_THRESHOLD"],
+        }
+        for scope, ident in idents:
+            failures = self.store.incr(
+                f"login:fail:{scope}:{ident}", timeout=config["FAILURE_TTL"]
+            )
+            excess = failures - thresholds[scope]
+            if excess < 0:
+                continue
+            duration = min(config["LOCKOUT_BASE"] * 2**excess, config["LOCKOUT_MAX"])
+            self.store.set(
+                f"login:lock:{scope}:{ident}",
+                time.time() + duration,
+                timeout=int(duration) + 1,
+            )
+
+    def register_success(self, idents):
+        """
+        Сбрасывает счетчик неудач email. Счетчик IP не сбрасывается:
+        иначе перебор можно маскировать входом в собственный аккаунт.
+        """
+        for scope, ident in idents:
+            if scope == "email":
+                self.store.delete(f"login:fail:{scope}:{ident}")
+
+
+login_guard = LoginGuard()
+
+
+class LoginThrottle(BaseThrottle):
+    """
+    Троттлинг эндпоинта входа по IP и email. Срабатывает до валидации
+    сериализатора, то есть до проверки пароля.
+    """
+
+    def __init__(self):
+        self.wait_time = None
+
+    @staticmethod
+    def get_email(request):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if not isinstance(email, str):
+            return None
+        return email.strip().lower() or None
+
+    def get_idents(self, request):
+        idents = [("ip", self.get_ident(request))]
+        email = self.get_email(request)
+        if email:
+            idents.append(("email", email))
+        return idents
+
+    def allow_request(self, request, view):
+        config = settings.LOGIN_THROTTLE
+        idents = self.get_idents(request)
+
+        locked = login_guard.lockout_remaining(idents)
+        if locked:
+            self.wait_time = locked
+            return False
+
+        limits = {"ip": config["IP_LIMIT"], "email": config["EMAIL_LIMIT"]}
+        for scope, ident in idents:
+            estimate, reset_in = login_guard.hit(scope, ident)
+            if estimate > limits[scope]:
+                self.wait_time = reset_in
+                return False
+        return True
+
+    def wait(self):
+        return self.wait_time
@@ -0,0 +1,61 @@
+"""
+Кэш проверенных access-токенов внутри процесса.
+
+Клиент предъявляет один и тот же access-токен весь срок его жизни, а проверка
+(base64, подпись, JSON, клеймы) повторяется на каждом запросе. LRU процесса
+хранит уже провалидированный токен по хэшу его строки до момента exp,
+поэтому повторные запросы обходятся без криптографии и разбора JSON.
+
+Вместе с токеном запоминается номер состояния фильтра отзывов
+(revocation.revocation_epoch), при котором токен был признан неотозванным:
+пока номер тот же, повторная проверка отзыва не нужна.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+
+from .cache import LRUCache
+from .metrics import VERIFIED_TOKEN_CACHE_LOOKUPS
+
+_verified = LRUCache(settings.VERIFIED_TOKEN_CACHE["MAXSIZE"])
+
+
+def _key(raw_token):
+    if isinstance(raw_token, str):
+        raw_token = raw_token.encode()
+    return hashlib.blake2b(raw_token, digest_size=16).digest()
+
+
+def get_verified(raw_token):
+    """
+    (проверенный токен, номер состояния отзывов) или None.
+    """
+    if not _verified.maxsize:
+        return None
+    key = _key(raw_token)
+    entry = _verified.get(key)
+    if entry is not None and time.time() < entry[0]["exp"]:
+        VERIFIED_TOKEN_CACHE_LOOKUPS.labels("hit").inc()
+        return entry
+    if entry is not None:
+        _verified.pop(key)
+    VERIFIED_TOKEN_CACHE_LOOKUPS.labels("miss").inc()
+    return None
+
+
+def set_verified(raw_token, token, epoch=None):
+    """
+    Запоминает провалидированный токен; epoch=None — отзыв не проверялся.
+    """
+    if _verified.maxsize:
+        _verified.set(_key(raw_token), (token, epoch))
+
+
+def discard(raw_token):
+    _verified.pop(_key(raw_token))
+
+
+def clear():
+    _verified.clear()
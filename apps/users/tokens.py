@@ -0,0 +1,75 @@
+"""
+JWT-токены с встроенным набором разрешений пользователя.
+
+В stateless-режиме (settings.RBAC_STATELESS_TOKENS) access-токен несет
+маску разрешений пользователя (hex, см. apps.users.bitmap) и версию RBAC,
+на которой она была вычислена. Это позволяет авторизовать запрос без
+обращения к базе данных.
+"""
+
+from django.conf import settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .bitmap import mask_to_hex
+from .cache import (
+    aget_rbac_version,
+    aget_user_permission_mask,
+    get_rbac_version,
+    get_user_permission_mask,
+)
+from .metrics import TOKEN_ISSUE_DURATION, timed
+
+PERMISSIONS_CLAIM = "pmask"
+RBAC_VERSION_CLAIM = "rbac_v"
+# Цепочка refresh-токенов (см. apps.users.rotation), копируется в access-токен
+FAMILY_CLAIM = "fam"
+
+
+class RBACAccessToken(AccessToken):
+    """
+    Access-токен с клеймами разрешений.
+    Тип токена не меняется, поэтому он проверяется стандартным AccessToken.
+    """
+
+
+class RBACRefreshToken(RefreshToken):
+    """
+    Refresh-токен, при выпуске которого в клеймы добавляются
+    email, флаги пользователя, маска его разрешений и версия RBAC.
+    """
+
+    access_token_class = RBACAccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        _set_user_claims(token, user)
+        token[PERMISSIONS_CLAIM] = mask_to_hex(get_user_permission_mask(user))
+        token[RBAC_VERSION_CLAIM] = get_rbac_version()
+        return token
+
+
+def _set_user_claims(token, user):
+    token["email"] = user.email
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+
+
+async def aupdate_user_claims(token, user):
+    """
+    Пересчитывает клеймы пользователя (email, флаги, маску разрешений
+    и версию RBAC) по его текущему состоянию при ротации токена.
+    """
+    _set_user_claims(token, user)
+    token[PERMISSIONS_CLAIM] = mask_to_hex(await aget_user_permission_mask(user))
+    token[RBAC_VERSION_CLAIM] = await aget_rbac_version()
+
+
+@timed(TOKEN_ISSUE_DURATION)
+def get_token_for_user(user):
+    """
+    Выпускает refresh-токен для пользователя с учетом режима токенов.
+    """
+    if settings.RBAC_STATELESS_TOKENS:
+        return RBACRefreshToken.for_user(user)
+    return RefreshToken.for_user(user)
@@ -1,10 +1,19 @@
 from django.urls import path
 
-from .views import LoginView, LogoutView, UserProfileView, UserRegistrationView
+from .views import (
+    LoginView,
+    LogoutView,
+    TokenIntrospectionView,
+    TokenRefreshView,
+    UserProfileView,
+    UserRegistrationView,
+)
 
 urlpatterns = [
     path("register/", UserRegistrationView.as_view(), name="auth-register"),
     path("login/", LoginView.as_view(), name="auth-login"),
+    path("refresh/", TokenRefreshView.as_view(), name="auth-refresh"),
     path("logout/", LogoutView.as_view(), name="auth-logout"),
+    path("introspect/", TokenIntrospectionView.as_view(), name="auth-introspect"),
     path("me/", UserProfileView.as_view(), name="user-profile"),
 ]
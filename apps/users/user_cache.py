@@ -0,0 +1,157 @@
+"""
+Кэш пользователей для аутентификации по JWT.
+
+В общем кэше хранится компактный кортеж полей, нужных для проверок
+аутентификации и авторизации (is_active, is_deleted, is_superuser и т.п.).
+Из него собирается CustomUser через from_db(): остальные поля отложены
+и при обращении догружаются из БД.
+
+Запись удаляется при сохранении или удалении пользователя (см. signals.py):
+на ее место ставится метка с коротким временем жизни, чтобы загрузка,
+начавшаяся до изменения, не вернула в кэш старые данные. Одновременные
+промахи по одному ключу в процессе обслуживаются одним запросом к БД.
+"""
+
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .metrics import USER_CACHE_LOOKUPS
+from .models import CustomUser
+
+# from_db() ждет значения в порядке полей модели
+CACHED_FIELDS = tuple(
+    field.attname
+    for field in CustomUser._meta.concrete_fields
+    if field.attname in ("email", "is_active", "is_staff", "is_superuser", "is_deleted")
+)
+# Метка инвалидации живет дольше любой загрузки пользователя из БД
+INVALIDATED = "invalidated"
+INVALIDATION_TIMEOUT = 5
+
+
+def _key(user_id):
+    return f"auth:user:v1:{user_id}"
+
+
+def _to_user(user_id, values):
+    return CustomUser.from_db(
+        DEFAULT_DB_ALIAS, ["id", *CACHED_FIELDS], [user_id, *values]
+    )
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.values = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _query(user_id):
+    row = CustomUser.objects.filter(pk=user_id).values_list(*CACHED_FIELDS).first()
+    if row is not None:
+        # Не перезаписывает метку инвалидации, выставленную во время загрузки
+        cache.add(_key(user_id), row, settings.USER_CACHE["TIMEOUT"])
+    return row
+
+
+def _load(user_id):
+    """
+    Загружает поля пользователя из БД; параллельные вызовы для одного
+    пользователя ждут результата первого.
+    """
+    with _flights_lock:
+        flight = _flights.get(user_id)
+        leader = flight is None
+        if leader:
+            flight = _flights[user_id] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.values
+
+    try:
+        flight.values = _query(user_id)
+    except Exception as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[user_id]
+        flight.done.set()
+    return flight.values
+
+
+def _from_cache(user_id, values):
+    if values is not None and values != INVALIDATED:
+        USER_CACHE_LOOKUPS.labels("hit").inc()
+        return _to_user(user_id, values)
+    USER_CACHE_LOOKUPS.labels("miss").inc()
+    return None
+
+
+def get_user(user_id):
+    """
+    Пользователь по id или None, если его нет.
+    """
+    user = _from_cache(user_id, cache.get(_key(user_id)))
+    if user is not None:
+        return user
+    values = _load(user_id)
+    return None if values is None else _to_user(user_id, values)
+
+
+async def aget_user(user_id):
+    """
+    Асинхронный get_user(): при попадании в кэш не покидает event loop.
+    """
+    user = _from_cache(user_id, await cache.aget(_key(user_id)))
+    if user is not None:
+        return user
+    values = await sync_to_async(_load)(user_id)
+    return None if values is None else _to_user(user_id, values)
+
+
+def invalidate_user(user_id):
+    cache.set(_key(user_id), INVALIDATED, INVALIDATION_TIMEOUT)
+
+
+def _query_many(user_ids):
+    rows = CustomUser.objects.filter(pk__in=user_ids).values_list("pk", *CACHED_FIELDS)
+    loaded = {}
+    for user_id, *values in rows:
+        cache.add(_key(user_id), tuple(values), settings.USER_CACHE["TIMEOUT"])
+        loaded[user_id] = values
+    return loaded
+
+
+async def aget_users(user_ids):
+    """
+    Пользователи по списку id {id: пользователь}: промахи кэша загружаются
+    одним запросом к БД. Отсутствующих пользователей в результате нет.
+    """
+    keys = {_key(user_id): user_id for user_id in user_ids}
+    # BaseCache.aget_many() читает ключи по одному; пакет — одним get_many()
+    cached = await sync_to_async(cache.get_many)(keys)
+    users, missing = {}, []
+    for key, user_id in keys.items():
+        user = _from_cache(user_id, cached.get(key))
+        if user is None:
+            missing.append(user_id)
+        else:
+            users[user_id] = user
+
+    if missing:
+        loaded = await sync_to_async(_query_many)(missing)
+        for user_id, values in loaded.items():
+            users[user_id] = _to_user(user_id, values)
+    return users
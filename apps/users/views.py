@@ -1,21 +1,48 @@
-from django.shortcuts import get_object_or_404
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
 from rest_framework import generics, status, views, viewsets
 from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings
 
 from apps.users.permissions import HasPermission
 
+from .async_views import AsyncViewMixin
+from .bulk import assign_roles, remove_roles
+from .hashing import HashingUnavailable
+from .importers import READERS, UserImporter
+from .introspection import aintrospect
+from .keyring import get_jwks
+from .metrics import LOGIN_DURATION, render_metrics, scrape_allowed, timed
 from .models import CustomUser, Permission, Role
+from .pagination import IdCursorPagination, KeysetPagination
+from .revocation import revoke_token, revoke_user_tokens
+from .rotation import arotate, issue_token_pair, revoke_family, revoke_user_families
 from .serializers import (
+    BulkRoleAssignmentSerializer,
+    IntrospectionSerializer,
     LoginSerializer,
+    LogoutSerializer,
     PermissionSerializer,
     RoleSerializer,
+    TokenRefreshSerializer,
+    UserDirectorySerializer,
     UserProfileSerializer,
     UserRegistrationSerializer,
+    get_query_list,
 )
+from .throttling import LoginThrottle, login_guard
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -26,24 +53,37 @@ class UserRegistrationView(generics.CreateAPIView):
 
     queryset = CustomUser.objects.all()
     permission_classes = [AllowAny]
+    max_queries = 3
     serializer_class = UserRegistrationSerializer
 
 
-class LoginView(generics.GenericAPIView):
+class LoginView(AsyncViewMixin, generics.GenericAPIView):
     """
     View для входа в систему.
     Возвращает access и refresh токены.
+    Попытки ограничиваются по IP и email (см. apps.users.throttling).
     """
 
     permission_classes = [AllowAny]
+    max_queries = 4
     serializer_class = LoginSerializer
-
-    def post(self, request, *args, **kwargs):
+    throttle_classes = [LoginThrottle]
+
+    @timed(
+        LOGIN_DURATION,
+        result="success",
+        errors=((ValidationError, "failure"), (HashingUnavailable, "unavailable")),
+    )
+    async def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        idents = LoginThrottle().get_idents(request)
+        if not await serializer.ais_valid():
+            await sync_to_async(login_guard.register_failure)(idents)
+            raise ValidationError(serializer.errors)
+        await sync_to_async(login_guard.register_success)(idents)
         user = serializer.validated_data["user"]
 
-        refresh = RefreshToken.for_user(user)
+        refresh = await sync_to_async(issue_token_pair)(user)
 
         return Response(
             {
@@ -56,12 +96,80 @@ class LoginView(generics.GenericAPIView):
 class LogoutView(views.APIView):
     """
     View для выхода из системы.
+    Отзывает текущий access-токен и переданный refresh-токен,
+    с "all": true — все токены пользователя (см. apps.users.revocation).
     """
 
     permission_classes = [IsAuthenticated]
+    max_queries = 3
+
+    def post(self, request, *args, **kwargs):
+        serializer = LogoutSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+
+        if request.auth is not None:
+            revoke_token(request.auth)
+        refresh = serializer.validated_data.get("refresh")
+        if refresh is not None:
+            revoke_token(refresh)
+            revoke_family(refresh)
+        if serializer.validated_data["all"]:
+            revoke_user_tokens(request.user.pk)
+            revoke_user_families(request.user.pk)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenRefreshView(AsyncViewMixin, generics.GenericAPIView):
+    """
+    View для обновления токенов без ввода пароля.
+    Refresh-токен меняется на новый при каждом обновлении; повторное
+    использование замененного токена отзывает все токены входа
+    (см. apps.users.rotation).
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    max_queries = 2
+    serializer_class = TokenRefreshSerializer
+
+    def get_authenticate_header(self, request):
+        # Без аутентификаторов DRF отвечал бы 403 вместо 401
+        return f'{api_settings.AUTH_HEADER_TYPES[0]} realm="api"'
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        refresh = await arotate(serializer.validated_data["refresh"])
+        return Response(
+            {
+                "refresh": str(refresh),
+                "access": str(refresh.access_token),
+            }
+        )
 
 
-class UserProfileView(generics.RetrieveUpdateDestroyAPIView):
+class TokenIntrospectionView(AsyncViewMixin, generics.GenericAPIView):
+    """
+    View для шлюзов: пакетная проверка access-токенов и разрешений
+    (см. apps.users.introspection). Требует разрешения 'introspect_tokens'.
+    """
+
+    permission_classes = [IsAuthenticated, HasPermission]
+    required_permissions = ["introspect_tokens"]
+    # Шлюз и его маска, номера битов разрешений, пользователи и маски пакета
+    # (при промахах кэшей)
+    max_queries = 5
+    serializer_class = IntrospectionSerializer
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = await aintrospect(serializer.validated_data["items"])
+        return Response({"results": results})
+
+
+class UserProfileView(AsyncViewMixin, generics.GenericAPIView):
     """
     View для управления профилем пользователя.
     Доступно только аутентифицированным пользователям.
@@ -73,46 +181,165 @@ class UserProfileView(generics.RetrieveUpdateDestroyAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
+    # Удаление отзывает цепочки refresh-токенов (см. signals.py)
+    max_queries = {"get": 2, "put": 3, "patch": 3, "delete": 4}
 
-    def get_object(self):
+    async def aget_object(self):
         """
-        Переопределяем метод, чтобы он всегда возвращал
-        текущего залогиненного пользователя.
+        Всегда возвращает текущего залогиненного пользователя.
         """
-        return self.request.user
+        user = self.request.user
+        if not isinstance(user, CustomUser) or user.get_deferred_fields():
+            # В stateless-режиме request.user построен из токена, а из кэша
+            # пользователей загружены не все поля
+            user = await aget_object_or_404(CustomUser, pk=user.pk)
+        return user
+
+    async def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(await self.aget_object())
+        return Response(serializer.data)
+
+    async def put(self, request, *args, **kwargs):
+        return await self.aupdate(request, partial=False)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.aupdate(request, partial=True)
+
+    async def delete(self, request, *args, **kwargs):
+        await self.aperform_destroy(await self.aget_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    async def aupdate(self, request, partial):
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        for attr, value in serializer.validated_data.items():
+            setattr(instance, attr, value)
+        await instance.asave(update_fields=list(serializer.validated_data))
+        return Response(serializer.data)
 
-    def perform_destroy(self, instance):
+    async def aperform_destroy(self, instance):
         """
-        Переопределяем метод удаления для "мягкого" удаления.
+        "Мягкое" удаление вместо удаления записи.
         """
         # Пользователь инициирует удаление, происходит logout,
+        # токены отзывает сигнал снятия is_active (см. signals.py)
         instance.is_deleted = True
         instance.is_active = False
-        instance.save()
+        await instance.asave()
+
+
+class UserViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API эндпоинт справочника пользователей.
+    Доступно только администраторам с правом 'view_users'.
+    Фильтры:
+    - email: префикс email (без учета регистра);
+    - name: подстрока фамилии (без учета регистра);
+    - role: id роли;
+    - is_active: true/false;
+    - is_deleted: true/false (по умолчанию false).
+    Пагинация keyset по (date_joined, id), от новых к старым.
+    """
+
+    queryset = CustomUser.objects.all()
+    serializer_class = UserDirectorySerializer
+    pagination_class = KeysetPagination
+    permission_classes = [IsAuthenticated, HasPermission]
+    required_permissions = ["view_users"]
+    max_queries = {"list": 5, "retrieve": 6}
+    lookup_value_regex = r"\d+"
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = (
+            super()
+            .get_queryset()
+            .prefetch_related(
+                Prefetch("roles", queryset=Role.objects.only("id", "name"))
+            )
+        )
+        if self.action != "list":
+            return queryset
+
+        queryset = queryset.filter(
+            is_deleted=self._parse_bool(params.get("is_deleted"), default=False)
+        )
+        is_active = self._parse_bool(params.get("is_active"))
+        if is_active is not None:
+            queryset = queryset.filter(is_active=is_active)
+        if params.get("email"):
+            queryset = queryset.filter(email__istartswith=params["email"])
+        if params.get("name"):
+            queryset = queryset.filter(last_name__icontains=params["name"])
+        if params.get("role"):
+            try:
+                role_id = int(params["role"])
+            except ValueError:
+                raise ValidationError({"role": "Ожидается id роли."})
+            queryset = queryset.filter(roles=role_id)
+        return queryset
+
+    @staticmethod
+    def _parse_bool(value, default=None):
+        if value is None or value == "":
+            return default
+        return value.lower() in ("1", "true", "yes")
 
 
 class PermissionViewSet(viewsets.ModelViewSet):
     """
     API эндпоинт для управления Разрешениями.
     Доступно только администраторам с правом 'manage_permissions'.
+    Список постраничный (cursor), поддерживает ?fields=.
     """
 
     queryset = Permission.objects.all()
     serializer_class = PermissionSerializer
+    pagination_class = IdCursorPagination
     permission_classes = [IsAuthenticated, HasPermission]
     required_permissions = ["manage_permissions"]
+    # Изменение разрешений и ролей пересчитывает права держателей роли:
+    # число запросов растет с данными, бюджет задан только для чтения
+    max_queries = {"list": 4, "retrieve": 4}
 
 
 class RoleViewSet(viewsets.ModelViewSet):
     """
     API эндпоинт для управления Ролями.
     Доступно только администраторам с правом 'manage_roles'.
+    Список постраничный (cursor), поддерживает ?fields= и ?expand=permissions.
+    Иерархия задается списком parent_ids; цикл наследования — ошибка 400.
     """
 
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
+    pagination_class = IdCursorPagination
     permission_classes = [IsAuthenticated, HasPermission]
     required_permissions = ["manage_roles"]
+    max_queries = {"list": 7, "retrieve": 7}
+
+    def get_queryset(self):
+        """
+        Разрешения, родители и предки всех ролей страницы загружаются
+        по одному запросу на связь. Без ?expand=permissions нужны только id.
+        """
+        queryset = super().get_queryset()
+        fields = get_query_list(self.request, "fields")
+        expand = get_query_list(self.request, "expand") or set()
+
+        lookups = []
+        if fields is None or "permissions" in fields:
+            if "permissions" in expand:
+                lookups.append("permissions")
+            else:
+                lookups.append(
+                    Prefetch("permissions", queryset=Permission.objects.only("id"))
+                )
+        for relation in ("parents", "ancestors"):
+            if fields is None or relation in fields:
+                lookups.append(Prefetch(relation, queryset=Role.objects.only("id")))
+        return queryset.prefetch_related(*lookups)
 
 
 class UserRoleAssignmentView(APIView):
@@ -123,6 +350,7 @@ class UserRoleAssignmentView(APIView):
 
     permission_classes = [IsAuthenticated, HasPermission]
     required_permissions = ["assign_roles"]
+    max_queries = 10
 
     def _get_user_and_role(self, request_data):
         """
@@ -181,3 +409,144 @@ class UserRoleAssignmentView(APIView):
             },
             status=status.HTTP_200_OK,
         )
+
+
+class BulkUserRoleAssignmentView(APIView):
+    """
+    View для массового назначения и снятия ролей.
+    Доступно только администраторам с правом 'assign_roles'.
+    - POST: назначить роли role_ids пользователям.
+    - DELETE: снять роли role_ids с пользователей.
+    Пользователи задаются списком user_ids или фильтром user_filter.
+    Все изменения выполняются в одной транзакции.
+    """
+
+    permission_classes = [IsAuthenticated, HasPermission]
+    required_permissions = ["assign_roles"]
+    # Число запросов растет с числом пакетов, бюджет не задан
+    batch_size = 1000
+
+    def post(self, request, *args, **kwargs):
+        """Назначить роли пользователям."""
+        return self._apply(request, assign_roles)
+
+    def delete(self, request, *args, **kwargs):
+        """Снять роли с пользователей."""
+        return self._apply(request, remove_roles)
+
+    def _apply(self, request, operation):
+        serializer = BulkRoleAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        summary = Counter()
+        items = []
+
+        role_ids = list(dict.fromkeys(data["role_ids"]))
+        found_roles = set(
+            Role.objects.filter(pk__in=role_ids).values_list("pk", flat=True)
+        )
+        for role_id in role_ids:
+            if role_id not in found_roles:
+                summary["role_not_found"] += 1
+                items.append({"role_id": role_id, "status": "role_not_found"})
+
+        if "user_ids" in data:
+            # Явный список: отчет по каждой паре (пользователь, роль)
+            user_ids = list(dict.fromkeys(data["user_ids"]))
+            found_users = set(
+                CustomUser.objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+            )
+            for user_id in user_ids:
+                if user_id not in found_users:
+                    summary["user_not_found"] += 1
+                    items.append({"user_id": user_id, "status": "user_not_found"})
+            users = [user_id for user_id in user_ids if user_id in found_users]
+
+            def on_item(user_id, role_id, result):
+                summary[result] += 1
+                items.append({"user_id": user_id, "role_id": role_id, "status": result})
+
+        else:
+            # Фильтр может выбрать миллионы пользователей: только сводка
+            users = (
+                serializer.get_users_queryset()
+                .order_by("pk")
+                .values_list("pk", flat=True)
+                .iterator(chunk_size=self.batch_size)
+            )
+
+            def on_item(user_id, role_id, result):
+                summary[result] += 1
+
+        operation(
+            users, sorted(found_roles), batch_size=self.batch_size, on_item=on_item
+        )
+
+        return Response(
+            {"summary": dict(summary), "items": items},
+            status=status.HTTP_200_OK,
+        )
+
+
+class UserImportView(APIView):
+    """
+    View для массового импорта пользователей из CSV/JSONL.
+    Доступно только администраторам с правом 'import_users'.
+    Файл передается в поле file, формат — в поле format
+    или определяется по расширению.
+    """
+
+    permission_classes = [IsAuthenticated, HasPermission]
+    required_permissions = ["import_users"]
+    # Число запросов растет с числом пакетов, бюджет не задан
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        """Импортировать пользователей из файла."""
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Необходимо загрузить файл в поле file"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fmt = request.data.get("format") or Path(upload.name).suffix.lstrip(".")
+        if fmt not in READERS:
+            return Response(
+                {"error": "Поддерживаются форматы: csv, jsonl"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Файл читается построчно, не загружаясь в память целиком
+        lines = (line.decode("utf-8") for line in upload)
+        result = UserImporter().run(READERS[fmt](lines))
+
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Метрики Prometheus (см. apps.users.metrics).
+    Доступ — по токену или списку адресов из settings.METRICS.
+    """
+    if not scrape_allowed(request):
+        return HttpResponseForbidden()
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
+
+
+@require_GET
+@condition(etag_func=lambda request: get_jwks()[1])
+def jwks_view(request):
+    """
+    Открытые ключи подписи токенов (JWKS, см. apps.users.keyring).
+    Ответ кэшируется клиентами на JWT_SIGNING["JWKS_MAX_AGE"] секунд.
+    """
+    content, etag = get_jwks()
+    response = HttpResponse(content, content_type="application/json")
+    patch_cache_control(
+        response, public=True, max_age=settings.JWT_SIGNING["JWKS_MAX_AGE"]
+    )
+    return response
@@ -0,0 +1,43 @@
+"""
+Прогрев воркера перед приемом запросов.
+
+Вызывается из gunicorn (post_worker_init, см. config/gunicorn.conf.py):
+открывает соединения с БД (с пулом — заполняет пул до min_size) и загружает
+в память процесса версию RBAC, номера битов разрешений и журнал отзыва
+токенов, подбирает стоимость хэшера паролей, чтобы первые запросы не платили
+за это задержкой.
+"""
+
+import logging
+
+from django.db import connections
+
+from . import revocation
+from .bitmap import get_bit_indexes
+from .cache import get_rbac_version
+from .hashers import calibrate_default_hasher
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+            if getattr(connection, "pool", None) is not None:
+                # Соединение возвращается в пул, пул остается открытым
+                connection.close()
+        except Exception:
+            logger.warning("Warm-up: database %s unavailable", connection.alias)
+
+    steps = (
+        get_rbac_version,
+        get_bit_indexes,
+        revocation.sync_journal,
+        calibrate_default_hasher,
+    )
+    for step in steps:
+        try:
+            step()
+        except Exception:
+            logger.warning("Warm-up step %s failed", step.__name__, exc_info=True)
@@ -0,0 +1,62 @@
+"""
+Конфигурация gunicorn для production.
+
+SERVER_MODE=asgi (по умолчанию): uvicorn-воркеры, один event loop на ядро.
+SERVER_MODE=wsgi: gthread-воркеры с пулом потоков.
+Параметры задаются переменными окружения.
+"""
+
+import multiprocessing
+import os
+import shutil
+
+import environ
+
+env = environ.Env()
+
+# Метрики Prometheus пишутся воркерами в файлы этого каталога и суммируются
+# в /metrics. Переменная должна быть задана до импорта приложения.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-metrics")
+
+SERVER_MODE = env.str("SERVER_MODE", default="asgi")
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "config.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "config.wsgi:application"
+    worker_class = "gthread"
+
+bind = env.str("GUNICORN_BIND", default="0.0.0.0:8000")
+workers = env.int("GUNICORN_WORKERS", default=multiprocessing.cpu_count())
+# Потоки в каждом воркере (только для wsgi)
+threads = env.int("GUNICORN_THREADS", default=4)
+keepalive = env.int("GUNICORN_KEEPALIVE", default=5)
+timeout = env.int("GUNICORN_TIMEOUT", default=30)
+graceful_timeout = env.int("GUNICORN_GRACEFUL_TIMEOUT", default=30)
+# Перезапуск воркера после N запросов (0 — без перезапуска)
+max_requests = env.int("GUNICORN_MAX_REQUESTS", default=0)
+max_requests_jitter = env.int("GUNICORN_MAX_REQUESTS_JITTER", default=0)
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    # Значения от прошлого запуска сервера не должны попасть в метрики
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Приложение уже загружено (django.setup() выполнен)
+    from apps.users.warmup import warm_up
+
+    warm_up()
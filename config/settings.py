@@ -56,6 +56,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "apps.users.middleware.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -91,6 +92,42 @@ DATABASES = {
     "default": env.db(),
 }
 
+# Пул соединений psycopg 3 (только PostgreSQL). С пулом соединение
+# возвращается в пул в конце запроса, поэтому CONN_MAX_AGE должен быть 0.
+DB_POOL = env.bool("DB_POOL", default=False)
+if DB_POOL and DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+        "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+        "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+        # Сколько ждать свободного соединения, секунды
+        "timeout": env.float("DB_POOL_TIMEOUT", default=10.0),
+    }
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+elif env.str("SERVER_MODE", default="asgi") == "asgi":
+    # Под ASGI синхронный ORM выполняется в потоках sync_to_async, и
+    # постоянное соединение каждого потока живет вне цикла запроса Django:
+    # соединения копятся до исчерпания max_connections. Без пула — новое
+    # соединение на каждый запрос.
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+else:
+    # Постоянные соединения: сколько секунд держать соединение между
+    # запросами (0 — новое соединение на каждый запрос, None — без ограничения)
+    DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=0)
+# Проверять переиспользуемое соединение перед запросом
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = env.bool(
+    "DB_CONN_HEALTH_CHECKS", default=True
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Для нескольких воркеров нужен общий кэш (например, redis://redis:6379/1),
+# иначе инвалидация кэша разрешений не дойдет до соседних процессов.
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -101,13 +138,13 @@ AUTH_PASSWORD_VALIDATORS = [
         "password_validation.UserAttributeSimilarityValidator",
     },
     {
-        "NAME": "django.contrib.auth." "password_validation.MinimumLengthValidator",
+        "NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",
     },
     {
-        "NAME": "django.contrib.auth." "password_validation.CommonPasswordValidator",
+        "NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",
     },
     {
-        "NAME": "django.contrib.auth." "password_validation.NumericPasswordValidator",
+        "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
     },
 ]
 
@@ -136,8 +173,154 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "users.CustomUser"
 
+# Пароль проверяется в ограниченном пуле хэширования (apps.users.hashing)
+AUTHENTICATION_BACKENDS = ["apps.users.backends.PooledHashingBackend"]
+
+# Stateless-режим: разрешения пользователя встраиваются в access-токен,
+# а запросы авторизуются без обращения к базе данных.
+RBAC_STATELESS_TOKENS = env.bool("RBAC_STATELESS_TOKENS", default=False)
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+        "apps.users.authentication.StatelessJWTAuthentication"
+        if RBAC_STATELESS_TOKENS
+        else "apps.users.authentication.CachedUserJWTAuthentication",
+    ),
+    # Число доверенных прокси перед приложением: IP клиента для троттлинга
+    # берется из X-Forwarded-For только за ними, при 0 — из REMOTE_ADDR
+    "NUM_PROXIES": env.int("NUM_PROXIES", default=0),
+}
+
+# --- Кэш разрешений RBAC (apps.users.cache) ---
+RBAC_PERMISSION_CACHE = {
+    # Время жизни записи в общем кэше, секунды
+    "TIMEOUT": env.int("RBAC_CACHE_TIMEOUT", default=300),
+    # Размер LRU внутри процесса (число пользователей)
+    "LOCAL_MAXSIZE": env.int("RBAC_CACHE_LOCAL_MAXSIZE", default=10000),
+    # Как долго процесс доверяет известной ему версии RBAC, секунды
+    "VERSION_TTL": env.float("RBAC_VERSION_TTL", default=1.0),
+}
+
+# --- Кэш пользователей для аутентификации (apps.users.user_cache) ---
+USER_CACHE = {
+    # Время жизни записи в общем кэше, секунды
+    "TIMEOUT": env.int("USER_CACHE_TIMEOUT", default=300),
+}
+
+# --- Кэш ответов представлений (apps.users.response_cache) ---
+RESPONSE_CACHE = {
+    # Время жизни ответа в общем кэше, секунды
+    "TIMEOUT": env.int("RESPONSE_CACHE_TIMEOUT", default=300),
+}
+
+# --- Импорт пользователей (apps.users.importers) ---
+USER_IMPORT = {
+    # Размер пачки: столько записей читается, хэшируется и вставляется за раз
+    "BATCH_SIZE": env.int("USER_IMPORT_BATCH_SIZE", default=1000),
+    # Процессы для хэширования паролей в manage.py import_users (0 — хэшировать
+    # в текущем процессе); импорт через API использует общий пул хэширования
+    "HASH_WORKERS": env.int("USER_IMPORT_HASH_WORKERS", default=os.cpu_count() or 1),
+}
+
+# --- Защита входа (apps.users.throttling) ---
+LOGIN_THROTTLE = {
+    # Скользящее окно, секунды
+    "WINDOW": env.int("LOGIN_THROTTLE_WINDOW", default=60),
+    # Максимум попыток входа в окне с одного IP и для одного email
+    "IP_LIMIT": env.int("LOGIN_THROTTLE_IP_LIMIT", default=30),
+    "EMAIL_LIMIT": env.int("LOGIN_THROTTLE_EMAIL_LIMIT", default=10),
+    # После стольких неудач включается блокировка email / IP
+    "LOCKOUT_THRESHOLD": env.int("LOGIN_LOCKOUT_THRESHOLD", default=5),
+    "IP_LOCKOUT_THRESHOLD": env.int("LOGIN_IP_LOCKOUT_THRESHOLD", default=20),
+    # Длительность блокировки: BASE * 2^(неудачи - порог), не более MAX секунд
+    "LOCKOUT_BASE": env.int("LOGIN_LOCKOUT_BASE", default=1),
+    "LOCKOUT_MAX": env.int("LOGIN_LOCKOUT_MAX", default=900),
+    # Сколько хранится счетчик неудач, секунды
+    "FAILURE_TTL": env.int("LOGIN_FAILURE_TTL", default=3600),
+}
+
+# --- Пул хэширования паролей (apps.users.hashing) ---
+PASSWORD_HASHING = {
+    # thread — потоки (PBKDF2, argon2, bcrypt отпускают GIL), process — процессы,
+    # inline — хэшировать в потоке запроса без ограничений
+    "EXECUTOR": env.str("PASSWORD_HASHING_EXECUTOR", default="thread"),
+    # Одновременно выполняемые хэширования в одном процессе
+    "WORKERS": env.int("PASSWORD_HASHING_WORKERS", default=os.cpu_count() or 1),
+    # Сколько задач может ждать свободного воркера
+    "QUEUE_SIZE": env.int("PASSWORD_HASHING_QUEUE_SIZE", default=16),
+    # Сколько ждать места в очереди, прежде чем ответить 503, секунды
+    "QUEUE_TIMEOUT": env.float("PASSWORD_HASHING_QUEUE_TIMEOUT", default=0.1),
+    # Значение заголовка Retry-After при перегрузке, секунды
+    "RETRY_AFTER": env.int("PASSWORD_HASHING_RETRY_AFTER", default=1),
+    # Целевое время одного хэша, мс: стоимость хэшера подбирается под
+    # оборудование (apps.users.hashers). 0 — стоимость Django по умолчанию
+    "TARGET_MS": env.int("PASSWORD_HASH_TARGET_MS", default=0),
+}
+
+# Первый хэшер хэширует новые пароли, остальные проверяют старые хэши;
+# при входе хэш пересчитывается выбранным хэшером
+_PASSWORD_HASHERS = {
+    "pbkdf2": "apps.users.hashers.PBKDF2PasswordHasher",
+    "argon2": "apps.users.hashers.Argon2PasswordHasher",
+    "bcrypt": "apps.users.hashers.BCryptSHA256PasswordHasher",
+}
+_PASSWORD_HASHER = env.str("PASSWORD_HASHER", default="pbkdf2")
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[_PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != _PASSWORD_HASHER
+]
+
+# --- Подпись токенов (apps.users.keyring) ---
+JWT_SIGNING = {
+    # Каталог ключей <kid>.pem (Ed25519 или RSA); пусто — HS256 с SECRET_KEY
+    "KEYS_DIR": env.str("JWT_KEYS_DIR", default=""),
+    # kid ключа, которым подписываются новые токены (можно не задавать,
+    # если закрытый ключ в каталоге один)
+    "ACTIVE_KID": env.str("JWT_ACTIVE_KID", default=""),
+    # Сколько клиенты кэшируют /.well-known/jwks.json, секунды
+    "JWKS_MAX_AGE": env.int("JWKS_MAX_AGE", default=3600),
+}
+
+# --- Кэш проверенных токенов (apps.users.token_cache) ---
+VERIFIED_TOKEN_CACHE = {
+    # Число токенов в LRU процесса; 0 — проверять подпись на каждый запрос
+    "MAXSIZE": env.int("VERIFIED_TOKEN_CACHE_MAXSIZE", default=10000),
+}
+
+# --- Пакетная проверка токенов для шлюзов (apps.users.introspection) ---
+INTROSPECTION = {
+    # Максимум элементов в одном запросе
+    "MAX_ITEMS": env.int("INTROSPECTION_MAX_ITEMS", default=500),
+    # Сколько секунд шлюз может кэшировать решение
+    "DECISION_TTL": env.int("INTROSPECTION_DECISION_TTL", default=30),
+}
+
+# --- Отзыв токенов (apps.users.revocation) ---
+TOKEN_REVOCATION = {
+    # Ожидаемое число отзывов за время жизни refresh-токена
+    "BLOOM_CAPACITY": env.int("TOKEN_REVOCATION_BLOOM_CAPACITY", default=100000),
+    # Доля ложных срабатываний фильтра (каждое стоит одного запроса к кэшу)
+    "BLOOM_ERROR_RATE": env.float("TOKEN_REVOCATION_BLOOM_ERROR_RATE", default=0.001),
+    # Как часто процесс дочитывает журнал отзывов, секунды
+    "SYNC_INTERVAL": env.float("TOKEN_REVOCATION_SYNC_INTERVAL", default=1.0),
+}
+
+# --- Метрики Prometheus (apps.users.metrics) ---
+METRICS = {
+    # Токен сборщика (Authorization: Bearer <токен>); пусто — без токена
+    "TOKEN": env.str("METRICS_TOKEN", default=""),
+    # Адреса, с которых метрики отдаются без токена
+    "ALLOWED_IPS": env.list("METRICS_ALLOWED_IPS", default=[]),
+}
+
+# --- Бюджет SQL-запросов (apps.users.middleware) ---
+QUERY_BUDGET = {
+    "ENABLED": env.bool("QUERY_BUDGET_ENABLED", default=True),
+    # Доля запросов, для которых считаются SQL-запросы (в production — малая)
+    "SAMPLE_RATE": env.float(
+        "QUERY_BUDGET_SAMPLE_RATE", default=1.0 if DEBUG else 0.01
+    ),
+    # log — предупреждение в лог, raise — ошибка (для тестов и CI)
+    "ACTION": env.str("QUERY_BUDGET_ACTION", default="log"),
+    # Заголовки X-DB-Queries и Server-Timing в ответе
+    "HEADERS": env.bool("QUERY_BUDGET_HEADERS", default=DEBUG),
 }
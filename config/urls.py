@@ -1,9 +1,13 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from apps.users.views import jwks_view, metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", include("apps.users.urls")),
     path("api/", include("apps.documents.urls")),
     path("api/admin/", include("apps.users.admin_urls")),
+    path("metrics", metrics_view, name="metrics"),
+    path(".well-known/jwks.json", jwks_view, name="jwks"),
 ]